@@ -28,15 +28,33 @@ def start_poller():
         from app.services.market_data import MarketData
         from app.services.budget_manager import BudgetManager
         from app.services.follower import Follower
+        from app.services.portfolio_state import PortfolioState
         from app.services import poller
+        from config.coins import COIN_SYMBOLS
+        from config.settings import Settings
 
         exchange = ExchangeClient()
+        exchange.start_endpoint_probes()
+        exchange.rules.load()
+        # Pas de user-data stream sur un exchange de substitution (REST seul)
+        if Settings.TRADING_MODE == "live" and not Settings.BINANCE_BASE_URL:
+            exchange.start_balance_stream()
+        if Settings.PRICE_FEED == "websocket":
+            exchange.start_price_feed(COIN_SYMBOLS + ["EURUSDC"])
         market = MarketData(exchange)
-        budget_mgr = BudgetManager()
+        portfolio = PortfolioState()
+        budget_mgr = BudgetManager(portfolio)
 
         budget_mgr.initialize()
 
-        follower = Follower(exchange, market, budget_mgr)
+        follower = Follower(exchange, market, budget_mgr, portfolio)
+        # Ordres envoyés avant un arrêt brutal : issue à récupérer avant tout signal
+        try:
+            recovered = follower.reconcile_orders()
+            if recovered:
+                logger.warning(f"{recovered} trade(s) récupéré(s) au démarrage")
+        except Exception as e:
+            logger.error(f"Réconciliation des ordres au démarrage impossible: {e}")
 
         poller._follower = follower
         poller.init_poller(follower)
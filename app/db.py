@@ -3,9 +3,12 @@
 Zéro dépendance externe — un simple fichier sur le volume Docker.
 """
 
+import functools
 import logging
+import queue
 import sqlite3
 import threading
+import time
 from contextlib import contextmanager
 
 from config.settings import Settings
@@ -14,25 +17,61 @@ logger = logging.getLogger("calvalot.db")
 
 _local = threading.local()
 
+# ── Connexions ─────────────────────────────────────────
+#
+# Un seul écrivain : le thread "calvalot-db-writer" possède l'unique
+# connexion d'écriture et exécute toutes les mutations (cf. write). Les
+# requêtes web lisent via un petit pool de connexions en lecture seule
+# (query_only) ; les threads du chemin de trading (poller, exécution,
+# ordres) ont chacun la leur (cf. dedicated_reader) et n'attendent
+# jamais le pool. En WAL, les lecteurs ne bloquent jamais l'écrivain et
+# inversement. Les checkpoints du WAL
+# tournent sur leur propre thread, en PASSIVE : un commit ne paie
+# jamais un checkpoint, et un checkpoint n'attend pas les lecteurs.
 
-def _get_conn():
-    """Connexion SQLite thread-local (une par thread gunicorn)."""
-    if not hasattr(_local, "conn") or _local.conn is None:
-        _local.conn = sqlite3.connect(
-            Settings.DB_PATH,
-            check_same_thread=False,
-        )
-        _local.conn.row_factory = sqlite3.Row
-        _local.conn.execute("PRAGMA journal_mode=WAL")
-        _local.conn.execute("PRAGMA busy_timeout=5000")
-    return _local.conn
+_READER_TIMEOUT = 30  # s d'attente max d'une connexion de lecture
+
+
+def _connect():
+    conn = sqlite3.connect(Settings.DB_PATH, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA busy_timeout=5000")
+    conn.execute(f"PRAGMA cache_size=-{Settings.DB_CACHE_KB}")
+    conn.execute(f"PRAGMA mmap_size={Settings.DB_MMAP_MB * 1024 * 1024}")
+    return conn
+
+
+def _is_writer():
+    return threading.current_thread() is _writer_thread
 
 
 @contextmanager
 def get_cursor():
-    """Context manager pour obtenir un cursor avec auto-commit/rollback."""
-    conn = _get_conn()
+    """Context manager pour obtenir un cursor.
+
+    Sur le thread d'écriture : la connexion d'écriture, avec
+    auto-commit/rollback hors `transaction()` ; dans une transaction, ni
+    commit ni rollback (les écritures la rejoignent). Ailleurs : une
+    connexion du pool de lecture, rendue à la sortie du bloc ; une
+    écriture y échoue (query_only), les mutations passent par `write`.
+    """
+    if not _is_writer():
+        with _reader() as conn:
+            cur = conn.cursor()
+            try:
+                yield cur
+            finally:
+                cur.close()
+        return
+    conn = _writer_conn
     cur = conn.cursor()
+    if _depth():
+        try:
+            yield cur
+        finally:
+            cur.close()
+        return
     try:
         yield cur
         conn.commit()
@@ -43,10 +82,447 @@ def get_cursor():
         cur.close()
 
 
+# ── Pool de lecture ────────────────────────────────────
+
+_readers = queue.LifoQueue()   # connexions libres (la plus chaude d'abord)
+_readers_lock = threading.Lock()
+_readers_open = 0
+_readers_dedicated = 0         # connexions propres aux threads de trading
+
+
+def _connect_reader():
+    conn = _connect()
+    conn.execute("PRAGMA query_only=1")
+    return conn
+
+
+@contextmanager
+def _reader():
+    """Connexion de lecture du thread : la sienne (dedicated_reader), sinon
+    empruntée au pool.
+
+    Réentrant par thread (curseurs imbriqués) : rendue au pool quand le
+    dernier bloc du thread se termine.
+    """
+    if getattr(_local, "readers", 0):
+        _local.readers += 1
+    else:
+        _local.reader = _own_reader() if getattr(_local, "dedicated", False) else _borrow_reader()
+        _local.readers = 1
+    try:
+        yield _local.reader
+    finally:
+        _local.readers -= 1
+        if not _local.readers:
+            conn, _local.reader = _local.reader, None
+            if conn.in_transaction:
+                # BEGIN implicite d'une écriture refusée (query_only) : sans
+                # rollback, la connexion garderait un instantané périmé
+                conn.rollback()
+            if conn is not getattr(_local, "own_reader", None):
+                _readers.put(conn)
+
+
+def dedicated_reader():
+    """Réserve au thread courant sa propre connexion de lecture.
+
+    À appeler au démarrage des threads du chemin de trading : leurs
+    lectures ne passent plus par le pool, que seules les requêtes web
+    se disputent. La connexion est ouverte à la première lecture.
+    """
+    _local.dedicated = True
+
+
+def _own_reader():
+    global _readers_dedicated
+    conn = getattr(_local, "own_reader", None)
+    if conn is None:
+        conn = _local.own_reader = _connect_reader()
+        with _readers_lock:
+            _readers_dedicated += 1
+    return conn
+
+
+def _borrow_reader():
+    global _readers_open
+    started = time.monotonic()
+    try:
+        return _readers.get_nowait()
+    except queue.Empty:
+        pass
+    with _readers_lock:
+        create = _readers_open < Settings.DB_READERS
+        if create:
+            _readers_open += 1
+    if create:
+        try:
+            return _connect_reader()
+        except Exception:
+            with _readers_lock:
+                _readers_open -= 1
+            raise
+    try:
+        conn = _readers.get(timeout=_READER_TIMEOUT)
+    except queue.Empty:
+        raise sqlite3.OperationalError("pool de lecture SQLite épuisé") from None
+    _record("read_wait_ms", (time.monotonic() - started) * 1000)
+    return conn
+
+
+# ── Unité de travail ───────────────────────────────────
+#
+# Chaque get_cursor() isolé = un commit = un fsync du WAL : sur carte SD,
+# c'est une bonne part du temps d'exécution d'un signal. transaction()
+# regroupe les écritures d'une jambe (trade, grand livre, intention,
+# position) ou de la fin d'un signal (snapshot, statut) en un seul
+# commit. Imbriquée, elle pose un SAVEPOINT : un échec partiel n'annule
+# que sa portion. Elle ne s'ouvre que sur le thread d'écriture, dans
+# une fonction passée à `write`.
+
+def _depth():
+    return getattr(_local, "depth", 0)
+
+
+@contextmanager
+def transaction():
+    """Unité de travail : un seul commit pour toutes les écritures du bloc.
+
+    Le niveau externe ouvre un BEGIN IMMEDIATE (verrou d'écriture pris
+    d'entrée, pas de SQLITE_BUSY en cours de route) ; un niveau imbriqué
+    ouvre un SAVEPOINT. Une exception annule le niveau courant puis
+    remonte. Ne pas y faire d'appel réseau : toutes les écritures du
+    process attendent la fin du bloc.
+    """
+    if not _is_writer():
+        raise RuntimeError("transaction() hors du thread d'écriture : passer par db.write")
+    conn = _writer_conn
+    depth = _depth()
+    if depth == 0:
+        _local.hooks = []
+        conn.execute("BEGIN IMMEDIATE")
+    else:
+        conn.execute(f"SAVEPOINT sp{depth}")
+    mark = len(_local.hooks)
+    _local.depth = depth + 1
+    try:
+        yield conn
+    except BaseException:
+        _local.depth = depth
+        undone = _local.hooks[mark:]
+        del _local.hooks[mark:]
+        if depth == 0:
+            conn.rollback()
+        else:
+            conn.execute(f"ROLLBACK TO sp{depth}")
+            conn.execute(f"RELEASE sp{depth}")
+        _run_hooks(reversed(undone), 1)
+        raise
+    _local.depth = depth
+    if depth == 0:
+        try:
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            _run_hooks(reversed(_local.hooks), 1)
+            raise
+        _run_hooks(_local.hooks, 0)
+    else:
+        conn.execute(f"RELEASE sp{depth}")
+
+
+def after_commit(on_commit, on_rollback=None):
+    """Action à lancer une fois les écritures courantes durables.
+
+    Hors transaction, `on_commit` est appelé tout de suite (l'écriture
+    est déjà commitée). Sinon il attend le commit du niveau externe ;
+    `on_rollback` est appelé si le niveau qui l'a enregistré est annulé.
+    Sert à publier un état en mémoire sans devancer la base.
+    """
+    if not _depth():
+        on_commit()
+        return
+    _local.hooks.append((on_commit, on_rollback))
+
+
+def _run_hooks(hooks, index):
+    for pair in hooks:
+        if pair[index] is None:
+            continue
+        try:
+            pair[index]()
+        except Exception as e:
+            logger.error(f"Hook de transaction en échec: {e}")
+
+
+# ── Écrivain unique ────────────────────────────────────
+#
+# Les écritures sont mises en file et exécutées dans l'ordre par le
+# thread d'écriture. Commit groupé : tout ce qui attend dans la file
+# (jusqu'à DB_WRITE_BATCH écritures) part dans une seule transaction,
+# chaque écriture sous son SAVEPOINT — un seul fsync pour la rafale
+# d'un rebalancing, et un échec n'annule que sa propre écriture.
+
+_writes = queue.Queue()
+_writer_lock = threading.Lock()
+_writer_thread = None
+_writer_conn = None
+
+
+class _Write:
+    __slots__ = ("fn", "args", "kwargs", "queued_at", "done", "result", "error")
+
+    def __init__(self, fn, args, kwargs):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.queued_at = time.monotonic()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def write(fn, *args, **kwargs):
+    """Exécute `fn(*args, **kwargs)` sur le thread d'écriture, dans une
+    transaction, et attend son commit. Retourne le résultat de `fn` ou
+    relance son exception.
+
+    Depuis le thread d'écriture (écriture imbriquée, hook), `fn` est
+    exécutée sur place sous SAVEPOINT. `fn` ne doit ni faire d'appel
+    réseau ni attendre un autre thread qui écrit.
+    """
+    if _is_writer():
+        with transaction():
+            return fn(*args, **kwargs)
+    _start_writer()
+    job = _Write(fn, args, kwargs)
+    _writes.put(job)
+    depth = _writes.qsize()
+    with _stats_lock:
+        _stats["queue_depth_max"] = max(_stats["queue_depth_max"], depth)
+    job.done.wait()
+    if job.error is not None:
+        raise job.error
+    return job.result
+
+
+def writes(fn):
+    """Décorateur des fonctions qui modifient la base (cf. `write`)."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        return write(fn, *args, **kwargs)
+    return wrapper
+
+
+def _start_writer():
+    global _writer_thread
+    if _writer_thread is not None and _writer_thread.is_alive():
+        return
+    with _writer_lock:
+        if _writer_thread is None or not _writer_thread.is_alive():
+            ready = threading.Event()
+            _writer_thread = threading.Thread(
+                target=_writer_loop, args=(ready,), name="calvalot-db-writer", daemon=True,
+            )
+            _writer_thread.start()
+            ready.wait()
+            _start_checkpointer()
+
+
+def _writer_loop(ready):
+    global _writer_conn
+    _writer_conn = _connect()
+    # Pas de checkpoint automatique au commit : cf. _checkpoint_loop
+    _writer_conn.execute("PRAGMA wal_autocheckpoint=0")
+    ready.set()
+    while True:
+        batch = [_writes.get()]
+        while len(batch) < Settings.DB_WRITE_BATCH:
+            try:
+                batch.append(_writes.get_nowait())
+            except queue.Empty:
+                break
+        _commit_batch(batch)
+
+
+def _commit_batch(batch):
+    started = time.monotonic()
+    try:
+        with transaction():
+            for job in batch:
+                try:
+                    with transaction():
+                        job.result = job.fn(*job.args, **job.kwargs)
+                except Exception as e:
+                    job.error = e
+    except Exception as e:
+        logger.error(f"Commit groupé en échec ({len(batch)} écriture(s)): {e}")
+        for job in batch:
+            if job.error is None:
+                job.error = e
+    finished = time.monotonic()
+
+    tx_ms = (finished - started) * 1000
+    if tx_ms > _SLOW_TX_MS:
+        logger.warning(f"Transaction d'écriture lente: {tx_ms:.0f} ms ({len(batch)} écriture(s))")
+    with _stats_lock:
+        _stats["writes"] += len(batch)
+        _stats["write_errors"] += sum(1 for job in batch if job.error is not None)
+        _stats["batches"] += 1
+        _stats["batch_max"] = max(_stats["batch_max"], len(batch))
+        _stats["commits_since_checkpoint"] += 1
+    _record("write_wait_ms", max((started - job.queued_at) * 1000 for job in batch))
+    _record("tx_ms", tx_ms)
+    for job in batch:
+        job.done.set()
+
+
+# ── Checkpoints ────────────────────────────────────────
+
+_checkpoint_thread = None
+
+
+def _start_checkpointer():
+    global _checkpoint_thread
+    if _checkpoint_thread is None or not _checkpoint_thread.is_alive():
+        _checkpoint_thread = threading.Thread(
+            target=_checkpoint_loop, name="calvalot-db-checkpoint", daemon=True,
+        )
+        _checkpoint_thread.start()
+
+
+def _checkpoint_loop():
+    """Checkpoint PASSIVE périodique, sur une connexion dédiée.
+
+    PASSIVE recopie ce qui peut l'être sans attendre lecteurs ni
+    écrivain ; le WAL est réutilisé depuis le début une fois
+    entièrement recopié, et borné sur disque par journal_size_limit.
+    """
+    conn = _connect()
+    conn.execute("PRAGMA journal_size_limit=67108864")
+    while True:
+        time.sleep(Settings.DB_CHECKPOINT_SECONDS)
+        with _stats_lock:
+            pending = _stats["commits_since_checkpoint"]
+        if not pending:
+            continue
+        started = time.monotonic()
+        try:
+            busy, log, done = conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Checkpoint WAL en échec: {e}")
+            continue
+        with _stats_lock:
+            _stats["checkpoints"] += 1
+            if not busy and done >= log:
+                # Sinon (lecteur sur d'anciennes pages) : on repasse au prochain tour
+                _stats["commits_since_checkpoint"] -= pending
+            _stats["checkpoint_busy"] += busy
+            _stats["last_checkpoint"] = {"wal_frames": log, "checkpointed": done,
+                                         "ms": round((time.monotonic() - started) * 1000, 1)}
+
+
+# ── Instrumentation ────────────────────────────────────
+#
+# Attente dans la file d'écriture (pire écriture de chaque lot), durée
+# des transactions, attente d'une connexion de lecture : dernière
+# valeur, moyenne glissante et maximum, comme les stats d'exécution.
+
+_SLOW_TX_MS = 500
+
+_stats_lock = threading.Lock()
+_stats = {
+    "writes": 0,
+    "write_errors": 0,
+    "batches": 0,
+    "batch_max": 0,
+    "queue_depth_max": 0,
+    "commits_since_checkpoint": 0,
+    "checkpoints": 0,
+    "checkpoint_busy": 0,
+    "last_checkpoint": None,
+}
+_timings = {name: {"last": None, "avg": None, "max": None}
+            for name in ("write_wait_ms", "tx_ms", "read_wait_ms")}
+
+
+def _record(name, ms):
+    with _stats_lock:
+        timing = _timings[name]
+        timing["last"] = round(ms, 1)
+        timing["avg"] = round(ms if timing["avg"] is None else timing["avg"] * 0.8 + ms * 0.2, 1)
+        timing["max"] = round(max(ms, timing["max"] or 0), 1)
+
+
+def get_stats():
+    """Stats SQLite pour le dashboard (cf. poller.get_status)."""
+    with _stats_lock:
+        stats = dict(_stats)
+        for name, timing in _timings.items():
+            stats[name] = dict(timing)
+    stats["queue_depth"] = _writes.qsize()
+    stats["readers_open"] = _readers_open
+    stats["readers_idle"] = _readers.qsize()
+    stats["readers_dedicated"] = _readers_dedicated
+    return stats
+
+
+# ── Écritures différées ────────────────────────────────
+#
+# Travail non critique (snapshots : valorisation, puis écriture) sorti
+# du chemin de trading : un thread unique l'exécute dans l'ordre ; ses
+# écritures passent par l'écrivain comme les autres.
+
+_deferred = queue.Queue()
+_deferred_lock = threading.Lock()
+_deferred_thread = None
+
+
+def defer(fn, *args):
+    """Exécute `fn(*args)` plus tard, sur le thread d'écritures différées."""
+    global _deferred_thread
+    with _deferred_lock:
+        if _deferred_thread is None or not _deferred_thread.is_alive():
+            _deferred_thread = threading.Thread(
+                target=_deferred_worker, name="calvalot-db-deferred", daemon=True,
+            )
+            _deferred_thread.start()
+    _deferred.put((fn, args))
+
+
+def wait_deferred():
+    """Attend que les écritures différées en file soient passées."""
+    _deferred.join()
+
+
+def _deferred_worker():
+    while True:
+        fn, args = _deferred.get()
+        try:
+            fn(*args)
+        except Exception as e:
+            logger.error(f"Écriture différée en échec ({getattr(fn, '__name__', fn)}): {e}")
+        finally:
+            _deferred.task_done()
+
+
 def init_db():
-    """Crée les tables si elles n'existent pas."""
-    conn = _get_conn()
-    conn.executescript("""
+    """Crée les tables si elles n'existent pas, puis applique les migrations.
+
+    `_BASE_SCHEMA` est le schéma d'origine (version 0), joué seulement
+    sur une base en version 0 : les évolutions passent toutes par
+    `_MIGRATIONS`, y compris sur une base neuve.
+    """
+    conn = _connect()
+    try:
+        if conn.execute("PRAGMA user_version").fetchone()[0] == 0:
+            conn.executescript(_BASE_SCHEMA)
+        _migrate(conn)
+    finally:
+        conn.close()
+    logger.info(f"Database initialized: {Settings.DB_PATH}")
+
+
+_BASE_SCHEMA = """
         -- Budget simplifié (pas de budget AI)
         CREATE TABLE IF NOT EXISTS budget (
             id INTEGER PRIMARY KEY,
@@ -116,9 +592,440 @@ def init_db():
             created_at TEXT DEFAULT (datetime('now'))
         );
 
+        -- Journal des ordres : intention écrite avant l'envoi à Binance
+        CREATE TABLE IF NOT EXISTS order_intents (
+            client_order_id TEXT PRIMARY KEY,
+            signal_id TEXT,
+            coin TEXT NOT NULL,
+            side TEXT NOT NULL,
+            quote_amount REAL,
+            quantity REAL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            order_id INTEGER,
+            trade_id INTEGER,
+            error_message TEXT,
+            created_ms INTEGER NOT NULL,
+            updated_at TEXT DEFAULT (datetime('now'))
+        );
+
         -- Index pour les requêtes fréquentes
         CREATE INDEX IF NOT EXISTS idx_trades_created_at ON trades(created_at DESC);
         CREATE INDEX IF NOT EXISTS idx_signals_signal_id ON signals(signal_id);
         CREATE INDEX IF NOT EXISTS idx_snapshots_created_at ON budget_snapshots(created_at DESC);
-    """)
-    logger.info(f"Database initialized: {Settings.DB_PATH}")
+        CREATE INDEX IF NOT EXISTS idx_order_intents_pending
+            ON order_intents(created_ms) WHERE status = 'pending';
+"""
+
+
+# Recalcul complet du grand livre du cash depuis trades et withdrawals
+# (migration et `python -m tools.ledger rebuild`). withdrawals garde des
+# REAL : conversion à l'échelle USDC (8), figée par la migration 3.
+# Horodatages : entiers en millisecondes epoch (UTC) depuis la migration 5
+NOW_MS = "CAST(ROUND((julianday('now') - 2440587.5) * 86400000) AS INTEGER)"
+
+CASH_LEDGER_REBUILD = f"""
+    INSERT OR REPLACE INTO cash_ledger
+        (id, bought_units, sold_units, withdrawn_units, trades, withdrawals, updated_ms)
+    SELECT 1,
+        (SELECT COALESCE(SUM(amount_units), 0) FROM trades WHERE action = 'BUY'),
+        (SELECT COALESCE(SUM(amount_units), 0) FROM trades WHERE action = 'SELL'),
+        (SELECT COALESCE(SUM(CAST(ROUND(amount_usdt_sold * 100000000) AS INTEGER)), 0)
+         FROM withdrawals),
+        (SELECT COUNT(*) FROM trades),
+        (SELECT COUNT(*) FROM withdrawals),
+        {NOW_MS}
+"""
+
+# Conversion REAL → unités à l'échelle 8 (migration 3)
+def _units(column):
+    return f"CAST(ROUND({column} * 100000000) AS INTEGER)"
+
+
+# Conversion datetime('now') TEXT → epoch ms (migration 5)
+def _ms(column):
+    return f"CAST(strftime('%s', {column}) AS INTEGER) * 1000"
+
+
+# Migrations du schéma, appliquées dans l'ordre. Le numéro de la dernière
+# migration appliquée est stocké dans PRAGMA user_version.
+_MIGRATIONS = [
+    # 1 — Qualité d'exécution : prix de référence, VWAP, horodatages
+    """
+    ALTER TABLE trades ADD COLUMN ref_price REAL;
+    ALTER TABLE trades ADD COLUMN slippage_bps REAL;
+    ALTER TABLE trades ADD COLUMN commission_asset TEXT;
+    ALTER TABLE trades ADD COLUMN decided_ms INTEGER;
+    ALTER TABLE trades ADD COLUMN sent_ms INTEGER;
+    ALTER TABLE trades ADD COLUMN filled_ms INTEGER;
+
+    -- Agrégats par coin et par jour (UTC), tenus à jour à chaque trade
+    CREATE TABLE IF NOT EXISTS execution_stats (
+        coin TEXT NOT NULL,
+        day TEXT NOT NULL,
+        trades INTEGER NOT NULL DEFAULT 0,
+        notional_usdt REAL NOT NULL DEFAULT 0,
+        fees_usdt REAL NOT NULL DEFAULT 0,
+        slippage_trades INTEGER NOT NULL DEFAULT 0,
+        slippage_notional_usdt REAL NOT NULL DEFAULT 0,
+        slippage_bps_x_notional REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (coin, day)
+    );
+
+    -- Histogrammes de latence (buckets logarithmiques)
+    CREATE TABLE IF NOT EXISTS execution_latency (
+        coin TEXT NOT NULL,
+        day TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        bucket INTEGER NOT NULL,
+        count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (coin, day, kind, bucket)
+    );
+    CREATE INDEX IF NOT EXISTS idx_execution_stats_day ON execution_stats(day);
+    CREATE INDEX IF NOT EXISTS idx_execution_latency_day ON execution_latency(day);
+    """,
+
+    # 2 — Grand livre du cash : totaux courants, initialisés depuis l'historique
+    """
+    CREATE TABLE IF NOT EXISTS cash_ledger (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        bought_usdt REAL NOT NULL DEFAULT 0,
+        sold_usdt REAL NOT NULL DEFAULT 0,
+        withdrawn_usdt REAL NOT NULL DEFAULT 0,
+        trades INTEGER NOT NULL DEFAULT 0,
+        withdrawals INTEGER NOT NULL DEFAULT 0,
+        updated_at TEXT DEFAULT (datetime('now'))
+    );
+    INSERT OR REPLACE INTO cash_ledger
+        (id, bought_usdt, sold_usdt, withdrawn_usdt, trades, withdrawals)
+    SELECT 1,
+        (SELECT COALESCE(SUM(amount_usdt), 0) FROM trades WHERE action = 'BUY'),
+        (SELECT COALESCE(SUM(amount_usdt), 0) FROM trades WHERE action = 'SELL'),
+        (SELECT COALESCE(SUM(amount_usdt_sold), 0) FROM withdrawals),
+        (SELECT COUNT(*) FROM trades),
+        (SELECT COUNT(*) FROM withdrawals);
+    """,
+
+    # 3 — Virgule fixe : montants et quantités en entiers d'unités (cf. app/money.py).
+    # Les données existantes passent à l'échelle 8, figée pour leurs assets.
+    f"""
+    CREATE TABLE IF NOT EXISTS asset_scales (
+        asset TEXT PRIMARY KEY,
+        scale INTEGER NOT NULL
+    );
+    INSERT OR IGNORE INTO asset_scales (asset, scale) VALUES ('USDC', 8), ('EUR', 8);
+    INSERT OR IGNORE INTO asset_scales (asset, scale)
+        SELECT DISTINCT substr(coin, 1, length(coin) - 4), 8 FROM trades
+        UNION SELECT DISTINCT substr(coin, 1, length(coin) - 4), 8 FROM positions;
+
+    CREATE TABLE trades_fixed (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        coin TEXT NOT NULL,
+        action TEXT NOT NULL,
+        amount_units INTEGER NOT NULL,
+        price_units INTEGER NOT NULL,
+        quantity_units INTEGER NOT NULL,
+        fee_units INTEGER DEFAULT 0,
+        signal_id TEXT,
+        is_simulated INTEGER DEFAULT 1,
+        created_at TEXT DEFAULT (datetime('now')),
+        ref_price_units INTEGER,
+        slippage_bps REAL,
+        commission_asset TEXT,
+        decided_ms INTEGER,
+        sent_ms INTEGER,
+        filled_ms INTEGER
+    );
+    INSERT INTO trades_fixed
+        SELECT id, coin, action, {_units("amount_usdt")}, {_units("price")},
+               {_units("quantity")}, {_units("COALESCE(fee_usdt, 0)")}, signal_id,
+               is_simulated, created_at, {_units("ref_price")}, slippage_bps,
+               commission_asset, decided_ms, sent_ms, filled_ms
+        FROM trades;
+    DROP TABLE trades;
+    ALTER TABLE trades_fixed RENAME TO trades;
+    CREATE INDEX IF NOT EXISTS idx_trades_created_at ON trades(created_at DESC);
+
+    CREATE TABLE positions_fixed (
+        coin TEXT PRIMARY KEY,
+        quantity_units INTEGER NOT NULL DEFAULT 0,
+        avg_entry_price_units INTEGER NOT NULL DEFAULT 0,
+        invested_units INTEGER NOT NULL DEFAULT 0,
+        updated_at TEXT DEFAULT (datetime('now'))
+    );
+    INSERT INTO positions_fixed
+        SELECT coin, {_units("quantity")}, {_units("avg_entry_price")},
+               {_units("total_invested_usdt")}, updated_at
+        FROM positions;
+    DROP TABLE positions;
+    ALTER TABLE positions_fixed RENAME TO positions;
+
+    CREATE TABLE budget_snapshots_fixed (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        total_value_eur_units INTEGER,
+        portfolio_units INTEGER,
+        cash_units INTEGER,
+        created_at TEXT DEFAULT (datetime('now'))
+    );
+    INSERT INTO budget_snapshots_fixed
+        SELECT id, {_units("total_value_eur")}, {_units("portfolio_value_usdt")},
+               {_units("cash_usdt")}, created_at
+        FROM budget_snapshots;
+    DROP TABLE budget_snapshots;
+    ALTER TABLE budget_snapshots_fixed RENAME TO budget_snapshots;
+    CREATE INDEX IF NOT EXISTS idx_snapshots_created_at ON budget_snapshots(created_at DESC);
+
+    DROP TABLE cash_ledger;
+    CREATE TABLE cash_ledger (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        bought_units INTEGER NOT NULL DEFAULT 0,
+        sold_units INTEGER NOT NULL DEFAULT 0,
+        withdrawn_units INTEGER NOT NULL DEFAULT 0,
+        trades INTEGER NOT NULL DEFAULT 0,
+        withdrawals INTEGER NOT NULL DEFAULT 0,
+        updated_at TEXT DEFAULT (datetime('now'))
+    );
+    INSERT OR REPLACE INTO cash_ledger
+        (id, bought_units, sold_units, withdrawn_units, trades, withdrawals, updated_at)
+    SELECT 1,
+        (SELECT COALESCE(SUM(amount_units), 0) FROM trades WHERE action = 'BUY'),
+        (SELECT COALESCE(SUM(amount_units), 0) FROM trades WHERE action = 'SELL'),
+        (SELECT COALESCE(SUM({_units("amount_usdt_sold")}), 0) FROM withdrawals),
+        (SELECT COUNT(*) FROM trades),
+        (SELECT COUNT(*) FROM withdrawals),
+        datetime('now');
+    """,
+
+    # 4 — Agrégats des snapshots par paliers (5 min, 1 h, 1 jour), façon OHLC
+    # sur la valeur totale en EUR ; initialisés depuis les snapshots bruts.
+    """
+    CREATE TABLE IF NOT EXISTS snapshot_rollups (
+        resolution INTEGER NOT NULL,
+        bucket_ts INTEGER NOT NULL,
+        open_units INTEGER NOT NULL,
+        high_units INTEGER NOT NULL,
+        low_units INTEGER NOT NULL,
+        close_units INTEGER NOT NULL,
+        portfolio_units INTEGER,
+        cash_units INTEGER,
+        samples INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (resolution, bucket_ts)
+    ) WITHOUT ROWID;
+    """ + "".join(f"""
+    INSERT OR REPLACE INTO snapshot_rollups
+        SELECT {resolution}, b.bucket_ts, o.total_value_eur_units, b.high, b.low,
+               c.total_value_eur_units, c.portfolio_units, c.cash_units, b.samples
+        FROM (SELECT CAST(strftime('%s', created_at) AS INTEGER)
+                         / {resolution} * {resolution} AS bucket_ts,
+                     MIN(id) AS first_id, MAX(id) AS last_id,
+                     MAX(total_value_eur_units) AS high,
+                     MIN(total_value_eur_units) AS low,
+                     COUNT(*) AS samples
+              FROM budget_snapshots
+              WHERE total_value_eur_units IS NOT NULL
+              GROUP BY 1) b
+        JOIN budget_snapshots o ON o.id = b.first_id
+        JOIN budget_snapshots c ON c.id = b.last_id;
+    """ for resolution in (300, 3600, 86400)),
+
+    # 5 — Horodatages en entiers (epoch ms) au lieu de TEXT datetime('now') :
+    # comparaisons et tris d'entiers, lignes plus courtes.
+    # Les index suivent les requêtes de models.py (couvrants quand c'est
+    # possible), puis ANALYZE renseigne le planificateur.
+    f"""
+    CREATE TABLE budget_v5 (
+        id INTEGER PRIMARY KEY,
+        initial_total_eur REAL NOT NULL,
+        total_deposited_eur REAL NOT NULL DEFAULT 0,
+        status TEXT NOT NULL DEFAULT 'ACTIVE',
+        created_ms INTEGER NOT NULL DEFAULT ({NOW_MS}),
+        updated_ms INTEGER NOT NULL DEFAULT ({NOW_MS})
+    );
+    INSERT INTO budget_v5
+        SELECT id, initial_total_eur, total_deposited_eur, status,
+               COALESCE({_ms("created_at")}, {NOW_MS}), COALESCE({_ms("updated_at")}, {NOW_MS})
+        FROM budget;
+    DROP TABLE budget;
+    ALTER TABLE budget_v5 RENAME TO budget;
+
+    CREATE TABLE trades_v5 (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        coin TEXT NOT NULL,
+        action TEXT NOT NULL,
+        amount_units INTEGER NOT NULL,
+        price_units INTEGER NOT NULL,
+        quantity_units INTEGER NOT NULL,
+        fee_units INTEGER DEFAULT 0,
+        signal_id TEXT,
+        is_simulated INTEGER DEFAULT 1,
+        created_ms INTEGER NOT NULL DEFAULT ({NOW_MS}),
+        ref_price_units INTEGER,
+        slippage_bps REAL,
+        commission_asset TEXT,
+        decided_ms INTEGER,
+        sent_ms INTEGER,
+        filled_ms INTEGER
+    );
+    INSERT INTO trades_v5
+        SELECT id, coin, action, amount_units, price_units, quantity_units, fee_units,
+               signal_id, is_simulated, COALESCE({_ms("created_at")}, {NOW_MS}),
+               ref_price_units, slippage_bps, commission_asset, decided_ms, sent_ms, filled_ms
+        FROM trades;
+    DROP TABLE trades;
+    ALTER TABLE trades_v5 RENAME TO trades;
+    -- Historique paginé (created_ms, id) ; sommes du grand livre sans lire la table
+    CREATE INDEX idx_trades_created_ms ON trades(created_ms);
+    CREATE INDEX idx_trades_action_amount ON trades(action, amount_units);
+
+    CREATE TABLE positions_v5 (
+        coin TEXT PRIMARY KEY,
+        quantity_units INTEGER NOT NULL DEFAULT 0,
+        avg_entry_price_units INTEGER NOT NULL DEFAULT 0,
+        invested_units INTEGER NOT NULL DEFAULT 0,
+        updated_ms INTEGER NOT NULL DEFAULT ({NOW_MS})
+    );
+    INSERT INTO positions_v5
+        SELECT coin, quantity_units, avg_entry_price_units, invested_units,
+               COALESCE({_ms("updated_at")}, {NOW_MS})
+        FROM positions;
+    DROP TABLE positions;
+    ALTER TABLE positions_v5 RENAME TO positions;
+
+    CREATE TABLE signals_v5 (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        signal_id TEXT UNIQUE NOT NULL,
+        confidence REAL,
+        reasoning TEXT,
+        actions TEXT NOT NULL,
+        portfolio_state TEXT,
+        status TEXT DEFAULT 'received',
+        error_message TEXT,
+        received_ms INTEGER NOT NULL DEFAULT ({NOW_MS}),
+        executed_ms INTEGER
+    );
+    INSERT INTO signals_v5
+        SELECT id, signal_id, confidence, reasoning, actions, portfolio_state, status,
+               error_message, COALESCE({_ms("received_at")}, {NOW_MS}), {_ms("executed_at")}
+        FROM signals;
+    DROP TABLE signals;
+    ALTER TABLE signals_v5 RENAME TO signals;
+    -- signal_id : l'index UNIQUE implicite suffit (plus d'idx_signals_signal_id)
+    -- Derniers signaux et dernier signal_id (couvrant)
+    CREATE INDEX idx_signals_received ON signals(received_ms, signal_id);
+
+    CREATE TABLE budget_snapshots_v5 (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        total_value_eur_units INTEGER,
+        portfolio_units INTEGER,
+        cash_units INTEGER,
+        created_ms INTEGER NOT NULL DEFAULT ({NOW_MS})
+    );
+    INSERT INTO budget_snapshots_v5
+        SELECT id, total_value_eur_units, portfolio_units, cash_units,
+               COALESCE({_ms("created_at")}, {NOW_MS})
+        FROM budget_snapshots;
+    DROP TABLE budget_snapshots;
+    ALTER TABLE budget_snapshots_v5 RENAME TO budget_snapshots;
+    -- Fenêtres, comptage, purge et passe de sous-échantillonnage (couvrant)
+    CREATE INDEX idx_snapshots_created_ms
+        ON budget_snapshots(created_ms, total_value_eur_units);
+
+    CREATE TABLE withdrawals_v5 (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        amount_eur_requested REAL,
+        amount_usdt_sold REAL,
+        amount_eur_received REAL,
+        eurusdc_rate REAL,
+        positions_sold TEXT,
+        status TEXT DEFAULT 'completed',
+        is_simulated INTEGER DEFAULT 1,
+        created_ms INTEGER NOT NULL DEFAULT ({NOW_MS})
+    );
+    INSERT INTO withdrawals_v5
+        SELECT id, amount_eur_requested, amount_usdt_sold, amount_eur_received,
+               eurusdc_rate, positions_sold, status, is_simulated,
+               COALESCE({_ms("created_at")}, {NOW_MS})
+        FROM withdrawals;
+    DROP TABLE withdrawals;
+    ALTER TABLE withdrawals_v5 RENAME TO withdrawals;
+    CREATE INDEX idx_withdrawals_created ON withdrawals(created_ms);
+
+    CREATE TABLE order_intents_v5 (
+        client_order_id TEXT PRIMARY KEY,
+        signal_id TEXT,
+        coin TEXT NOT NULL,
+        side TEXT NOT NULL,
+        quote_amount REAL,
+        quantity REAL,
+        status TEXT NOT NULL DEFAULT 'pending',
+        order_id INTEGER,
+        trade_id INTEGER,
+        error_message TEXT,
+        created_ms INTEGER NOT NULL,
+        updated_ms INTEGER NOT NULL DEFAULT ({NOW_MS})
+    );
+    INSERT INTO order_intents_v5
+        SELECT client_order_id, signal_id, coin, side, quote_amount, quantity, status,
+               order_id, trade_id, error_message, created_ms,
+               COALESCE({_ms("updated_at")}, {NOW_MS})
+        FROM order_intents;
+    DROP TABLE order_intents;
+    ALTER TABLE order_intents_v5 RENAME TO order_intents;
+    CREATE INDEX idx_order_intents_pending
+        ON order_intents(created_ms) WHERE status = 'pending';
+
+    CREATE TABLE cash_ledger_v5 (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        bought_units INTEGER NOT NULL DEFAULT 0,
+        sold_units INTEGER NOT NULL DEFAULT 0,
+        withdrawn_units INTEGER NOT NULL DEFAULT 0,
+        trades INTEGER NOT NULL DEFAULT 0,
+        withdrawals INTEGER NOT NULL DEFAULT 0,
+        updated_ms INTEGER NOT NULL DEFAULT ({NOW_MS})
+    );
+    INSERT INTO cash_ledger_v5
+        SELECT id, bought_units, sold_units, withdrawn_units, trades, withdrawals,
+               COALESCE({_ms("updated_at")}, {NOW_MS})
+        FROM cash_ledger;
+    DROP TABLE cash_ledger;
+    ALTER TABLE cash_ledger_v5 RENAME TO cash_ledger;
+
+    ANALYZE;
+    """,
+
+    # 6 — Pagination par curseur (keyset) sur (horodatage, id) : chaque
+    # filtre a un index dans l'ordre de la page, id (rowid) en fin de clé.
+    """
+    CREATE INDEX idx_trades_coin_created ON trades(coin, created_ms);
+    CREATE INDEX idx_trades_action_created ON trades(action, created_ms);
+    -- id explicite : le tri (received_ms, id) suit l'index, toujours couvrant
+    DROP INDEX idx_signals_received;
+    CREATE INDEX idx_signals_received ON signals(received_ms, id, signal_id);
+    CREATE INDEX idx_signals_status_received ON signals(status, received_ms);
+    ANALYZE;
+    """,
+]
+
+
+def optimize():
+    """Statistiques du planificateur à jour (PRAGMA optimize, cf. la purge
+    quotidienne du poller) : relance ANALYZE là où il est utile."""
+    write(_optimize)
+
+
+def _optimize():
+    with get_cursor() as cur:
+        cur.execute("PRAGMA optimize")
+
+
+def _migrate(conn):
+    """Applique les migrations manquantes (une transaction chacune)."""
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for number, script in enumerate(_MIGRATIONS[version:], start=version + 1):
+        try:
+            conn.executescript(
+                f"BEGIN;\n{script}\nPRAGMA user_version = {number};\nCOMMIT;"
+            )
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        logger.info(f"Migration {number} appliquée")
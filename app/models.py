@@ -1,13 +1,134 @@
-"""Requêtes SQL pour Calv-a-lot (SQLite)."""
+"""Requêtes SQL pour Calv-a-lot (SQLite).
 
+Les fonctions qui modifient la base sont décorées `@writes` : elles
+s'exécutent sur le thread d'écriture (cf. app/db.py), les lectures sur
+le pool de connexions en lecture seule.
+"""
+
+import base64
+import binascii
+import datetime
 import json
 import logging
+import sqlite3
+import time
+from operator import itemgetter
 
-from app.db import get_cursor
+from app import money
+from app.db import CASH_LEDGER_REBUILD, get_cursor, transaction, writes
+from app.services import downsample
 
 logger = logging.getLogger("calvalot.models")
 
 
+# ── Horodatages ───────────────────────────────────────
+#
+# En base : entiers en millisecondes epoch (UTC). En sortie d'API :
+# chaînes ISO 8601 UTC, converties ici comme les montants.
+
+def now_ms():
+    return int(time.time() * 1000)
+
+
+def to_iso(ms):
+    """Epoch ms → '2026-01-31T12:00:00Z' (None reste None)."""
+    if ms is None:
+        return None
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(ms / 1000))
+
+
+def _with_iso(row, *columns):
+    """dict(row) où chaque colonne `x_ms` devient `x_at` en ISO."""
+    data = dict(row)
+    for column in columns:
+        data[column[:-3] + "_at"] = to_iso(data.pop(column))
+    return data
+
+
+def parse_time(value, end=False):
+    """Borne de filtre de l'API → epoch ms.
+
+    Accepte un entier (epoch ms), une date '2026-01-31' ou un datetime
+    ISO 8601 (UTC si sans fuseau). Avec `end=True`, une date seule
+    couvre toute la journée (borne exclusive au lendemain 00:00).
+    Lève ValueError si la valeur n'est pas reconnue.
+    """
+    value = value.strip()
+    if value.isdigit():
+        return int(value)
+    if len(value) == 10:
+        day = datetime.date.fromisoformat(value)
+        if end:
+            day += datetime.timedelta(days=1)
+        return int(datetime.datetime(day.year, day.month, day.day,
+                                     tzinfo=datetime.timezone.utc).timestamp() * 1000)
+    moment = datetime.datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=datetime.timezone.utc)
+    return int(moment.timestamp() * 1000)
+
+
+# ── Pagination (keyset) ───────────────────────────────
+#
+# Historiques paginés du plus récent au plus ancien sur (horodatage, id) :
+# la page suivante reprend strictement après la dernière clé lue, via
+# l'index, au lieu d'un OFFSET. Une page profonde coûte autant que la
+# première. La page est lue d'un bloc puis la connexion rendue au pool :
+# seule la sérialisation JSON est streamée, un client lent ne bloque
+# aucun lecteur. Le curseur est opaque pour le client (base64 de la clé).
+
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(key):
+    """(ms, id) → curseur opaque."""
+    raw = f"{key[0]}:{key[1]}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Curseur opaque → (ms, id). Lève ValueError s'il est invalide."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        ms, row_id = raw.split(":")
+        return int(ms), int(row_id)
+    except (ValueError, UnicodeDecodeError, binascii.Error):
+        raise ValueError("invalid cursor") from None
+
+
+def _keyset_page(table, time_column, filters, limit, cursor, convert):
+    """Page de `table` : liste de (ligne convertie, clé).
+
+    `filters` : liste de (clause SQL, paramètres) combinées par AND.
+    Lit `limit + 1` lignes : une clé au-delà de `limit` signale une page
+    suivante (cf. routes). Un curseur illisible lève ValueError avant
+    toute réponse.
+    """
+    clauses, params = [], []
+    for clause, values in filters:
+        clauses.append(clause)
+        params.extend(values)
+    if cursor:
+        clauses.append(f"({time_column}, id) < (?, ?)")
+        params.extend(decode_cursor(cursor))
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    sql = (f"SELECT * FROM {table} {where} "
+           f"ORDER BY {time_column} DESC, id DESC LIMIT ?")
+    params.append(limit + 1)
+    with get_cursor() as cur:
+        rows = cur.execute(sql, params).fetchall()
+    return [(convert(row), (row[time_column], row["id"])) for row in rows]
+
+
+def _time_filters(column, since_ms, until_ms):
+    filters = []
+    if since_ms is not None:
+        filters.append((f"{column} >= ?", (since_ms,)))
+    if until_ms is not None:
+        filters.append((f"{column} < ?", (until_ms,)))
+    return filters
+
+
 # ── Budget ──────────────────────────────────────────────
 
 def get_budget():
@@ -16,116 +137,323 @@ def get_budget():
         row = cur.fetchone()
         if not row:
             return None
-        return dict(row)
+        return _with_iso(row, "created_ms", "updated_ms")
 
 
+@writes
 def create_budget(initial_total_eur):
     with get_cursor() as cur:
         cur.execute(
-            """INSERT INTO budget (initial_total_eur, total_deposited_eur)
-               VALUES (?, ?)""",
-            (initial_total_eur, initial_total_eur),
+            """INSERT INTO budget (initial_total_eur, total_deposited_eur, created_ms, updated_ms)
+               VALUES (?, ?, ?, ?)""",
+            (initial_total_eur, initial_total_eur, now_ms(), now_ms()),
         )
         return cur.lastrowid
 
 
+@writes
 def update_budget_status(budget_id, status):
     with get_cursor() as cur:
         cur.execute(
-            "UPDATE budget SET status = ?, updated_at = datetime('now') WHERE id = ?",
-            (status, budget_id),
+            "UPDATE budget SET status = ?, updated_ms = ? WHERE id = ?",
+            (status, now_ms(), budget_id),
         )
 
 
+@writes
 def update_budget_deposited(budget_id, total_deposited_eur):
     with get_cursor() as cur:
         cur.execute(
-            "UPDATE budget SET total_deposited_eur = ?, updated_at = datetime('now') WHERE id = ?",
-            (total_deposited_eur, budget_id),
+            "UPDATE budget SET total_deposited_eur = ?, updated_ms = ? WHERE id = ?",
+            (total_deposited_eur, now_ms(), budget_id),
         )
 
 
 # ── Trades ──────────────────────────────────────────────
 
+@writes
 def insert_trade(coin, action, amount_usdt, price, quantity, fee_usdt=0,
-                 signal_id=None, is_simulated=True):
+                 signal_id=None, is_simulated=True, client_order_id=None,
+                 order_id=None, execution=None):
+    """Enregistre un trade (montants convertis en unités, cf. app/money.py).
+
+    Le grand livre du cash est mis à jour dans la même transaction
+    (celle de l'appelant s'il en a ouvert une, cf. `db.transaction`).
+    Avec `client_order_id`, l'intention d'ordre correspondante passe à
+    'filled' dans la même transaction : un fill est soit journalisé et
+    rattaché à son trade, soit encore en attente de réconciliation.
+    `execution` (cf. `execution_quality.measure`) renseigne les colonnes
+    de qualité d'exécution et met à jour les agrégats du jour.
+    """
+    ex = execution or {}
+    base, quote = money.assets(coin)
+    amount_units = money.to_units(amount_usdt, quote)
+    created_ms = now_ms()
+    with transaction():
+        with get_cursor() as cur:
+            cur.execute(
+                """INSERT INTO trades (coin, action, amount_units, price_units, quantity_units,
+                                       fee_units, signal_id, is_simulated,
+                                       ref_price_units, slippage_bps, commission_asset,
+                                       decided_ms, sent_ms, filled_ms, created_ms)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (coin, action, amount_units, money.to_units(price, quote),
+                 money.to_units(quantity, base), money.to_units(fee_usdt or 0, quote),
+                 signal_id, 1 if is_simulated else 0,
+                 money.to_units(ex.get("ref_price"), quote), ex.get("slippage_bps"),
+                 ex.get("commission_asset"),
+                 ex.get("decided_ms"), ex.get("sent_ms"), ex.get("filled_ms"), created_ms),
+            )
+            trade_id = cur.lastrowid
+            total = "bought_units" if action == "BUY" else "sold_units"
+            cur.execute(
+                f"""UPDATE cash_ledger
+                    SET {total} = {total} + ?, trades = trades + 1, updated_ms = ?
+                    WHERE id = 1""",
+                (amount_units, created_ms),
+            )
+            if client_order_id:
+                cur.execute(
+                    """UPDATE order_intents
+                       SET status = 'filled', order_id = ?, trade_id = ?, updated_ms = ?
+                       WHERE client_order_id = ?""",
+                    (order_id, trade_id, created_ms, client_order_id),
+                )
+        if execution:
+            # Statistiques sous savepoint : un échec ne coûte pas le trade
+            try:
+                with transaction(), get_cursor() as cur:
+                    _add_execution_stats(cur, coin, float(amount_usdt),
+                                         float(fee_usdt or 0), execution)
+            except sqlite3.Error as e:
+                logger.warning(f"Stats d'exécution non enregistrées ({coin}): {e}")
+        return trade_id
+
+
+def _add_execution_stats(cur, coin, amount_usdt, fee_usdt, ex):
+    slippage = ex.get("slippage_bps")
+    cur.execute(
+        """INSERT INTO execution_stats
+           (coin, day, trades, notional_usdt, fees_usdt,
+            slippage_trades, slippage_notional_usdt, slippage_bps_x_notional)
+           VALUES (?, ?, 1, ?, ?, ?, ?, ?)
+           ON CONFLICT (coin, day) DO UPDATE SET
+               trades = trades + 1,
+               notional_usdt = notional_usdt + excluded.notional_usdt,
+               fees_usdt = fees_usdt + excluded.fees_usdt,
+               slippage_trades = slippage_trades + excluded.slippage_trades,
+               slippage_notional_usdt = slippage_notional_usdt + excluded.slippage_notional_usdt,
+               slippage_bps_x_notional = slippage_bps_x_notional + excluded.slippage_bps_x_notional""",
+        (coin, ex["day"], amount_usdt, fee_usdt,
+         0 if slippage is None else 1,
+         0 if slippage is None else amount_usdt,
+         0 if slippage is None else slippage * amount_usdt),
+    )
+    for kind, bucket in ex.get("latency_buckets", {}).items():
+        cur.execute(
+            """INSERT INTO execution_latency (coin, day, kind, bucket, count)
+               VALUES (?, ?, ?, ?, 1)
+               ON CONFLICT (coin, day, kind, bucket) DO UPDATE SET count = count + 1""",
+            (coin, ex["day"], kind, bucket),
+        )
+
+
+def get_execution_stats(since_day=None):
+    """Agrégats de qualité d'exécution depuis `since_day` (YYYY-MM-DD)."""
+    since_day = since_day or "0000-00-00"
+    with get_cursor() as cur:
+        cur.execute("SELECT * FROM execution_stats WHERE day >= ?", (since_day,))
+        stats = [dict(row) for row in cur.fetchall()]
+        cur.execute("SELECT * FROM execution_latency WHERE day >= ?", (since_day,))
+        latency = [dict(row) for row in cur.fetchall()]
+        return stats, latency
+
+
+def iter_trades(limit=20, cursor=None, coin=None, action=None, since_ms=None, until_ms=None):
+    """Trades du plus récent au plus ancien (cf. `_keyset_page`)."""
+    filters = _time_filters("created_ms", since_ms, until_ms)
+    if coin:
+        filters.append(("coin = ?", (coin,)))
+    if action:
+        filters.append(("action = ?", (action,)))
+    return _keyset_page("trades", "created_ms", filters, limit, cursor, _trade_row)
+
+
+def _trade_row(row):
+    """Ligne trades → dict JSON (montants en float, clés d'origine)."""
+    trade = _with_iso(row, "created_ms")
+    base, quote = money.assets(trade["coin"])
+    trade["amount_usdt"] = money.to_float(trade.pop("amount_units"), quote)
+    trade["price"] = money.to_float(trade.pop("price_units"), quote)
+    trade["quantity"] = money.to_float(trade.pop("quantity_units"), base)
+    trade["fee_usdt"] = money.to_float(trade.pop("fee_units"), quote)
+    trade["ref_price"] = money.to_float(trade.pop("ref_price_units"), quote)
+    return trade
+
+
+# ── Journal des ordres ─────────────────────────────────
+
+@writes
+def open_order_intent(client_order_id, signal_id, coin, side, created_ms,
+                      quote_amount=None, quantity=None):
+    """Journalise un ordre avant son envoi.
+
+    Retourne None si l'ordre peut partir (intention nouvelle, ou échec
+    précédent rejoué), sinon le statut de l'intention existante
+    ('pending' ou 'filled') : l'ordre a peut-être déjà été exécuté.
+    """
     with get_cursor() as cur:
         cur.execute(
-            """INSERT INTO trades (coin, action, amount_usdt, price, quantity,
-                                   fee_usdt, signal_id, is_simulated)
+            """INSERT OR IGNORE INTO order_intents
+               (client_order_id, signal_id, coin, side, quote_amount, quantity,
+                created_ms, updated_ms)
                VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
-            (coin, action, amount_usdt, price, quantity, fee_usdt,
-             signal_id, 1 if is_simulated else 0),
+            (client_order_id, signal_id, coin, side, quote_amount, quantity,
+             created_ms, now_ms()),
         )
-        return cur.lastrowid
+        if cur.rowcount:
+            return None
+        cur.execute(
+            "SELECT status FROM order_intents WHERE client_order_id = ?",
+            (client_order_id,),
+        )
+        status = cur.fetchone()["status"]
+        if status != "failed":
+            return status
+        cur.execute(
+            """UPDATE order_intents
+               SET status = 'pending', quote_amount = ?, quantity = ?,
+                   error_message = NULL, created_ms = ?, updated_ms = ?
+               WHERE client_order_id = ?""",
+            (quote_amount, quantity, created_ms, now_ms(), client_order_id),
+        )
+        return None
 
 
-def get_recent_trades(limit=20):
+@writes
+def fail_order_intent(client_order_id, error_message=None):
     with get_cursor() as cur:
         cur.execute(
-            "SELECT * FROM trades ORDER BY created_at DESC LIMIT ?",
-            (limit,),
+            """UPDATE order_intents
+               SET status = 'failed', error_message = ?, updated_ms = ?
+               WHERE client_order_id = ?""",
+            (error_message, now_ms(), client_order_id),
         )
+
+
+def get_pending_order_intents(max_created_ms=None):
+    """Intentions envoyées dont l'issue n'est pas connue (index partiel)."""
+    with get_cursor() as cur:
+        if max_created_ms is not None:
+            cur.execute(
+                """SELECT * FROM order_intents
+                   WHERE status = 'pending' AND created_ms <= ?
+                   ORDER BY created_ms""",
+                (max_created_ms,),
+            )
+        else:
+            cur.execute(
+                "SELECT * FROM order_intents WHERE status = 'pending' ORDER BY created_ms"
+            )
         return [dict(row) for row in cur.fetchall()]
 
 
 # ── Positions ───────────────────────────────────────────
 
 def get_positions():
+    """Positions pour l'API (quantités et montants en float)."""
+    return [_position_row(row) for row in get_positions_units()]
+
+
+def get_positions_units():
+    """Positions brutes, en unités (cf. PortfolioState)."""
     with get_cursor() as cur:
         cur.execute("SELECT * FROM positions ORDER BY coin")
         return [dict(row) for row in cur.fetchall()]
 
 
-def get_position(coin):
-    with get_cursor() as cur:
-        cur.execute("SELECT * FROM positions WHERE coin = ?", (coin,))
-        row = cur.fetchone()
-        return dict(row) if row else None
+def _position_row(row):
+    base, quote = money.assets(row["coin"])
+    return {
+        "coin": row["coin"],
+        "quantity": money.to_float(row["quantity_units"], base),
+        "avg_entry_price": money.to_float(row["avg_entry_price_units"], quote),
+        "total_invested_usdt": money.to_float(row["invested_units"], quote),
+        "updated_at": to_iso(row["updated_ms"]),
+    }
 
 
-def upsert_position(coin, quantity, avg_entry_price, total_invested_usdt):
+@writes
+def upsert_position(coin, quantity_units, avg_entry_price_units, invested_units):
     with get_cursor() as cur:
         cur.execute(
-            """INSERT INTO positions (coin, quantity, avg_entry_price, total_invested_usdt)
-               VALUES (?, ?, ?, ?)
+            """INSERT INTO positions
+                   (coin, quantity_units, avg_entry_price_units, invested_units, updated_ms)
+               VALUES (?, ?, ?, ?, ?)
                ON CONFLICT (coin) DO UPDATE SET
-                   quantity = excluded.quantity,
-                   avg_entry_price = excluded.avg_entry_price,
-                   total_invested_usdt = excluded.total_invested_usdt,
-                   updated_at = datetime('now')""",
-            (coin, quantity, avg_entry_price, total_invested_usdt),
+                   quantity_units = excluded.quantity_units,
+                   avg_entry_price_units = excluded.avg_entry_price_units,
+                   invested_units = excluded.invested_units,
+                   updated_ms = excluded.updated_ms""",
+            (coin, quantity_units, avg_entry_price_units, invested_units, now_ms()),
         )
 
 
 # ── Signaux ─────────────────────────────────────────────
 
+@writes
 def insert_signal(signal_id, confidence, reasoning, actions, portfolio_state,
                   status="received"):
     with get_cursor() as cur:
         cur.execute(
             """INSERT OR IGNORE INTO signals
-               (signal_id, confidence, reasoning, actions, portfolio_state, status)
-               VALUES (?, ?, ?, ?, ?, ?)""",
+               (signal_id, confidence, reasoning, actions, portfolio_state, status, received_ms)
+               VALUES (?, ?, ?, ?, ?, ?, ?)""",
             (signal_id, confidence, reasoning,
-             json.dumps(actions), json.dumps(portfolio_state), status),
+             json.dumps(actions), json.dumps(portfolio_state), status, now_ms()),
         )
         return cur.lastrowid
 
 
+@writes
+def insert_signals_batch(signals):
+    """Insère plusieurs signaux dans une seule transaction.
+
+    `signals` : liste de dicts (signal du leader + clé "status").
+    Retourne l'ensemble des signal_id réellement insérés (les doublons
+    déjà en base sont ignorés).
+    """
+    inserted = set()
+    received_ms = now_ms()
+    with get_cursor() as cur:
+        for s in signals:
+            cur.execute(
+                """INSERT OR IGNORE INTO signals
+                   (signal_id, confidence, reasoning, actions, portfolio_state, status,
+                    received_ms)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                (s["signal_id"], s.get("confidence", 0), s.get("reasoning", ""),
+                 json.dumps(s.get("actions", [])), json.dumps(s.get("portfolio_state")),
+                 s.get("status", "received"), received_ms),
+            )
+            if cur.rowcount:
+                inserted.add(s["signal_id"])
+    return inserted
+
+
 def signal_exists(signal_id):
     with get_cursor() as cur:
         cur.execute("SELECT 1 FROM signals WHERE signal_id = ?", (signal_id,))
         return cur.fetchone() is not None
 
 
+@writes
 def update_signal_status(signal_id, status, error_message=None):
     with get_cursor() as cur:
         if status == "executed":
             cur.execute(
-                """UPDATE signals SET status = ?, executed_at = datetime('now')
-                   WHERE signal_id = ?""",
-                (status, signal_id),
+                "UPDATE signals SET status = ?, executed_ms = ? WHERE signal_id = ?",
+                (status, now_ms(), signal_id),
             )
         else:
             cur.execute(
@@ -134,106 +462,354 @@ def update_signal_status(signal_id, status, error_message=None):
             )
 
 
-def get_recent_signals(limit=20):
-    with get_cursor() as cur:
-        cur.execute(
-            "SELECT * FROM signals ORDER BY received_at DESC LIMIT ?",
-            (limit,),
-        )
-        rows = [dict(row) for row in cur.fetchall()]
-        for row in rows:
-            if row.get("actions"):
-                row["actions"] = json.loads(row["actions"])
-            if row.get("portfolio_state"):
-                row["portfolio_state"] = json.loads(row["portfolio_state"])
-        return rows
+def iter_signals(limit=20, cursor=None, status=None, coin=None, action=None,
+                 since_ms=None, until_ms=None):
+    """Signaux du plus récent au plus ancien (cf. `_keyset_page`).
+
+    `coin` / `action` : signaux dont au moins une action correspond.
+    """
+    filters = _time_filters("received_ms", since_ms, until_ms)
+    if status:
+        filters.append(("status = ?", (status,)))
+    if coin or action:
+        filters.append((
+            """EXISTS (SELECT 1 FROM json_each(signals.actions)
+                       WHERE (? IS NULL OR json_extract(value, '$.coin') = ?)
+                         AND (? IS NULL OR json_extract(value, '$.action') = ?))""",
+            (coin, coin, action, action),
+        ))
+    return _keyset_page("signals", "received_ms", filters, limit, cursor, _signal_row)
+
+
+def _signal_row(row):
+    signal = _with_iso(row, "received_ms", "executed_ms")
+    if signal.get("actions"):
+        signal["actions"] = json.loads(signal["actions"])
+    if signal.get("portfolio_state"):
+        signal["portfolio_state"] = json.loads(signal["portfolio_state"])
+    return signal
 
 
 def get_last_signal_id():
     """Retourne le signal_id du dernier signal traité."""
     with get_cursor() as cur:
         cur.execute(
-            "SELECT signal_id FROM signals ORDER BY received_at DESC LIMIT 1"
+            "SELECT signal_id FROM signals ORDER BY received_ms DESC, id DESC LIMIT 1"
         )
         row = cur.fetchone()
         return row["signal_id"] if row else None
 
 
 # ── Budget Snapshots ───────────────────────────────────
+#
+# Snapshots bruts gardés RAW_SNAPSHOT_DAYS jours ; au-delà, l'historique
+# vit dans snapshot_rollups : un bucket par palier, mis à jour à chaque
+# insertion (ouverture, plus haut, plus bas, clôture de la valeur en EUR).
+# Stockage et taille des réponses restent bornés quelle que soit la période.
+
+RAW_SNAPSHOT_DAYS = 7
+
+# (nom, résolution en secondes, rétention en jours — None = illimitée)
+SNAPSHOT_TIERS = (
+    ("5m", 300, 14),
+    ("1h", 3600, 90),
+    ("1d", 86400, None),
+)
+
+# Points max d'une réponse servie depuis les agrégats (1 semaine à 5 min)
+_MAX_HISTORY_POINTS = 2016
+
 
+@writes
 def insert_snapshot(total_value_eur, portfolio_value_usdt, cash_usdt):
+    created_ms = now_ms()
+    now = created_ms // 1000
+    eur_units = money.to_units(total_value_eur, "EUR")
+    portfolio_units = money.to_units(portfolio_value_usdt, "USDC")
+    cash_units = money.to_units(cash_usdt, "USDC")
     with get_cursor() as cur:
         cur.execute(
-            """INSERT INTO budget_snapshots (total_value_eur, portfolio_value_usdt, cash_usdt)
-               VALUES (?, ?, ?)""",
-            (total_value_eur, portfolio_value_usdt, cash_usdt),
+            """INSERT INTO budget_snapshots
+                   (total_value_eur_units, portfolio_units, cash_units, created_ms)
+               VALUES (?, ?, ?, ?)""",
+            (eur_units, portfolio_units, cash_units, created_ms),
         )
+        for _, resolution, _ in SNAPSHOT_TIERS:
+            cur.execute(
+                """INSERT INTO snapshot_rollups
+                       (resolution, bucket_ts, open_units, high_units, low_units,
+                        close_units, portfolio_units, cash_units, samples)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, 1)
+                   ON CONFLICT (resolution, bucket_ts) DO UPDATE SET
+                       high_units = MAX(high_units, excluded.high_units),
+                       low_units = MIN(low_units, excluded.low_units),
+                       close_units = excluded.close_units,
+                       portfolio_units = excluded.portfolio_units,
+                       cash_units = excluded.cash_units,
+                       samples = samples + 1""",
+                (resolution, now // resolution * resolution, eur_units, eur_units,
+                 eur_units, eur_units, portfolio_units, cash_units),
+            )
 
 
-def get_snapshots(limit=1440, hours=None):
+def get_snapshots(limit=1440, hours=None, points=None, method="lttb"):
+    """Snapshots bruts, du plus récent au plus ancien.
+
+    Avec `points`, toute la fenêtre est lue en flux sur le cursor et
+    réduite à `points` points (cf. app/services/downsample.py) ; `limit`
+    ne s'applique pas.
+    """
+    where, params = "", []
+    if hours:
+        where = "WHERE created_ms > ?"
+        params.append(now_ms() - hours * 3_600_000)
     with get_cursor() as cur:
-        if hours:
+        if points:
+            cur.execute(f"SELECT COUNT(*) FROM budget_snapshots {where}", params)
+            count = cur.fetchone()[0]
+            ids = _downsampled_keys(
+                cur, count, points, method,
+                f"""SELECT id, created_ms, total_value_eur_units
+                    FROM budget_snapshots {where}
+                    ORDER BY created_ms DESC""",
+                params,
+            )
             cur.execute(
                 """SELECT * FROM budget_snapshots
-                   WHERE created_at > datetime('now', ? || ' hours')
-                   ORDER BY created_at DESC LIMIT ?""",
-                (f"-{hours}", limit),
+                   WHERE id IN (SELECT value FROM json_each(?))
+                   ORDER BY created_ms DESC""",
+                (json.dumps(ids),),
             )
         else:
             cur.execute(
-                "SELECT * FROM budget_snapshots ORDER BY created_at DESC LIMIT ?",
-                (limit,),
+                f"SELECT * FROM budget_snapshots {where} ORDER BY created_ms DESC LIMIT ?",
+                params + [limit],
             )
-        return [dict(row) for row in cur.fetchall()]
+        return [_snapshot_row(row) for row in cur.fetchall()]
+
+
+def _downsampled_keys(cur, count, points, method, sql, params):
+    """Passe unique en flux sur des tuples (clé, x, y) → clés retenues.
+
+    Sans sqlite3.Row ni conversion sur la passe complète : seules les
+    lignes retenues sont relues et converties par l'appelant.
+    """
+    cur.row_factory = None
+    try:
+        cur.execute(sql, params)
+        if method == "minmax":
+            rows = downsample.min_max(cur, count, points, y=itemgetter(2))
+        else:
+            rows = downsample.lttb(cur, count, points, x=itemgetter(1), y=itemgetter(2))
+        return [row[0] for row in rows]
+    finally:
+        cur.row_factory = sqlite3.Row
+
+
+def _snapshot_row(row):
+    return {
+        "id": row["id"],
+        "total_value_eur": money.to_float(row["total_value_eur_units"], "EUR"),
+        "portfolio_value_usdt": money.to_float(row["portfolio_units"], "USDC"),
+        "cash_usdt": money.to_float(row["cash_units"], "USDC"),
+        "created_at": to_iso(row["created_ms"]),
+    }
+
+
+def snapshot_tier(hours):
+    """Palier adapté à une période : None (bruts) jusqu'à 24 h, sinon le
+    plus fin qui tient en _MAX_HISTORY_POINTS points et couvre la période."""
+    if not hours or hours <= 24:
+        return None
+    for name, resolution, keep_days in SNAPSHOT_TIERS:
+        fits = hours * 3600 / resolution <= _MAX_HISTORY_POINTS
+        if fits and (keep_days is None or keep_days * 24 >= hours):
+            return name
+    return SNAPSHOT_TIERS[-1][0]
+
+
+def get_snapshot_rollups(tier, limit=_MAX_HISTORY_POINTS, hours=None, points=None,
+                         method="lttb"):
+    """Buckets d'un palier, du plus récent au plus ancien.
+
+    Mêmes clés que `get_snapshots` (total_value_eur = clôture du bucket,
+    created_at = début du bucket) plus open/high/low et le nombre de
+    snapshots agrégés. `points` : comme pour `get_snapshots`.
+    """
+    resolution = next(r for name, r, _ in SNAPSHOT_TIERS if name == tier)
+    since = int(time.time()) - hours * 3600 if hours else 0
+    params = (resolution, since // resolution * resolution)
+    with get_cursor() as cur:
+        if points:
+            cur.execute(
+                """SELECT COUNT(*) FROM snapshot_rollups
+                   WHERE resolution = ? AND bucket_ts >= ?""",
+                params,
+            )
+            count = cur.fetchone()[0]
+            buckets = _downsampled_keys(
+                cur, count, points, method,
+                """SELECT bucket_ts, bucket_ts, close_units FROM snapshot_rollups
+                   WHERE resolution = ? AND bucket_ts >= ?
+                   ORDER BY bucket_ts DESC""",
+                params,
+            )
+            cur.execute(
+                """SELECT * FROM snapshot_rollups
+                   WHERE resolution = ? AND bucket_ts IN (SELECT value FROM json_each(?))
+                   ORDER BY bucket_ts DESC""",
+                (resolution, json.dumps(buckets)),
+            )
+        else:
+            cur.execute(
+                """SELECT * FROM snapshot_rollups
+                   WHERE resolution = ? AND bucket_ts >= ?
+                   ORDER BY bucket_ts DESC LIMIT ?""",
+                params + (limit,),
+            )
+        return [_rollup_row(row, tier) for row in cur.fetchall()]
+
+
+def _rollup_row(row, tier):
+    return {
+        "total_value_eur": money.to_float(row["close_units"], "EUR"),
+        "open_eur": money.to_float(row["open_units"], "EUR"),
+        "high_eur": money.to_float(row["high_units"], "EUR"),
+        "low_eur": money.to_float(row["low_units"], "EUR"),
+        "portfolio_value_usdt": money.to_float(row["portfolio_units"], "USDC"),
+        "cash_usdt": money.to_float(row["cash_units"], "USDC"),
+        "samples": row["samples"],
+        "resolution": tier,
+        "created_at": to_iso(row["bucket_ts"] * 1000),
+    }
 
 
 # ── Withdrawals ────────────────────────────────────────
 
+@writes
 def insert_withdrawal(amount_eur_requested, amount_usdt_sold=0,
                       amount_eur_received=0, eurusdc_rate=None,
                       positions_sold=None, status="completed", is_simulated=True):
+    created_ms = now_ms()
     with get_cursor() as cur:
         cur.execute(
             """INSERT INTO withdrawals
                (amount_eur_requested, amount_usdt_sold, amount_eur_received,
-                eurusdc_rate, positions_sold, status, is_simulated)
-               VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                eurusdc_rate, positions_sold, status, is_simulated, created_ms)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
             (amount_eur_requested, amount_usdt_sold, amount_eur_received,
              eurusdc_rate, json.dumps(positions_sold or []), status,
-             1 if is_simulated else 0),
+             1 if is_simulated else 0, created_ms),
         )
-        return cur.lastrowid
+        withdrawal_id = cur.lastrowid
+        cur.execute(
+            """UPDATE cash_ledger
+               SET withdrawn_units = withdrawn_units + ?, withdrawals = withdrawals + 1,
+                   updated_ms = ?
+               WHERE id = 1""",
+            (money.to_units(amount_usdt_sold or 0, "USDC"), created_ms),
+        )
+        return withdrawal_id
 
 
-def get_withdrawals(limit=50):
+def iter_withdrawals(limit=50, cursor=None, status=None, since_ms=None, until_ms=None):
+    """Retraits du plus récent au plus ancien (cf. `_keyset_page`)."""
+    filters = _time_filters("created_ms", since_ms, until_ms)
+    if status:
+        filters.append(("status = ?", (status,)))
+    return _keyset_page("withdrawals", "created_ms", filters, limit, cursor,
+                        _withdrawal_row)
+
+
+def _withdrawal_row(row):
+    withdrawal = _with_iso(row, "created_ms")
+    if withdrawal.get("positions_sold"):
+        withdrawal["positions_sold"] = json.loads(withdrawal["positions_sold"])
+    return withdrawal
+
+
+def get_withdrawal_totals():
+    """Totaux de tous les retraits : USDC vendus (grand livre), EUR reçus."""
     with get_cursor() as cur:
-        cur.execute(
-            "SELECT * FROM withdrawals ORDER BY created_at DESC LIMIT ?",
-            (limit,),
-        )
-        rows = [dict(row) for row in cur.fetchall()]
-        for row in rows:
-            if row.get("positions_sold"):
-                row["positions_sold"] = json.loads(row["positions_sold"])
-        return rows
+        cur.execute("SELECT COALESCE(SUM(amount_eur_received), 0) AS eur FROM withdrawals")
+        total_eur = cur.fetchone()["eur"]
+    return get_total_withdrawals(), total_eur
 
 
 def get_total_withdrawals():
     """Total USDC retiré."""
+    return float(get_cash_ledger()["withdrawn_usdt"])
+
+
+# ── Grand livre du cash ────────────────────────────────
+
+_LEDGER_TOTALS = (("bought_units", "bought_usdt"), ("sold_units", "sold_usdt"),
+                  ("withdrawn_units", "withdrawn_usdt"))
+
+
+def _ledger_row(row):
+    ledger = _with_iso(row, "updated_ms") if "updated_ms" in row.keys() else dict(row)
+    for units, name in _LEDGER_TOTALS:
+        ledger[name] = money.from_units(ledger.pop(units), "USDC")
+    return ledger
+
+
+def get_cash_ledger():
+    """Totaux courants achats / ventes / retraits (une ligne, O(1), Decimal)."""
+    with get_cursor() as cur:
+        cur.execute("SELECT * FROM cash_ledger WHERE id = 1")
+        return _ledger_row(cur.fetchone())
+
+
+def verify_cash_ledger():
+    """Compare le grand livre à l'historique complet → (ok, ledger, history).
+
+    Comparaison exacte : les deux côtés sont des sommes d'entiers.
+    """
+    with get_cursor() as cur:
+        cur.execute("SELECT * FROM cash_ledger WHERE id = 1")
+        ledger = dict(cur.fetchone())
+        cur.execute(
+            """SELECT
+                 (SELECT COALESCE(SUM(amount_units), 0) FROM trades WHERE action = 'BUY') AS bought_units,
+                 (SELECT COALESCE(SUM(amount_units), 0) FROM trades WHERE action = 'SELL') AS sold_units,
+                 (SELECT COALESCE(SUM(CAST(ROUND(amount_usdt_sold * 100000000) AS INTEGER)), 0)
+                  FROM withdrawals) AS withdrawn_units,
+                 (SELECT COUNT(*) FROM trades) AS trades,
+                 (SELECT COUNT(*) FROM withdrawals) AS withdrawals"""
+        )
+        history = dict(cur.fetchone())
+    ok = all(ledger[k] == history[k] for k in history)
+    return ok, _ledger_row(ledger), _ledger_row(history)
+
+
+@writes
+def rebuild_cash_ledger():
     with get_cursor() as cur:
-        cur.execute("SELECT COALESCE(SUM(amount_usdt_sold), 0) FROM withdrawals")
-        return cur.fetchone()[0]
+        cur.execute(CASH_LEDGER_REBUILD)
 
 
 # ── Cleanup ────────────────────────────────────────────
 
-def cleanup_old_snapshots(days=30):
+@writes
+def cleanup_old_snapshots(days=RAW_SNAPSHOT_DAYS):
+    """Purge les snapshots bruts de plus de `days` jours et chaque palier
+    d'agrégats au-delà de sa rétention (l'historique long reste en 1d)."""
+    now = int(time.time())
     with get_cursor() as cur:
         cur.execute(
-            "DELETE FROM budget_snapshots WHERE created_at < datetime('now', ? || ' days')",
-            (f"-{days}",),
+            "DELETE FROM budget_snapshots WHERE created_ms < ?",
+            (now * 1000 - days * 86_400_000,),
         )
         deleted = cur.rowcount
+        for _, resolution, keep_days in SNAPSHOT_TIERS:
+            if keep_days is None:
+                continue
+            cur.execute(
+                "DELETE FROM snapshot_rollups WHERE resolution = ? AND bucket_ts < ?",
+                (resolution, now - keep_days * 86400),
+            )
+            deleted += cur.rowcount
         if deleted > 0:
             logger.info(f"Cleaned up {deleted} old snapshots")
         return deleted
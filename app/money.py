@@ -0,0 +1,114 @@
+"""Montants et quantités en virgule fixe (entiers).
+
+En base, chaque montant est un entier d'unités : valeur × 10^échelle,
+l'échelle étant celle de l'asset (précision Binance : baseAssetPrecision
+/ quoteAssetPrecision, 8 par défaut). Plus de REAL : les sommes sont
+exactes et le prix moyen ne dérive plus au fil des allers-retours
+float → str → Decimal.
+
+L'échelle d'un asset est figée en base (table asset_scales) à sa
+première utilisation : une précision Binance qui changerait ensuite ne
+réinterprète pas les lignes déjà écrites.
+"""
+
+import logging
+import threading
+from decimal import Decimal, ROUND_HALF_UP
+
+from app.db import get_cursor, write
+
+logger = logging.getLogger("calvalot.money")
+
+DEFAULT_SCALE = 8
+
+_lock = threading.Lock()
+_scales = None        # asset -> échelle figée (chargé au premier accès)
+_precisions = {}      # asset -> précision annoncée par exchangeInfo
+_symbols = {}         # symbole -> (base, quote)
+_factors = {}         # échelle -> (10^échelle en int, en Decimal)
+
+
+def _factor(scale):
+    factor = _factors.get(scale)
+    if factor is None:
+        factor = _factors[scale] = (10 ** scale, Decimal(10) ** scale)
+    return factor
+
+
+def _load():
+    global _scales
+    with get_cursor() as cur:
+        cur.execute("SELECT asset, scale FROM asset_scales")
+        _scales = {row["asset"]: row["scale"] for row in cur.fetchall()}
+
+
+def scale(asset):
+    """Échelle de l'asset ; figée en base dès la première demande."""
+    if _scales is None:
+        with _lock:
+            if _scales is None:
+                _load()
+    value = _scales.get(asset)
+    if value is not None:
+        return value
+    # Écriture hors verrou : le thread d'écriture peut lui-même attendre
+    # ce verrou (conversion dans une écriture en cours)
+    value = write(_store_scale, asset, _precisions.get(asset, DEFAULT_SCALE))
+    with _lock:
+        if asset not in _scales:
+            _scales[asset] = value
+            logger.info(f"Échelle {asset}: 10^{value}")
+        return _scales[asset]
+
+
+def _store_scale(asset, value):
+    """Fige l'échelle en base ; la première enregistrée l'emporte."""
+    with get_cursor() as cur:
+        cur.execute(
+            "INSERT OR IGNORE INTO asset_scales (asset, scale) VALUES (?, ?)",
+            (asset, value),
+        )
+        cur.execute("SELECT scale FROM asset_scales WHERE asset = ?", (asset,))
+        return cur.fetchone()["scale"]
+
+
+def register_symbol(symbol, base, quote, base_precision=None, quote_precision=None):
+    """Assets d'un symbole et précisions Binance (cf. SymbolRules)."""
+    _symbols[symbol] = (base, quote)
+    if base_precision is not None:
+        _precisions.setdefault(base, int(base_precision))
+    if quote_precision is not None:
+        _precisions.setdefault(quote, int(quote_precision))
+
+
+def assets(symbol):
+    """(base, quote) d'un symbole (BTCUSDC → BTC, USDC par défaut)."""
+    return _symbols.get(symbol) or (symbol[:-4], symbol[-4:])
+
+
+def to_units(value, asset):
+    """Decimal / float / str → entier d'unités.
+
+    Arrondi au plus proche, moitiés loin de zéro : comme ROUND() de
+    SQLite, utilisé par la migration des anciennes valeurs REAL.
+    """
+    if value is None:
+        return None
+    _, dec_factor = _factor(scale(asset))
+    if not isinstance(value, Decimal):
+        value = Decimal(str(value))
+    return int((value * dec_factor).to_integral_value(ROUND_HALF_UP))
+
+
+def from_units(units, asset):
+    """Entier d'unités → Decimal exact."""
+    if units is None:
+        return None
+    return Decimal(units).scaleb(-scale(asset))
+
+
+def to_float(units, asset):
+    """Entier d'unités → float (sérialisation JSON)."""
+    if units is None:
+        return None
+    return units / _factor(scale(asset))[0]
@@ -7,6 +7,8 @@ agent_bp = Blueprint("agent", __name__)
 def agent_status():
     from app.services import poller
     status = poller.get_status()
+    if poller._follower:
+        status["exchange"] = poller._follower.exchange.get_status()
     return jsonify(status)
 
 
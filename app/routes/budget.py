@@ -3,6 +3,7 @@ import logging
 from flask import Blueprint, jsonify, request
 
 from app import models
+from app.routes.pagination import page_args, stream_page
 
 logger = logging.getLogger("calvalot.routes.budget")
 
@@ -28,7 +29,7 @@ def get_budget():
         try:
             cash_usdt = float(follower._get_cash_balance())
             prices = follower.market.get_prices()
-            positions = models.get_positions()
+            positions = follower.portfolio.snapshot().positions
             portfolio_usdt = float(follower._calc_portfolio_value(positions, prices))
             total_usdt = cash_usdt + portfolio_usdt
             eur_rate = float(follower.market.get_eurusdc_rate())
@@ -45,12 +46,43 @@ def get_budget():
 
 @budget_bp.route("/api/budget/history")
 def get_budget_history():
+    """Historique de valeur : snapshots bruts ou agrégats selon la période.
+
+    `resolution` (raw, 5m, 1h, 1d) force un palier ; par défaut celui
+    qui correspond à la période (cf. `models.snapshot_tier`). `points=N`
+    réduit la série à N points côté serveur (`downsample=lttb|minmax`),
+    sur toute la fenêtre : `limit` ne s'applique alors pas.
+    """
     limit = request.args.get("limit", 5000, type=int)
     limit = min(limit, 5000)
     period_map = {"1d": 24, "1w": 168, "1m": 720, "1y": 8760}
     period = request.args.get("period")
     hours = period_map.get(period)
-    snapshots = models.get_snapshots(limit=limit, hours=hours)
+
+    tiers = [name for name, _, _ in models.SNAPSHOT_TIERS]
+    resolution = request.args.get("resolution")
+    if resolution is None:
+        tier = models.snapshot_tier(hours)
+    elif resolution == "raw":
+        tier = None
+    elif resolution in tiers:
+        tier = resolution
+    else:
+        return jsonify({"error": f"resolution must be raw or one of {tiers}"}), 400
+
+    points = request.args.get("points", type=int)
+    if points is not None:
+        points = max(3, min(points, 5000))
+    method = request.args.get("downsample", "lttb")
+    if method not in ("lttb", "minmax"):
+        return jsonify({"error": "downsample must be lttb or minmax"}), 400
+
+    if tier:
+        snapshots = models.get_snapshot_rollups(tier, limit=limit, hours=hours,
+                                                points=points, method=method)
+    else:
+        snapshots = models.get_snapshots(limit=limit, hours=hours,
+                                         points=points, method=method)
     return jsonify(snapshots)
 
 
@@ -105,13 +137,16 @@ def set_deposit():
 
 @budget_bp.route("/api/budget/withdrawals")
 def get_withdrawals():
-    """Historique des retraits."""
-    limit = request.args.get("limit", 50, type=int)
-    withdrawals = models.get_withdrawals(limit=min(limit, 200))
-    total_eur = sum(w.get("amount_eur_received", 0) or 0 for w in withdrawals)
-    total_usdt = models.get_total_withdrawals()
-    return jsonify({
-        "withdrawals": withdrawals,
-        "total_usdt": total_usdt,
-        "total_eur": total_eur,
-    })
+    """Historique des retraits, paginé par curseur (cf. routes/pagination.py).
+
+    Filtres : `status`, `since` / `until`. Les totaux portent sur tous
+    les retraits, indépendamment de la page et des filtres.
+    """
+    try:
+        limit, cursor, since_ms, until_ms = page_args(50)
+        page = models.iter_withdrawals(limit, cursor, status=request.args.get("status"),
+                                       since_ms=since_ms, until_ms=until_ms)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    total_usdt, total_eur = models.get_withdrawal_totals()
+    return stream_page("withdrawals", page, limit, total_usdt=total_usdt, total_eur=total_eur)
@@ -0,0 +1,54 @@
+"""Historiques paginés par curseur, streamés en JSON.
+
+Les routes reçoivent `limit`, `cursor`, `since` / `until` (cf.
+`models.parse_time`) et leurs filtres propres, puis renvoient
+`{<clé>: [...], "next_cursor": ...}` : `next_cursor` est null sur la
+dernière page, sinon à repasser tel quel en `cursor` pour la suivante.
+La page est déjà lue (connexion SQLite rendue) : seule la sérialisation
+JSON est streamée, ligne à ligne.
+"""
+
+from flask import Response, current_app, request, stream_with_context
+
+from app import models
+
+
+def page_args(default_limit):
+    """(limit, cursor, since_ms, until_ms) depuis la query string.
+
+    Lève ValueError (→ 400 dans les routes) sur une date illisible ;
+    le curseur est validé par `models.iter_*`.
+    """
+    limit = request.args.get("limit", default_limit, type=int)
+    limit = max(1, min(limit, models.MAX_PAGE_SIZE))
+    cursor = request.args.get("cursor") or None
+    since = request.args.get("since")
+    until = request.args.get("until")
+    since_ms = models.parse_time(since) if since else None
+    until_ms = models.parse_time(until, end=True) if until else None
+    return limit, cursor, since_ms, until_ms
+
+
+def stream_page(key, page, limit, **extra):
+    """Réponse JSON streamée depuis une page de `models` (paires ligne, clé).
+
+    `extra` : champs ajoutés après la liste (totaux…), déjà calculés.
+    """
+    dumps = current_app.json.dumps
+
+    def generate():
+        yield f'{{"{key}": ['
+        last = next_cursor = None
+        for count, (item, position) in enumerate(page):
+            if count < limit:
+                yield ("," if count else "") + dumps(item)
+                last = position
+            else:
+                # Ligne de trop (LIMIT limit + 1) : page suivante après `last`
+                next_cursor = models.encode_cursor(last)
+        yield f'], "next_cursor": {dumps(next_cursor)}'
+        for name, value in extra.items():
+            yield f", {dumps(name)}: {dumps(value)}"
+        yield "}"
+
+    return Response(stream_with_context(generate()), mimetype="application/json")
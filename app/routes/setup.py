@@ -4,10 +4,7 @@ Serves the setup page and handles config validation/saving.
 When config is saved, starts the poller automatically.
 """
 
-import hashlib
-import hmac
 import logging
-import time
 
 import requests
 from flask import Blueprint, jsonify, request, send_from_directory
@@ -54,18 +51,11 @@ def validate_config():
 
     if leader_url and signal_secret:
         try:
-            # Test with HMAC auth (same as poller)
-            ts = str(int(time.time()))
-            sig = hmac.new(
-                signal_secret.encode(), ts.encode(), hashlib.sha256
-            ).hexdigest()
-            resp = requests.get(
+            # Test with HMAC auth (same client and headers as the poller)
+            from app.services.leader_client import get_leader_client, signed_headers
+            resp = get_leader_client().get(
                 f"{leader_url}/api/signal/latest",
-                headers={
-                    "X-Signal-Timestamp": ts,
-                    "X-Signal-Signature": sig,
-                },
-                timeout=10,
+                headers=signed_headers(signal_secret),
             )
             # 200 = signal available, 204 = no signal yet — both are OK
             if resp.status_code in (200, 204):
@@ -1,13 +1,25 @@
 from flask import Blueprint, jsonify, request
 
 from app import models
+from app.routes.pagination import page_args, stream_page
 
 signals_bp = Blueprint("signals", __name__)
 
 
 @signals_bp.route("/api/signals")
 def get_signals():
-    """Historique des signaux reçus de Cash-a-lot."""
-    limit = request.args.get("limit", 20, type=int)
-    signals = models.get_recent_signals(limit=min(limit, 100))
-    return jsonify(signals)
+    """Historique des signaux reçus de Cash-a-lot, paginé par curseur
+    (cf. routes/pagination.py).
+
+    Filtres : `status`, `coin` / `action` (au moins une action du signal),
+    `since` / `until`.
+    """
+    try:
+        limit, cursor, since_ms, until_ms = page_args(20)
+        page = models.iter_signals(limit, cursor, status=request.args.get("status"),
+                                   coin=request.args.get("coin"),
+                                   action=request.args.get("action"),
+                                   since_ms=since_ms, until_ms=until_ms)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return stream_page("signals", page, limit)
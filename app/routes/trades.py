@@ -1,21 +1,36 @@
+import time
+
 from flask import Blueprint, jsonify, request
 
 from app import models
+from app.routes.pagination import page_args, stream_page
+from app.services.execution_quality import summarize
 
 trades_bp = Blueprint("trades", __name__)
 
 
 @trades_bp.route("/api/trades")
 def get_trades():
-    limit = request.args.get("limit", 20, type=int)
-    trades = models.get_recent_trades(limit=min(limit, 100))
-    return jsonify(trades)
+    """Historique des trades, paginé par curseur (cf. routes/pagination.py).
+
+    Filtres : `coin`, `action` (BUY, SELL), `since` / `until`.
+    """
+    try:
+        limit, cursor, since_ms, until_ms = page_args(20)
+        page = models.iter_trades(limit, cursor, coin=request.args.get("coin"),
+                                  action=request.args.get("action"),
+                                  since_ms=since_ms, until_ms=until_ms)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return stream_page("trades", page, limit)
 
 
 @trades_bp.route("/api/positions")
 def get_positions():
-    positions = models.get_positions()
-    return jsonify(positions)
+    from app.services.poller import _follower
+    if _follower:
+        return jsonify(_follower.portfolio.snapshot().to_list())
+    return jsonify(models.get_positions())
 
 
 @trades_bp.route("/api/prices")
@@ -27,6 +42,26 @@ def get_prices():
     try:
         prices = _follower.market.get_prices()
         # Convertir Decimal → float pour JSON
-        return jsonify({k: float(v) for k, v in prices.items()})
+        return jsonify({k: float(v) for k, v in prices.items() if v is not None})
     except Exception:
         return jsonify({})
+
+
+@trades_bp.route("/api/execution/stats")
+def get_execution_stats():
+    """Qualité d'exécution : slippage (bps) et latences par coin ou par jour.
+
+    `days` : période (défaut 7, 0 = tout) ; `group` : coin (défaut) ou day.
+    Servi depuis les agrégats journaliers, sans parcourir les trades.
+    """
+    days = request.args.get("days", 7, type=int)
+    group = request.args.get("group", "coin")
+    if group not in ("coin", "day"):
+        return jsonify({"error": "group must be coin or day"}), 400
+    since = None
+    if days > 0:
+        since = time.strftime("%Y-%m-%d", time.gmtime(time.time() - (days - 1) * 86400))
+    stats, latency = models.get_execution_stats(since)
+    groups, total = summarize(stats, latency, group=group)
+    return jsonify({"days": days, "group": group, "since": since,
+                    "groups": groups, "total": total})
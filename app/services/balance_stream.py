@@ -0,0 +1,193 @@
+"""Soldes du compte Binance tenus à jour par le user-data stream.
+
+En live, chaque lecture du cash faisait un `get_account()` complet (poids
+20). Ici, un snapshot REST initialise la table des soldes, puis les
+événements `outboundAccountPosition` du user-data stream (listenKey,
+keepalive géré par python-binance) la tiennent à jour sans requête.
+
+- Flux actif : le snapshot n'est resynchronisé qu'à la reconnexion et
+  toutes les 30 minutes (garde-fou contre un événement perdu).
+- Flux absent : un seul snapshot REST en cache, 30 secondes.
+- Entre un fill et son événement, le solde est corrigé localement avec
+  le résultat de l'ordre (sinon le BUY suivant lirait un cash périmé).
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from decimal import Decimal
+
+from app.services.price_stream import _get_manager_class
+
+logger = logging.getLogger("calvalot.balances")
+
+_SNAPSHOT_TTL = 30            # secondes, sans flux
+_STREAM_RESYNC = 30 * 60      # secondes, avec flux
+_START_TIMEOUT = 30           # secondes pour établir la connexion
+_BACKOFF_MAX = 300            # secondes
+
+
+class BalanceService:
+    def __init__(self, client, api_key, api_secret, testnet=False):
+        self.client = client              # binance.Client (snapshot REST)
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.testnet = testnet
+        self._balances = {}               # asset -> Decimal (free)
+        self._snapshot_at = 0.0
+        self._event_time_ms = 0           # `u` du dernier outboundAccountPosition
+        self._lock = threading.Lock()
+        self._snapshot_lock = threading.Lock()
+        self._stream_ok = threading.Event()
+        self._stream_failed = threading.Event()
+        self._twm = None
+        self._stop = threading.Event()
+        self._thread = None
+        self.stats = {"snapshots": 0, "events": 0, "local_fills": 0,
+                      "restarts": 0, "snapshot_errors": 0}
+        self.last_error = None
+
+    # ── Lecture ────────────────────────────────────────
+
+    def get_free(self, asset="USDC"):
+        """Solde libre d'un asset (mémoire, snapshot REST si périmé)."""
+        ttl = _STREAM_RESYNC if self.is_live() else _SNAPSHOT_TTL
+        if time.time() - self._snapshot_at > ttl:
+            self._snapshot()
+        return self._balances.get(asset, Decimal(0))
+
+    def is_live(self):
+        return self._stream_ok.is_set()
+
+    def _snapshot(self):
+        """Snapshot REST (un seul à la fois, les autres réutilisent le résultat)."""
+        started = time.time()
+        with self._snapshot_lock:
+            if self._snapshot_at >= started:
+                return  # un autre thread vient de le faire
+            try:
+                account = self.client.get_account()
+            except Exception as e:
+                self.stats["snapshot_errors"] += 1
+                self.last_error = str(e)
+                logger.error(f"Failed to get account snapshot: {e}")
+                return
+            with self._lock:
+                self._balances = {
+                    b["asset"]: Decimal(b["free"]) for b in account["balances"]
+                }
+                self._event_time_ms = max(self._event_time_ms, account.get("updateTime", 0))
+            self._snapshot_at = time.time()
+            self.stats["snapshots"] += 1
+
+    # ── Mises à jour ───────────────────────────────────
+
+    def apply_fill(self, deltas, transact_time_ms):
+        """Correction locale après un fill : {asset: delta}.
+
+        Ignorée si un événement postérieur à l'ordre a déjà été reçu (il
+        inclut déjà le fill).
+        """
+        with self._lock:
+            if self._event_time_ms >= transact_time_ms:
+                return
+            for asset, delta in deltas.items():
+                self._balances[asset] = self._balances.get(asset, Decimal(0)) + delta
+        self.stats["local_fills"] += 1
+
+    def _on_message(self, msg):
+        if not isinstance(msg, dict):
+            return
+        event = msg.get("e")
+        if event == "error":
+            self.last_error = msg.get("m", "user stream error")
+            self._stream_ok.clear()
+            self._stream_failed.set()
+            return
+        if event == "outboundAccountPosition":
+            with self._lock:
+                for b in msg.get("B", []):
+                    self._balances[b["a"]] = Decimal(b["f"])
+                self._event_time_ms = max(self._event_time_ms, msg.get("u", 0))
+            self.stats["events"] += 1
+
+    # ── Cycle de vie du flux ───────────────────────────
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._supervise, daemon=True, name="calvalot-balance-stream",
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._stream_failed.set()
+        self._stop_manager()
+
+    def _supervise(self):
+        backoff = 5
+        while not self._stop.is_set():
+            self._stream_failed.clear()
+            if self._connect():
+                backoff = 5
+                # Événements manqués pendant la coupure : resynchroniser
+                self._snapshot_at = 0.0
+                self._stream_ok.set()
+                while not self._stream_failed.wait(_START_TIMEOUT):
+                    if self._twm is None or not self._twm.is_alive():
+                        self.last_error = "websocket manager stopped"
+                        break
+                self._stream_ok.clear()
+                logger.warning("User-data stream interrompu, repli REST")
+            self._stop_manager()
+            if self._stop.is_set():
+                return
+            self.stats["restarts"] += 1
+            self._stop.wait(backoff)
+            backoff = min(backoff * 2, _BACKOFF_MAX)
+
+    def _connect(self):
+        try:
+            twm = _get_manager_class()(
+                api_key=self.api_key, api_secret=self.api_secret,
+                testnet=self.testnet, loop=asyncio.new_event_loop(),
+            )
+            twm.daemon = True
+            twm.start()
+            self._twm = twm
+
+            deadline = time.time() + _START_TIMEOUT
+            while getattr(twm, "_bsm", None) is None:
+                if not twm.is_alive() or time.time() > deadline or self._stop.is_set():
+                    self.last_error = str(twm.error or "websocket manager failed to start")
+                    logger.warning("User-data stream indisponible, repli REST")
+                    return False
+                time.sleep(0.2)
+
+            twm.start_user_socket(callback=self._on_message)
+            logger.info("User-data stream connecté (soldes en temps réel)")
+            return True
+        except Exception as e:
+            self.last_error = str(e)
+            logger.warning(f"Erreur démarrage user-data stream: {e}")
+            return False
+
+    def _stop_manager(self):
+        twm, self._twm = self._twm, None
+        if twm is not None and twm.is_alive():
+            try:
+                twm.stop()
+            except Exception:
+                pass
+
+    def get_status(self):
+        return {
+            **self.stats,
+            "live": self.is_live(),
+            "snapshot_age_seconds": round(time.time() - self._snapshot_at) if self._snapshot_at else None,
+            "last_error": self.last_error,
+        }
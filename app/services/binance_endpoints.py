@@ -0,0 +1,232 @@
+"""Sélection de l'hôte API Binance selon la latence mesurée.
+
+Binance expose plusieurs hôtes équivalents (api, api1..api4, api-gcp).
+Un adaptateur `requests` monté sur la session du client Binance réécrit
+l'hôte de chaque requête vers le plus rapide des hôtes sains :
+
+- latence par hôte : moyenne glissante des vraies requêtes + sondes
+  `GET /api/v3/ping` en arrière-plan (toutes les 60 s) ;
+- un hôte en erreur (connexion, 5xx) est écarté 60 s ;
+- lectures doublées (optionnel, GET uniquement) : si la réponse tarde
+  au-delà du p95 de l'hôte, la même requête part vers le 2e hôte et la
+  première réponse gagne. Jamais pour un ordre (POST).
+
+La signature HMAC ne couvre pas l'hôte : la réécriture est transparente.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures import TimeoutError as FutureTimeout
+from urllib.parse import urlsplit, urlunsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger("calvalot.endpoints")
+
+DEFAULT_HOST = "api.binance.com"
+HOSTS = [DEFAULT_HOST, "api1.binance.com", "api2.binance.com",
+         "api3.binance.com", "api4.binance.com", "api-gcp.binance.com"]
+
+_PROBE_INTERVAL = 60     # secondes
+_PROBE_TIMEOUT = 5       # secondes
+_DOWN_SECONDS = 60       # hôte écarté après une erreur
+_SAMPLES = 50            # échantillons pour le p95
+_HEDGE_MIN = 0.05        # secondes
+_HEDGE_MAX = 2.0
+_HEDGE_DEFAULT = 0.5     # tant que le p95 n'est pas connu
+
+
+class _HostStats:
+    def __init__(self):
+        self.ewma_ms = None
+        self.samples = deque(maxlen=_SAMPLES)
+        self.requests = 0
+        self.errors = 0
+        self.down_until = 0.0
+
+    def record(self, ms):
+        self.samples.append(ms)
+        self.ewma_ms = ms if self.ewma_ms is None else self.ewma_ms * 0.8 + ms * 0.2
+
+    def p95_ms(self):
+        if len(self.samples) < 10:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[int(len(ordered) * 0.95) - 1]
+
+
+class EndpointManager:
+    def __init__(self, governor=None, hedge=False, hosts=HOSTS):
+        self.governor = governor
+        self.hedge = hedge
+        self.hosts = list(hosts)
+        self._stats = {h: _HostStats() for h in self.hosts}
+        self._lock = threading.Lock()
+        self._pool = None
+        self._probe_session = requests.Session()
+        self._stop = threading.Event()
+        self._thread = None
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def install(self, session):
+        """Monte l'adaptateur sur la session du client Binance."""
+        session.mount(f"https://{DEFAULT_HOST}", _EndpointAdapter(self))
+
+    # ── Classement ─────────────────────────────────────
+
+    def ranked_hosts(self):
+        """Hôtes sains, du plus rapide au plus lent (hôte par défaut si inconnu)."""
+        now = time.time()
+        with self._lock:
+            healthy = [h for h in self.hosts if self._stats[h].down_until <= now]
+            if not healthy:
+                return [DEFAULT_HOST]
+
+            def key(host):
+                ewma = self._stats[host].ewma_ms
+                return (ewma is None, ewma or 0, host != DEFAULT_HOST)
+
+            return sorted(healthy, key=key)
+
+    def record(self, host, elapsed_ms, ok=True):
+        with self._lock:
+            stats = self._stats[host]
+            stats.requests += 1
+            if ok:
+                stats.record(elapsed_ms)
+            else:
+                stats.errors += 1
+                stats.down_until = time.time() + _DOWN_SECONDS
+                logger.warning(f"Hôte Binance {host} écarté {_DOWN_SECONDS}s")
+
+    def hedge_delay(self, host):
+        with self._lock:
+            p95 = self._stats[host].p95_ms()
+        if p95 is None:
+            return _HEDGE_DEFAULT
+        return min(max(p95 / 1000, _HEDGE_MIN), _HEDGE_MAX)
+
+    def get_pool(self):
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="calvalot-hedge")
+        return self._pool
+
+    # ── Sondes ─────────────────────────────────────────
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._probe_loop, daemon=True, name="calvalot-endpoint-probe",
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _probe_loop(self):
+        while not self._stop.is_set():
+            for host in self.hosts:
+                if self._stop.is_set():
+                    return
+                self._probe(host)
+            self._stop.wait(_PROBE_INTERVAL)
+
+    def _probe(self, host):
+        url = f"https://{host}/api/v3/ping"
+        if self.governor is not None and not self.governor.acquire("get", url, blocking=False):
+            return
+        started = time.perf_counter()
+        try:
+            resp = self._probe_session.get(url, timeout=_PROBE_TIMEOUT)
+            ok = resp.status_code < 500
+        except requests.RequestException:
+            ok = False
+        self.record(host, (time.perf_counter() - started) * 1000, ok=ok)
+
+    def get_status(self):
+        now = time.time()
+        with self._lock:
+            hosts = {
+                h: {
+                    "ewma_ms": round(s.ewma_ms, 1) if s.ewma_ms is not None else None,
+                    "p95_ms": round(s.p95_ms(), 1) if s.p95_ms() is not None else None,
+                    "requests": s.requests,
+                    "errors": s.errors,
+                    "healthy": s.down_until <= now,
+                }
+                for h, s in self._stats.items()
+            }
+        return {
+            "preferred": self.ranked_hosts()[0],
+            "hedged_reads": self.hedge,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "hosts": hosts,
+        }
+
+
+class _EndpointAdapter(HTTPAdapter):
+    """Réécrit l'hôte Binance vers le meilleur hôte, avec lectures doublées."""
+
+    def __init__(self, manager, **kwargs):
+        super().__init__(**kwargs)
+        self.manager = manager
+
+    def send(self, request, **kwargs):
+        hosts = self.manager.ranked_hosts()
+        if self.manager.hedge and request.method == "GET" and len(hosts) > 1:
+            return self._send_hedged(request, hosts, kwargs)
+        return self._send_to(request, hosts[0], kwargs)
+
+    def _send_to(self, request, host, kwargs):
+        req = request.copy()
+        parts = urlsplit(req.url)
+        req.url = urlunsplit(parts._replace(netloc=host))
+        started = time.perf_counter()
+        try:
+            resp = super().send(req, **kwargs)
+        except requests.RequestException:
+            self.manager.record(host, 0, ok=False)
+            raise
+        self.manager.record(
+            host, (time.perf_counter() - started) * 1000, ok=resp.status_code < 500,
+        )
+        return resp
+
+    def _send_hedged(self, request, hosts, kwargs):
+        pool = self.manager.get_pool()
+        primary = pool.submit(self._send_to, request, hosts[0], kwargs)
+        try:
+            return primary.result(timeout=self.manager.hedge_delay(hosts[0]))
+        except FutureTimeout:
+            pass
+
+        # La requête doublée consomme aussi du poids : seulement si disponible
+        governor = self.manager.governor
+        if governor is not None and not governor.acquire(request.method, request.url, blocking=False):
+            return primary.result()
+
+        self.manager.hedges += 1
+        backup = pool.submit(self._send_to, request, hosts[1], kwargs)
+        done, _ = wait([primary, backup], return_when=FIRST_COMPLETED)
+        winner = primary if primary in done else backup
+        loser = backup if winner is primary else primary
+        if winner.exception() is not None:
+            winner, loser = loser, winner
+        if winner is backup:
+            self.manager.hedge_wins += 1
+        loser.add_done_callback(_close_response)
+        return winner.result()
+
+
+def _close_response(future):
+    """Libère la connexion de la réponse perdante."""
+    if future.exception() is None:
+        future.result().close()
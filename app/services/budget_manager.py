@@ -13,8 +13,9 @@ logger = logging.getLogger("calvalot.budget")
 
 
 class BudgetManager:
-    def __init__(self):
+    def __init__(self, portfolio=None):
         self.settings = Settings
+        self.portfolio = portfolio  # PortfolioState partagé (sinon lecture SQLite)
 
     def initialize(self):
         """Initialise le budget au premier lancement."""
@@ -52,7 +53,8 @@ class BudgetManager:
         if not budget:
             return {"status": "UNINITIALIZED"}
 
-        positions = models.get_positions()
+        positions = (self.portfolio.snapshot().positions if self.portfolio
+                     else models.get_positions())
         total_deposited = budget.get("total_deposited_eur") or budget["initial_total_eur"]
 
         return {
@@ -0,0 +1,140 @@
+"""Sous-échantillonnage des séries pour les graphiques.
+
+Deux méthodes, en une seule passe sur un itérable ordonné (typiquement
+le cursor SQLite, sans fetchall) et avec une mémoire bornée à deux
+buckets :
+
+- `lttb` : Largest-Triangle-Three-Buckets. Garde dans chaque bucket le
+  point qui forme le plus grand triangle avec le point retenu avant et
+  la moyenne du bucket suivant : la forme de la courbe et ses pics sont
+  conservés avec `threshold` points ;
+- `min_max` : le plus bas et le plus haut de chaque bucket, dans
+  l'ordre : aucun extrême n'est perdu (jusqu'à 2 points par bucket).
+
+Les buckets sont calculés sur `count`, le nombre de points annoncé
+(COUNT(*) de la même requête). Un écart entre `count` et le nombre de
+lignes réellement lues (snapshot inséré entre les deux requêtes) ne
+fait que déformer légèrement le dernier bucket. Le premier et le
+dernier point sont toujours gardés.
+"""
+
+
+def lttb(rows, count, threshold, x, y):
+    """Points retenus par LTTB (générateur, ordre d'origine préservé).
+
+    `x` et `y` extraient l'abscisse (horodatage) et la valeur d'une
+    ligne. Sous 3 points demandés, ou s'il y en a déjà moins, tout passe.
+    """
+    if threshold >= count or threshold < 3:
+        yield from rows
+        return
+    every = (count - 2) / (threshold - 2)
+    last_bucket = threshold - 3
+
+    it = iter(rows)
+    first = next(it, None)
+    if first is None:
+        return
+    yield first
+    anchor = (x(first), y(first))
+
+    starts = _bucket_starts(every, last_bucket)
+    pending = None   # bucket complet, en attente de la moyenne du suivant
+    current = []
+    next_start = starts[1]
+    bucket = 0
+    held = None      # dernier point lu : traité dès qu'on sait que ce n'est pas le dernier
+    index = 0
+    for row in it:
+        if held is not None:
+            index += 1
+            if index == next_start:
+                if pending:
+                    chosen = _largest_triangle(pending, anchor, _centroid(current))
+                    anchor = chosen[1:]
+                    yield chosen[0]
+                pending, current = current, []
+                bucket += 1
+                next_start = starts[bucket + 1]
+            current.append(held)
+        held = (row, x(row), y(row))
+
+    if held is None:
+        return
+    if pending:
+        chosen = _largest_triangle(pending, anchor, _centroid(current) if current else held[1:])
+        anchor = chosen[1:]
+        yield chosen[0]
+    if current:
+        yield _largest_triangle(current, anchor, held[1:])[0]
+    yield held[0]
+
+
+def _bucket_starts(every, last_bucket):
+    """Premier index (1-based, hors premier point) de chaque bucket LTTB.
+
+    Le point d'index j va dans le bucket min(int((j - 1) / every),
+    last_bucket) ; le dernier élément sert de sentinelle (jamais atteint).
+    """
+    starts = [1]
+    for bucket in range(1, last_bucket + 1):
+        j = int(bucket * every) + 1
+        while int((j - 1) / every) < bucket:
+            j += 1
+        while j > starts[-1] + 1 and int((j - 2) / every) >= bucket:
+            j -= 1
+        starts.append(j)
+    starts.append(-1)
+    return starts
+
+
+def min_max(rows, count, threshold, y):
+    """Plus bas et plus haut de chaque bucket (générateur, ordre d'origine).
+
+    `threshold` borne le nombre de points renvoyés (2 par bucket).
+    """
+    buckets = threshold // 2
+    if threshold >= count or buckets < 1:
+        yield from rows
+        return
+    every = count / buckets
+
+    low = high = None
+    current_bucket = 0
+    for index, row in enumerate(rows):
+        bucket = min(int(index / every), buckets - 1)
+        if bucket != current_bucket:
+            yield from _in_order(low, high)
+            low = high = None
+            current_bucket = bucket
+        value = y(row)
+        if low is None or value < low[1]:
+            low = (index, value, row)
+        if high is None or value > high[1]:
+            high = (index, value, row)
+    if low is not None:
+        yield from _in_order(low, high)
+
+
+def _in_order(low, high):
+    if low[0] == high[0]:
+        return (low[2],)
+    return (low[2], high[2]) if low[0] < high[0] else (high[2], low[2])
+
+
+def _centroid(points):
+    n = len(points)
+    return (sum(p[1] for p in points) / n, sum(p[2] for p in points) / n)
+
+
+def _largest_triangle(points, a, c):
+    """Point de `points` qui maximise l'aire du triangle (a, point, c)."""
+    ax, ay = a
+    cx, cy = c
+    best, best_area = points[0], -1.0
+    for point in points:
+        # Aire × 2 : |(ax - cx)(py - ay) - (ax - px)(cy - ay)|
+        area = abs((ax - cx) * (point[2] - ay) - (ax - point[1]) * (cy - ay))
+        if area > best_area:
+            best, best_area = point, area
+    return best
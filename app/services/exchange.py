@@ -4,13 +4,23 @@ Copie du client Cash-a-lot : même logique d'exécution des ordres,
 même simulation dry_run avec slippage réaliste.
 """
 
+import json
 import logging
-import math
-from decimal import Decimal
+import os
+import time
+from decimal import Decimal, ROUND_DOWN
 
 from binance.client import Client
 from binance.exceptions import BinanceAPIException
 
+from app import money
+from app.services.balance_stream import BalanceService
+from app.services.binance_endpoints import EndpointManager
+from app.services.order_book import OrderBookCache, walk_book
+from app.services.price_cache import PriceCache
+from app.services.rate_governor import RateGovernor, RateLimited
+from app.services.symbol_rules import SymbolRules
+from config.coins import COIN_SYMBOLS
 from config.settings import Settings
 
 logger = logging.getLogger("calvalot.exchange")
@@ -18,23 +28,40 @@ logger = logging.getLogger("calvalot.exchange")
 # Timeout réseau Binance
 _BINANCE_TIMEOUT = 15  # secondes
 
-# stepSize par paire — nombre de décimales autorisées par Binance pour la quantité
-# Source : GET /api/v3/exchangeInfo → filters LOT_SIZE → stepSize
-_STEP_DECIMALS = {
-    "BTCUSDC": 5,   # stepSize 0.00001
-    "ETHUSDC": 4,   # stepSize 0.0001
-    "BNBUSDC": 3,   # stepSize 0.001
-    "SOLUSDC": 3,   # stepSize 0.001
-    "XRPUSDC": 1,   # stepSize 0.1
-}
+# Frais taker Binance (simulation)
+_TAKER_FEE = Decimal("0.001")
 
+# Fenêtre des recherches allOrders/myTrades (24 h max côté Binance)
+_BULK_LOOKUP_MS = 23 * 3600 * 1000
 
-def _truncate_qty(symbol: str, qty: float) -> str:
-    """Tronque la quantité au stepSize Binance (arrondi vers le bas)."""
-    decimals = _STEP_DECIMALS.get(symbol, 8)
-    factor = 10 ** decimals
-    truncated = math.floor(qty * factor) / factor
-    return f"{truncated:.{decimals}f}"
+
+class OrderStatusUnknown(Exception):
+    """Ordre peut-être exécuté, réponse perdue (5xx, -1007) : son intention
+    reste 'pending' jusqu'à la réconciliation."""
+
+
+def _raise_if_unknown(e, symbol, side):
+    if e.status_code >= 500 or e.code == -1007:
+        raise OrderStatusUnknown(f"{side} {symbol}: statut inconnu ({e})") from e
+
+
+def _register_assets(rules):
+    """Assets et précisions Binance → échelles de la virgule fixe."""
+    for rule in rules.values():
+        if rule.base_asset:
+            money.register_symbol(rule.symbol, rule.base_asset, rule.quote_asset,
+                                  rule.base_precision, rule.quote_precision)
+
+
+class _GovernedClient(Client):
+    """Client Binance dont chaque requête passe par le RateGovernor."""
+
+    governor = None
+
+    def _request(self, method, uri, signed, force_params=False, **kwargs):
+        if self.governor is not None:
+            self.governor.acquire(method, uri)
+        return super()._request(method, uri, signed, force_params, **kwargs)
 
 
 class ExchangeClient:
@@ -46,8 +73,19 @@ class ExchangeClient:
             "requests_params": {"timeout": _BINANCE_TIMEOUT},
         }
 
-        if self.testnet:
-            self.client = Client(
+        if Settings.BINANCE_BASE_URL:
+            # Exchange de substitution (benchmarks hors ligne) : pas de ping
+            # vers Binance, toutes les requêtes REST vont vers l'URL donnée.
+            self.client = _GovernedClient(
+                Settings.BINANCE_API_KEY,
+                Settings.BINANCE_API_SECRET,
+                ping=False,
+                **client_kwargs,
+            )
+            self.client.API_URL = f"{Settings.BINANCE_BASE_URL.rstrip('/')}/api"
+            logger.info(f"Binance client initialized ({Settings.BINANCE_BASE_URL})")
+        elif self.testnet:
+            self.client = _GovernedClient(
                 Settings.BINANCE_API_KEY,
                 Settings.BINANCE_API_SECRET,
                 testnet=True,
@@ -55,82 +93,246 @@ class ExchangeClient:
             )
             logger.info("Binance client initialized (TESTNET)")
         else:
-            self.client = Client(
+            self.client = _GovernedClient(
                 Settings.BINANCE_API_KEY,
                 Settings.BINANCE_API_SECRET,
                 **client_kwargs,
             )
             logger.info("Binance client initialized (PRODUCTION)")
 
-    def get_price(self, symbol):
-        """Prix courant d'un symbole."""
+        # Quota de poids Binance partagé par tous les appels
+        self.governor = RateGovernor()
+        self.client.governor = self.governor
+        self.client.session.hooks["response"].append(self.governor.on_response)
+
+        # Hôte API le plus rapide (production uniquement)
+        self.endpoints = None
+        if (not self.testnet and not Settings.BINANCE_BASE_URL
+                and Settings.BINANCE_ENDPOINTS == "auto"):
+            self.endpoints = EndpointManager(self.governor, hedge=Settings.HEDGED_READS)
+            self.endpoints.install(self.client.session)
+
+        # Prix : cache par symbole alimenté par le flux websocket, sinon
+        # par un seul appel REST groupé sur les symboles suivis.
+        self.prices = PriceCache(self._fetch_prices, COIN_SYMBOLS + ["EURUSDC"])
+        self.price_feed = None  # PriceStream (websocket), sinon REST uniquement
+
+        # Filtres Binance par symbole (exchangeInfo, persisté à côté de la base)
+        self.rules = SymbolRules(
+            self.client.get_exchange_info,
+            os.path.join(os.path.dirname(Settings.DB_PATH), "exchange_info.json"),
+            symbols=COIN_SYMBOLS + ["EURUSDC"],
+            on_rate_limits=self.governor.configure,
+            on_rules=_register_assets,
+        )
+        self.prices.listed = self.rules.lists
+
+        # Carnets d'ordres pour la simulation (dry_run uniquement)
+        self.order_books = None
+        if self.trading_mode == "dry_run" and Settings.DRY_RUN_DEPTH:
+            self.order_books = OrderBookCache(
+                lambda symbol, limit: self.client.get_order_book(symbol=symbol, limit=limit),
+                fixtures_dir=Settings.DEPTH_FIXTURES_DIR,
+            )
+
+        # Soldes live : user-data stream, sinon snapshot REST en cache
+        self.balances = BalanceService(
+            self.client, Settings.BINANCE_API_KEY, Settings.BINANCE_API_SECRET,
+            testnet=self.testnet,
+        )
+
+    def start_price_feed(self, symbols):
+        """Démarre le flux websocket des prix (repli REST automatique)."""
+        from app.services.price_stream import PriceStream
+
+        if self.price_feed is None:
+            self.price_feed = PriceStream(symbols, self.prices.put, testnet=self.testnet)
+            self.prices.push_alive = self.price_feed.is_live
+            self.price_feed.start()
+        return self.price_feed
+
+    def start_endpoint_probes(self):
+        """Démarre la mesure de latence des hôtes API en arrière-plan."""
+        if self.endpoints is not None:
+            self.endpoints.start()
+
+    def start_balance_stream(self):
+        """Démarre le user-data stream des soldes (mode live)."""
+        self.balances.start()
+        return self.balances
+
+    def get_status(self):
+        """État des services exchange pour le dashboard."""
+        return {
+            "price_feed": self.price_feed.get_status() if self.price_feed else None,
+            "rate_limits": self.governor.get_status(),
+            "endpoints": self.endpoints.get_status() if self.endpoints else None,
+            "price_cache": self.prices.get_status(),
+            "symbol_rules": self.rules.get_status(),
+            "balances": self.balances.get_status() if self.trading_mode == "live" else None,
+            "order_books": self.order_books.get_status() if self.order_books else None,
+        }
+
+    def min_order_usdc(self, symbol):
+        """Montant minimum d'un ordre : notionnel Binance du symbole,
+        jamais sous MIN_ORDER_USDC."""
+        floor = Decimal(str(Settings.MIN_ORDER_USDC))
+        rule = self.rules.get(symbol)
+        if rule is None:
+            return floor
+        return max(rule.min_notional, floor)
+
+    def check_market_order(self, symbol, price, quantity=None, quote_amount=None):
+        """Rejet local des ordres que Binance refuserait (None si OK)."""
+        rule = self.rules.get(symbol)
+        if rule is None:
+            return None  # règles inconnues : Binance tranchera
+        return rule.check_market_order(price, quantity=quantity, quote_amount=quote_amount)
+
+    def _format_qty(self, symbol, quantity):
+        """Quantité tronquée au stepSize du symbole."""
+        rule = self.rules.get(symbol)
+        if rule is None:
+            return f"{Decimal(str(quantity)).quantize(Decimal('1e-8'), rounding=ROUND_DOWN):f}"
+        return rule.format_qty(quantity)
+
+    def _fetch_prices(self, symbols):
+        """Un seul GET ticker/price filtré sur les symboles demandés.
+
+        Un symbole inconnu fait rejeter tout le lot (-1121) : le cache ne
+        suit que les symboles d'exchangeInfo, mais si ces règles sont
+        périmées (délistage), on reprend symbole par symbole et le fautif
+        est écarté du cache.
+        """
         try:
-            ticker = self.client.get_symbol_ticker(symbol=symbol)
-            return Decimal(ticker["price"])
+            return self._ticker_prices(symbols)
         except BinanceAPIException as e:
-            logger.error(f"Failed to get price for {symbol}: {e}")
-            return None
+            if e.code != -1121:
+                raise
+        prices = {}
+        for symbol in symbols:
+            try:
+                prices.update(self._ticker_prices([symbol]))
+            except BinanceAPIException as e:
+                if e.code != -1121:
+                    raise
+                logger.warning(f"{symbol} inconnu de Binance, retiré du cache de prix")
+                self.prices.ignore(symbol)
+        return prices
+
+    def _ticker_prices(self, symbols):
+        tickers = self.client.get_symbol_ticker(
+            symbols=json.dumps(symbols, separators=(",", ":")),
+        )
+        return {t["symbol"]: Decimal(t["price"]) for t in tickers}
+
+    def get_price(self, symbol):
+        """Prix courant d'un symbole (cache, flux websocket ou REST groupé)."""
+        return self.prices.get(symbol)
 
     def get_all_prices(self, symbols):
-        """Prix de plusieurs symboles."""
-        try:
-            tickers = self.client.get_all_tickers()
-            ticker_map = {t["symbol"]: Decimal(t["price"]) for t in tickers}
-            return {s: ticker_map.get(s) for s in symbols}
-        except BinanceAPIException as e:
-            logger.error(f"Failed to get prices: {e}")
-            return {}
+        """Prix de plusieurs symboles (cache, flux websocket ou REST groupé)."""
+        return self.prices.get_many(symbols)
 
-    def execute_market_buy(self, symbol, quote_amount_usdt):
-        """Exécuter un achat market."""
+    def execute_market_buy(self, symbol, quote_amount_usdt, client_order_id=None):
+        """Exécuter un achat market.
+
+        `client_order_id` (newClientOrderId) permet de retrouver l'ordre
+        si la réponse est perdue (cf. `find_orders`).
+        """
         if self.trading_mode == "dry_run":
             return self._simulate_buy(symbol, quote_amount_usdt)
 
+        params = {"newClientOrderId": client_order_id} if client_order_id else {}
+        sent_ms = int(time.time() * 1000)
         try:
             order = self.client.order_market_buy(
                 symbol=symbol,
                 quoteOrderQty=str(quote_amount_usdt),
+                **params,
             )
             logger.info(f"BUY executed: {symbol} for {quote_amount_usdt} USDC")
-            return {
-                "order_id": order["orderId"],
-                "symbol": symbol,
-                "side": "BUY",
-                "quantity": Decimal(order["executedQty"]),
-                "price": Decimal(order["fills"][0]["price"]) if order["fills"] else Decimal(0),
-                "amount_usdt": Decimal(order["cummulativeQuoteQty"]),
-                "fee": sum(Decimal(f["commission"]) for f in order.get("fills", [])),
-                "simulated": False,
-            }
+            self._record_fill(symbol, "BUY", order)
+            return self._order_result(symbol, "BUY", order, sent_ms)
         except BinanceAPIException as e:
+            _raise_if_unknown(e, symbol, "BUY")
+            logger.error(f"BUY failed for {symbol}: {e}")
+            return None
+        except RateLimited as e:
             logger.error(f"BUY failed for {symbol}: {e}")
             return None
 
-    def execute_market_sell(self, symbol, quantity):
+    def execute_market_sell(self, symbol, quantity, client_order_id=None):
         """Exécuter une vente market."""
+        qty_str = self._format_qty(symbol, quantity)
         if self.trading_mode == "dry_run":
-            return self._simulate_sell(symbol, quantity)
+            return self._simulate_sell(symbol, Decimal(qty_str))
 
+        params = {"newClientOrderId": client_order_id} if client_order_id else {}
+        sent_ms = int(time.time() * 1000)
         try:
             order = self.client.order_market_sell(
                 symbol=symbol,
-                quantity=_truncate_qty(symbol, quantity),
+                quantity=qty_str,
+                **params,
             )
             logger.info(f"SELL executed: {symbol} qty {quantity}")
-            return {
-                "order_id": order["orderId"],
-                "symbol": symbol,
-                "side": "SELL",
-                "quantity": Decimal(order["executedQty"]),
-                "price": Decimal(order["fills"][0]["price"]) if order["fills"] else Decimal(0),
-                "amount_usdt": Decimal(order["cummulativeQuoteQty"]),
-                "fee": sum(Decimal(f["commission"]) for f in order.get("fills", [])),
-                "simulated": False,
-            }
+            self._record_fill(symbol, "SELL", order)
+            return self._order_result(symbol, "SELL", order, sent_ms)
         except BinanceAPIException as e:
+            _raise_if_unknown(e, symbol, "SELL")
+            logger.error(f"SELL failed for {symbol}: {e}")
+            return None
+        except RateLimited as e:
             logger.error(f"SELL failed for {symbol}: {e}")
             return None
 
+    def find_orders(self, symbol, client_order_ids, since_ms):
+        """Retrouve des ordres par clientOrderId (réconciliation).
+
+        Coût indépendant de l'historique du compte : allOrders + myTrades
+        bornés à `since_ms`, deux requêtes par symbole. Binance limite
+        ces fenêtres à 24 h ; au-delà, une requête par ordre. Retourne
+        {client_order_id: résultat au format d'execute_market_*, ou None
+        si l'ordre n'a rien exécuté} ; un ordre introuvable est absent.
+        """
+        wanted = set(client_order_ids)
+        if time.time() * 1000 - since_ms < _BULK_LOOKUP_MS:
+            orders = [o for o in self.client.get_all_orders(
+                symbol=symbol, startTime=int(since_ms), limit=1000,
+            ) if o["clientOrderId"] in wanted]
+            trades = self.client.get_my_trades(
+                symbol=symbol, startTime=int(since_ms), limit=1000,
+            ) if orders else []
+        else:
+            orders, trades = [], []
+            for cid in wanted:
+                try:
+                    order = self.client.get_order(symbol=symbol, origClientOrderId=cid)
+                except BinanceAPIException as e:
+                    if e.code == -2013:  # Order does not exist
+                        continue
+                    raise
+                orders.append(order)
+                trades += self.client.get_my_trades(symbol=symbol, orderId=order["orderId"])
+
+        fills = {}
+        for t in trades:
+            fills.setdefault(t["orderId"], []).append({
+                "price": t["price"], "qty": t["qty"],
+                "commission": t["commission"], "commissionAsset": t["commissionAsset"],
+            })
+        found = {}
+        for order in orders:
+            if Decimal(order["executedQty"]) <= 0:
+                found[order["clientOrderId"]] = None
+                continue
+            order = {**order, "fills": fills.get(order["orderId"], [])}
+            found[order["clientOrderId"]] = self._order_result(
+                symbol, order["side"], order, sent_ms=order.get("time"),
+            )
+        return found
+
     def convert_usdc_to_eur(self, amount_usdc):
         """Convertir USDC en EUR via EURUSDC."""
         if self.trading_mode == "dry_run":
@@ -141,6 +343,7 @@ class ExchangeClient:
                 symbol="EURUSDC",
                 quoteOrderQty=str(amount_usdc),
             )
+            self._record_fill("EURUSDC", "BUY", order)
             eur_received = Decimal(order["executedQty"])
             usdc_spent = Decimal(order["cummulativeQuoteQty"])
             rate = eur_received / usdc_spent if usdc_spent > 0 else Decimal(0)
@@ -151,49 +354,76 @@ class ExchangeClient:
                 "rate": rate,
                 "simulated": False,
             }
-        except BinanceAPIException as e:
+        except (BinanceAPIException, RateLimited) as e:
             logger.error(f"USDC→EUR conversion failed: {e}")
             return None
 
     def _simulate_buy(self, symbol, quote_amount_usdt):
-        """Simulation achat avec slippage réaliste."""
+        """Simulation achat : parcours du carnet (asks), sinon slippage fixe."""
+        sent_ms = int(time.time() * 1000)
         price = self.get_price(symbol)
         if price is None or price == 0:
             return None
-        slippage = self._get_slippage(symbol)
-        fill_price = price * (Decimal(1) + slippage)
-        quantity = Decimal(str(quote_amount_usdt)) / fill_price
-        fee = Decimal(str(quote_amount_usdt)) * Decimal("0.001")
-        logger.info(f"[DRY RUN] BUY {symbol}: {quantity:.8f} @ {fill_price} = {quote_amount_usdt} USDC")
+        amount = Decimal(str(quote_amount_usdt))
+        book = self.order_books.get(symbol, mid_price=price) if self.order_books else None
+        if book and book[1]:
+            quantity, amount, levels = walk_book(book[1], quote_amount=amount)
+            if quantity <= 0:
+                return None
+            fill_price = amount / quantity
+            partial = amount < Decimal(str(quote_amount_usdt))
+        else:
+            fill_price = price * (Decimal(1) + self._get_slippage(symbol))
+            quantity = amount / fill_price
+            levels, partial = 0, False
+        fee = amount * _TAKER_FEE
+        logger.info(f"[DRY RUN] BUY {symbol}: {quantity:.8f} @ {fill_price:.8f} = {amount:.4f} USDC"
+                    + (f" ({levels} niveaux{', partiel' if partial else ''})" if levels else ""))
         return {
             "order_id": None,
             "symbol": symbol,
             "side": "BUY",
             "quantity": quantity,
             "price": fill_price,
-            "amount_usdt": Decimal(str(quote_amount_usdt)),
+            "amount_usdt": amount,
             "fee": fee,
+            "commission_asset": "USDC",
+            "sent_ms": sent_ms,
+            "filled_ms": int(time.time() * 1000),
             "simulated": True,
         }
 
     def _simulate_sell(self, symbol, quantity):
-        """Simulation vente avec slippage réaliste."""
+        """Simulation vente : parcours du carnet (bids), sinon slippage fixe."""
+        sent_ms = int(time.time() * 1000)
         price = self.get_price(symbol)
         if price is None or price == 0:
             return None
-        slippage = self._get_slippage(symbol)
-        fill_price = price * (Decimal(1) - slippage)
-        amount_usdt = Decimal(str(quantity)) * fill_price
-        fee = amount_usdt * Decimal("0.001")
-        logger.info(f"[DRY RUN] SELL {symbol}: {quantity:.8f} @ {fill_price} = {amount_usdt:.4f} USDC")
+        quantity = Decimal(str(quantity))
+        book = self.order_books.get(symbol, mid_price=price) if self.order_books else None
+        if book and book[0]:
+            quantity, amount_usdt, levels = walk_book(book[0], quantity=quantity)
+            if quantity <= 0:
+                return None
+            fill_price = amount_usdt / quantity
+        else:
+            fill_price = price * (Decimal(1) - self._get_slippage(symbol))
+            amount_usdt = quantity * fill_price
+            levels = 0
+        fee = amount_usdt * _TAKER_FEE
+        logger.info(f"[DRY RUN] SELL {symbol}: {quantity:.8f} @ {fill_price:.8f} = {amount_usdt:.4f} USDC"
+                    + (f" ({levels} niveaux)" if levels else ""))
         return {
             "order_id": None,
             "symbol": symbol,
             "side": "SELL",
-            "quantity": Decimal(str(quantity)),
+            "quantity": quantity,
             "price": fill_price,
             "amount_usdt": amount_usdt,
             "fee": fee,
+            "commission_asset": "USDC",
+            "sent_ms": sent_ms,
+            "filled_ms": int(time.time() * 1000),
             "simulated": True,
         }
 
@@ -217,20 +447,78 @@ class ExchangeClient:
 
     @staticmethod
     def _get_slippage(symbol):
-        """Slippage réaliste selon la liquidité."""
+        """Slippage fixe selon la liquidité (repli sans carnet d'ordres)."""
         high_liquidity = ("BTCUSDC", "ETHUSDC")
         if symbol in high_liquidity:
             return Decimal("0.0002")  # 0.02%
         return Decimal("0.0005")  # 0.05%
 
+    def _net_bought_qty(self, symbol, order):
+        """Quantité réellement reçue : la commission prélevée sur l'asset
+        acheté ne sera pas disponible pour la revente."""
+        base, _ = self._assets(symbol)
+        qty = Decimal(order["executedQty"])
+        for fill in order.get("fills", []):
+            if fill["commissionAsset"] == base:
+                qty -= Decimal(fill["commission"])
+        return qty
+
+    def _order_result(self, symbol, side, order, sent_ms=None):
+        """Ordre Binance exécuté → résultat normalisé pour le Follower.
+
+        Prix = VWAP sur l'ensemble des fills ; frais convertis en USDC
+        (commission en base au prix moyen, BNB au prix courant).
+        """
+        executed = Decimal(order["executedQty"])
+        quote_qty = Decimal(order["cummulativeQuoteQty"])
+        vwap = quote_qty / executed if executed > 0 else Decimal(0)
+        base, quote = self._assets(symbol)
+        fee = Decimal(0)
+        commission_assets = []
+        for f in order.get("fills", []):
+            asset, commission = f["commissionAsset"], Decimal(f["commission"])
+            if asset not in commission_assets:
+                commission_assets.append(asset)
+            if asset == quote:
+                fee += commission
+            elif asset == base:
+                fee += commission * vwap
+            else:
+                rate = self.get_price(f"{asset}{quote}")
+                fee += commission * rate if rate else Decimal(0)
+        return {
+            "order_id": order["orderId"],
+            "symbol": symbol,
+            "side": side,
+            "quantity": self._net_bought_qty(symbol, order) if side == "BUY" else executed,
+            "price": vwap,
+            "amount_usdt": quote_qty,
+            "fee": fee,
+            "commission_asset": ",".join(commission_assets) or None,
+            "sent_ms": sent_ms,
+            "filled_ms": order.get("transactTime") or order.get("updateTime"),
+            "simulated": False,
+        }
+
+    def _assets(self, symbol):
+        """(base, quote) du symbole, d'après exchangeInfo si connu."""
+        rule = self.rules.get(symbol)
+        if rule is not None and rule.base_asset:
+            return rule.base_asset, rule.quote_asset
+        return symbol[:-4], symbol[-4:]
+
+    def _record_fill(self, symbol, side, order):
+        """Répercute un ordre exécuté sur les soldes en mémoire."""
+        base, quote = self._assets(symbol)
+        qty = Decimal(order["executedQty"])
+        quote_qty = Decimal(order["cummulativeQuoteQty"])
+        sign = 1 if side == "BUY" else -1
+        deltas = {base: sign * qty, quote: -sign * quote_qty}
+        for fill in order.get("fills", []):
+            asset = fill["commissionAsset"]
+            deltas[asset] = deltas.get(asset, Decimal(0)) - Decimal(fill["commission"])
+        self.balances.apply_fill(deltas, order.get("transactTime", 0))
+
     def get_account_balance(self, asset="USDC"):
-        """Solde du compte pour un asset."""
-        try:
-            account = self.client.get_account()
-            for balance in account["balances"]:
-                if balance["asset"] == asset:
-                    return Decimal(balance["free"])
-            return Decimal(0)
-        except BinanceAPIException as e:
-            logger.error(f"Failed to get balance for {asset}: {e}")
-            return Decimal(0)
+        """Solde libre d'un asset (user-data stream ou snapshot REST en cache)."""
+        return self.balances.get_free(asset)
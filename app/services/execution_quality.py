@@ -0,0 +1,122 @@
+"""Qualité d'exécution : slippage et latence des ordres.
+
+Chaque trade est mesuré à son enregistrement :
+- slippage (bps) entre le prix de référence qui a servi à dimensionner
+  l'ordre et le VWAP obtenu, positif quand il coûte ;
+- latences décision → fill et envoi → fill.
+
+Les agrégats par coin et par jour (UTC) sont mis à jour dans la même
+transaction que le trade (`models.insert_trade`) : les statistiques se
+lisent sans jamais reparcourir la table trades. Les latences sont
+comptées dans des buckets logarithmiques (4 par doublement, ±9 %) et
+les percentiles sont calculés sur les histogrammes fusionnés.
+"""
+
+import math
+import time
+from decimal import Decimal
+
+_BUCKETS_PER_DOUBLING = 4
+LATENCY_KINDS = ("decision", "send")
+_PERCENTILES = (("p50", 0.50), ("p90", 0.90), ("p99", 0.99))
+
+
+def latency_bucket(ms):
+    """Bucket d'une latence : [2^((b-1)/4), 2^(b/4)[ ms ; 0 pour < 1 ms."""
+    if ms is None or ms < 1:
+        return 0
+    return int(math.log2(ms) * _BUCKETS_PER_DOUBLING) + 1
+
+
+def bucket_ms(bucket):
+    """Valeur représentative d'un bucket (milieu géométrique)."""
+    if bucket <= 0:
+        return 0.5
+    return 2 ** ((bucket - 0.5) / _BUCKETS_PER_DOUBLING)
+
+
+def measure(side, result, ref_price=None, decided_ms=None):
+    """Mesures d'un trade → colonnes de `trades` + buckets de latence.
+
+    `filled_ms` est l'heure Binance en live : un léger décalage
+    d'horloge peut fausser les latences de quelques ms.
+    """
+    price = Decimal(str(result["price"]))
+    slippage_bps = None
+    if ref_price and price > 0:
+        ref = Decimal(str(ref_price))
+        sign = 1 if side == "BUY" else -1
+        slippage_bps = float((price - ref) / ref * sign * 10000)
+
+    filled_ms, sent_ms = result.get("filled_ms"), result.get("sent_ms")
+    latencies = {}
+    if filled_ms and decided_ms:
+        latencies["decision"] = latency_bucket(filled_ms - decided_ms)
+    if filled_ms and sent_ms:
+        latencies["send"] = latency_bucket(filled_ms - sent_ms)
+
+    return {
+        "ref_price": float(ref_price) if ref_price else None,
+        "slippage_bps": slippage_bps,
+        "commission_asset": result.get("commission_asset"),
+        "decided_ms": decided_ms,
+        "sent_ms": sent_ms,
+        "filled_ms": filled_ms,
+        "day": time.strftime("%Y-%m-%d", time.gmtime((filled_ms or time.time() * 1000) / 1000)),
+        "latency_buckets": latencies,
+    }
+
+
+def summarize(stats_rows, latency_rows, group="coin"):
+    """Fusionne les agrégats journaliers par coin (ou par jour).
+
+    Retourne {clé: {trades, notional_usdt, fees_usdt, slippage_bps,
+    latency_ms: {decision: {p50, p90, p99}, send: {...}}}} et le total.
+    """
+    groups, histograms = {}, {}
+    for row in stats_rows:
+        for key in (row[group], "total"):
+            g = groups.setdefault(key, {
+                "trades": 0, "notional_usdt": 0.0, "fees_usdt": 0.0,
+                "_slip_notional": 0.0, "_slip_weighted": 0.0,
+            })
+            g["trades"] += row["trades"]
+            g["notional_usdt"] += row["notional_usdt"]
+            g["fees_usdt"] += row["fees_usdt"]
+            g["_slip_notional"] += row["slippage_notional_usdt"]
+            g["_slip_weighted"] += row["slippage_bps_x_notional"]
+    for row in latency_rows:
+        for key in (row[group], "total"):
+            hist = histograms.setdefault(key, {}).setdefault(row["kind"], {})
+            hist[row["bucket"]] = hist.get(row["bucket"], 0) + row["count"]
+
+    for key, g in groups.items():
+        slip_notional = g.pop("_slip_notional")
+        slip_weighted = g.pop("_slip_weighted")
+        # Moyenne pondérée par le notionnel : un gros ordre pèse plus
+        g["slippage_bps"] = round(slip_weighted / slip_notional, 2) if slip_notional else None
+        g["notional_usdt"] = round(g["notional_usdt"], 2)
+        g["fees_usdt"] = round(g["fees_usdt"], 4)
+        g["latency_ms"] = {
+            kind: _percentiles(histograms.get(key, {}).get(kind, {}))
+            for kind in LATENCY_KINDS
+        }
+    total = groups.pop("total", None)
+    return groups, total
+
+
+def _percentiles(hist):
+    count = sum(hist.values())
+    if not count:
+        return None
+    result = {}
+    ordered = sorted(hist.items())
+    for name, pct in _PERCENTILES:
+        rank = pct * count
+        seen = 0
+        for bucket, n in ordered:
+            seen += n
+            if seen >= rank:
+                result[name] = round(bucket_ms(bucket), 1)
+                break
+    return result
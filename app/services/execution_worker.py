@@ -0,0 +1,164 @@
+"""Worker d'exécution des signaux.
+
+Un seul thread longue durée et une file bornée : au plus un signal en
+cours d'exécution, quelques-uns en attente. Sur timeout, le poller ne
+lâche pas un thread dans la nature : il demande l'annulation, et le
+Follower s'arrête au prochain point de contrôle (entre deux ordres).
+"""
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from app import db, models
+
+logger = logging.getLogger("calvalot.executor")
+
+_QUEUE_SIZE = 4
+
+
+class ExecutionJob:
+    def __init__(self, signal):
+        self.signal = signal
+        self.future = Future()
+        self.cancel_event = threading.Event()
+        self.submitted_at = time.time()
+
+    def cancel(self):
+        """Annulation coopérative (prise en compte entre deux ordres)."""
+        self.cancel_event.set()
+
+
+class ExecutionWorker:
+    def __init__(self, follower, max_queue=_QUEUE_SIZE):
+        self.follower = follower
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._current = None
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "executed": 0,
+            "errors": 0,
+            "timeouts": 0,
+            "cancelled": 0,
+            "rejected_queue_full": 0,
+            "last_exec_ms": None,
+            "avg_exec_ms": None,
+            "max_exec_ms": None,
+            "last_wait_ms": None,
+        }
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(
+            target=self._run, daemon=True, name="calvalot-executor",
+        )
+        self._thread.start()
+
+    def submit(self, signal):
+        """Ajoute un signal à la file. Retourne None si la file est pleine."""
+        self.start()
+        job = ExecutionJob(signal)
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._stats_lock:
+                self._stats["rejected_queue_full"] += 1
+            return None
+        return job
+
+    def record_timeout(self):
+        with self._stats_lock:
+            self._stats["timeouts"] += 1
+
+    def _run(self):
+        db.dedicated_reader()
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            self._current = job
+            try:
+                self._execute(job)
+            finally:
+                self._current = None
+                self._queue.task_done()
+
+    def _execute(self, job):
+        signal_id = job.signal.get("signal_id", "unknown")
+        if job.cancel_event.is_set():
+            # Annulé avant même d'avoir démarré (timeout pendant l'attente)
+            self._cancel_pending(job, "Annulé (timeout) avant exécution")
+            return
+
+        started = time.time()
+        wait_ms = (started - job.submitted_at) * 1000
+        try:
+            result = self.follower.execute_signal(job.signal, cancel_event=job.cancel_event)
+            job.future.set_result(result or {"status": "error", "trades_executed": 0})
+            with self._stats_lock:
+                self._stats["executed"] += 1
+        except Exception as e:
+            with self._stats_lock:
+                self._stats["errors"] += 1
+            job.future.set_exception(e)
+            result = None
+
+        exec_ms = (time.time() - started) * 1000
+        with self._stats_lock:
+            if result and result.get("status") == "cancelled":
+                self._stats["cancelled"] += 1
+            self._stats["last_exec_ms"] = round(exec_ms, 1)
+            self._stats["last_wait_ms"] = round(wait_ms, 1)
+            avg = self._stats["avg_exec_ms"]
+            self._stats["avg_exec_ms"] = round(
+                exec_ms if avg is None else avg * 0.8 + exec_ms * 0.2, 1,
+            )
+            self._stats["max_exec_ms"] = round(
+                max(exec_ms, self._stats["max_exec_ms"] or 0), 1,
+            )
+
+    def _cancel_pending(self, job, reason):
+        """Clôt un job jamais démarré : signal `cancelled` en base, future résolue."""
+        signal_id = job.signal.get("signal_id", "unknown")
+        with self._stats_lock:
+            self._stats["cancelled"] += 1
+        try:
+            models.update_signal_status(signal_id, "cancelled", reason)
+        except Exception as e:
+            logger.error(f"Statut du signal {signal_id} non mis à jour: {e}")
+        job.future.set_result({"status": "cancelled", "reason": reason,
+                               "trades_executed": 0})
+        logger.warning(f"Signal {signal_id} annulé avant exécution")
+
+    def stop(self):
+        """Annule le signal en cours ; ceux en attente sont marqués `cancelled`."""
+        current = self._current
+        if current:
+            current.cancel()
+        # Vider la file : sinon la sentinelle peut ne pas y trouver de place,
+        # et les signaux en attente resteraient `pending` sans explication.
+        while True:
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is not None:
+                self._cancel_pending(job, "Annulé (arrêt du worker) avant exécution")
+            self._queue.task_done()
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass  # un submit concurrent a repris la place : le thread est daemon
+
+    def get_stats(self):
+        current = self._current
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["queue_depth"] = self._queue.qsize()
+        stats["busy"] = current is not None
+        stats["current_signal"] = current.signal.get("signal_id") if current else None
+        return stats
@@ -5,25 +5,64 @@ individuels, le follower compare son allocation actuelle à l'allocation
 cible du leader et exécute les trades nécessaires pour les aligner.
 """
 
+import hashlib
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal
 
 from config.settings import Settings
 from config.coins import COIN_SYMBOLS
-from app import models
+from app import db, models
+from app.services import execution_quality
+from app.services.portfolio_state import PortfolioState
 
 logger = logging.getLogger("calvalot.follower")
 
+# Une intention d'ordre introuvable chez Binance n'est déclarée perdue
+# qu'après ce délai (l'ordre peut être encore en route)
+_ORDER_LOOKUP_GRACE_MS = 30_000
+
+
+class _CashBudget:
+    """Cash partagé entre des BUY concurrents (réservation sous verrou)."""
+
+    def __init__(self, available):
+        self.available = available
+        self._lock = threading.Lock()
+
+    def reserve(self, wanted, minimum):
+        """Réserve min(wanted, disponible), ou None si < minimum."""
+        with self._lock:
+            amount = min(wanted, self.available)
+            if amount < minimum:
+                return None
+            self.available -= amount
+            return amount
+
+    def release(self, amount):
+        """Rend la part non dépensée d'une réservation."""
+        if amount > 0:
+            with self._lock:
+                self.available += amount
+
 
 class Follower:
-    def __init__(self, exchange, market_data, budget_manager):
+    def __init__(self, exchange, market_data, budget_manager, portfolio=None):
         self.exchange = exchange
         self.market = market_data
         self.budget_mgr = budget_manager
+        self.portfolio = portfolio or PortfolioState()
         self.is_simulated = Settings.TRADING_MODE == "dry_run"
+        self._order_pool = None  # ThreadPoolExecutor (mode PARALLEL_ORDERS)
 
-    def execute_signal(self, signal):
-        """Point d'entrée : route vers v1 ou v2 selon la version du signal."""
+    def execute_signal(self, signal, cancel_event=None):
+        """Point d'entrée : route vers v1 ou v2 selon la version du signal.
+
+        `cancel_event` (threading.Event) permet au worker d'exécution
+        d'interrompre le signal entre deux ordres (timeout).
+        """
         # Valider le signal avant exécution
         valid, reason = self._validate_signal(signal)
         if not valid:
@@ -32,10 +71,16 @@ class Follower:
             models.update_signal_status(signal_id, "rejected", reason)
             return {"status": "rejected", "reason": reason, "trades_executed": 0}
 
+        # Ordres restés sans réponse lors d'un signal précédent
+        try:
+            self.reconcile_orders()
+        except Exception as e:
+            logger.warning(f"Réconciliation des ordres impossible: {e}")
+
         version = signal.get("version", 1)
         if version >= 2:
-            return self._execute_signal_v2(signal)
-        return self._execute_signal_v1(signal)
+            return self._execute_signal_v2(signal, cancel_event)
+        return self._execute_signal_v1(signal, cancel_event)
 
     def _validate_signal(self, signal):
         """Valide un signal avant exécution.
@@ -74,7 +119,7 @@ class Follower:
     # V2 — Rebalancing par allocation cible
     # ================================================================
 
-    def _execute_signal_v2(self, signal):
+    def _execute_signal_v2(self, signal, cancel_event=None):
         """Rebalance le portfolio pour coller à l'allocation du leader."""
         signal_id = signal.get("signal_id", "unknown")
         logger.info(f"=== Rebalancing signal {signal_id} (v2) ===")
@@ -93,7 +138,7 @@ class Follower:
 
         # État actuel
         prices = self.market.get_prices()
-        positions = models.get_positions()
+        positions = self.portfolio.snapshot().positions
         cash = self._get_cash_balance()
         portfolio_value = self._calc_portfolio_value(positions, prices)
         total = cash + portfolio_value
@@ -106,7 +151,7 @@ class Follower:
         # Allocation actuelle (% par coin)
         current_alloc = {}
         for pos in positions:
-            qty = Decimal(str(pos["quantity"]))
+            qty = pos["quantity"]
             price = prices.get(pos["coin"])
             if qty > 0 and price:
                 current_alloc[pos["coin"]] = float(qty * price / total)
@@ -131,7 +176,7 @@ class Follower:
                 continue
 
             amount_usdt = abs(delta) * float(total)
-            if amount_usdt < Settings.MIN_ORDER_USDC:
+            if amount_usdt < float(self.exchange.min_order_usdc(coin)):
                 continue
 
             if delta < 0:
@@ -146,69 +191,137 @@ class Follower:
 
         logger.info(f"Rebalancing: {len(sells)} sell(s), {len(buys)} buy(s)")
 
-        # Exécuter les SELL d'abord (libérer du cash)
-        executed = 0
-        skips = []
-        errors = []
+        # SELL d'abord (libérer du cash), puis BUY
+        if Settings.PARALLEL_ORDERS and len(sells) + len(buys) > 1:
+            outcomes = self._run_legs_parallel(
+                sells, buys, signal_id, prices, total, positions, cancel_event,
+            )
+        else:
+            outcomes = self._run_legs_serial(
+                sells, buys, signal_id, prices, total, positions, cancel_event,
+            )
+
+        executed = sum(1 for status, _ in outcomes if status == "executed")
+        skips = [msg for status, msg in outcomes if status == "skipped"]
+        errors = [msg for status, msg in outcomes if status == "error"]
+        cancelled = any(status == "cancelled" for status, _ in outcomes)
 
+        return self._finish_signal(signal_id, prices, executed, skips, errors, cancelled)
+
+    def _run_legs_serial(self, sells, buys, signal_id, prices, total, positions,
+                         cancel_event):
+        """Exécute les jambes une par une (cash re-vérifié avant chaque BUY)."""
+        outcomes = []
         for s in sells:
-            try:
-                result = self._execute_sell(
-                    s["coin"], s["amount_usdt"], signal_id, prices, positions,
-                )
-                if result and not result.get("skipped"):
-                    executed += 1
-                elif result and result.get("skipped"):
-                    skips.append(result["reason"])
-            except Exception as e:
-                logger.error(f"Erreur SELL {s['coin']}: {e}")
-                errors.append(str(e))
+            if self._is_cancelled(cancel_event):
+                return outcomes + [("cancelled", None)]
+            outcomes.append(self._sell_leg(s, signal_id, prices, positions))
 
         # Rafraîchir les positions après les ventes
-        positions = models.get_positions()
+        positions = self.portfolio.snapshot().positions
 
-        # Exécuter les BUY (re-check cash avant chaque)
         for b in buys:
-            try:
+            if self._is_cancelled(cancel_event):
+                return outcomes + [("cancelled", None)]
+            outcomes.append(self._buy_leg(b, signal_id, prices, total, positions))
+        return outcomes
+
+    def _run_legs_parallel(self, sells, buys, signal_id, prices, total, positions,
+                           cancel_event):
+        """Exécute les SELL en parallèle, puis les BUY en parallèle.
+
+        Les BUY se partagent le cash disponible via une réservation sous
+        verrou : la somme des achats ne peut pas dépasser le cash, comme
+        en mode séquentiel.
+        """
+        pool = self._get_order_pool()
+
+        def guarded(fn, *args):
+            if self._is_cancelled(cancel_event):
+                return ("cancelled", None)
+            return fn(*args)
+
+        outcomes = list(pool.map(
+            lambda s: guarded(self._sell_leg, s, signal_id, prices, positions), sells,
+        ))
+        if any(status == "cancelled" for status, _ in outcomes) or not buys:
+            return outcomes
+
+        positions = self.portfolio.snapshot().positions
+        cash_budget = _CashBudget(self._get_cash_balance())
+        outcomes += pool.map(
+            lambda b: guarded(self._buy_leg, b, signal_id, prices, total, positions,
+                              cash_budget),
+            buys,
+        )
+        return outcomes
+
+    def _sell_leg(self, s, signal_id, prices, positions):
+        """Une jambe SELL → (status, message) pour le bilan du signal."""
+        try:
+            result = self._execute_sell(
+                s["coin"], s["amount_usdt"], signal_id, prices, positions,
+            )
+        except Exception as e:
+            logger.error(f"Erreur SELL {s['coin']}: {e}")
+            return ("error", str(e))
+        return self._leg_outcome(result)
+
+    def _buy_leg(self, b, signal_id, prices, total, positions, cash_budget=None):
+        """Une jambe BUY → (status, message), bornée par le cash disponible."""
+        min_order = self.exchange.min_order_usdc(b["coin"])
+        try:
+            if cash_budget is not None:
+                amount = cash_budget.reserve(b["amount_usdt"], min_order)
+                if amount is None:
+                    cash = cash_budget.available
+            else:
                 cash = self._get_cash_balance()
                 amount = min(b["amount_usdt"], cash)
-                if amount < Decimal(str(Settings.MIN_ORDER_USDC)):
-                    reason = f"BUY {b['coin']}: cash insuffisant (${float(cash):.2f})"
-                    logger.info(f"Skip {reason}")
-                    skips.append(reason)
-                    continue
-
+                if amount < min_order:
+                    amount = None
+            if amount is None:
+                reason = f"BUY {b['coin']}: cash insuffisant (${float(cash):.2f})"
+                logger.info(f"Skip {reason}")
+                return ("skipped", reason)
+
+            result = None
+            try:
                 result = self._execute_buy(
                     b["coin"], amount, signal_id, prices,
-                    total, positions,
+                    total, positions, cash_reserved=cash_budget is not None,
                 )
-                if result and not result.get("skipped"):
-                    executed += 1
-                elif result and result.get("skipped"):
-                    skips.append(result["reason"])
-            except Exception as e:
-                logger.error(f"Erreur BUY {b['coin']}: {e}")
-                errors.append(str(e))
-
-        # Snapshot post-rebalancing
-        self._save_snapshot(prices)
-
-        # Mettre à jour le status du signal
-        if errors:
-            models.update_signal_status(signal_id, "error", "; ".join(errors))
-        elif executed == 0 and skips:
-            models.update_signal_status(signal_id, "skipped", "; ".join(skips))
-        else:
-            models.update_signal_status(signal_id, "executed")
-
-        logger.info(f"=== Signal {signal_id}: {executed} trade(s), {len(skips)} skip(s) ===")
-        return {"status": "ok", "trades_executed": executed}
+            finally:
+                if cash_budget is not None:
+                    spent = result.get("amount_usdt") if result else None
+                    cash_budget.release(amount - spent if spent is not None else amount)
+        except Exception as e:
+            logger.error(f"Erreur BUY {b['coin']}: {e}")
+            return ("error", str(e))
+        return self._leg_outcome(result)
+
+    @staticmethod
+    def _leg_outcome(result):
+        if result and result.get("skipped"):
+            return ("skipped", result["reason"])
+        if result:
+            return ("executed", None)
+        return (None, None)
+
+    def _get_order_pool(self):
+        if self._order_pool is None:
+            self._order_pool = ThreadPoolExecutor(
+                max_workers=Settings.ORDER_WORKERS,
+                thread_name_prefix="calvalot-order",
+                initializer=db.dedicated_reader,
+            )
+        return self._order_pool
 
     # ================================================================
     # V1 — Ancien mode (réplication des actions individuelles)
     # ================================================================
 
-    def _execute_signal_v1(self, signal):
+    def _execute_signal_v1(self, signal, cancel_event=None):
         """Ancien mode : réplique les actions individuelles du signal."""
         signal_id = signal.get("signal_id", "unknown")
         logger.info(f"=== Exécution signal {signal_id} (v1) ===")
@@ -227,7 +340,7 @@ class Follower:
 
         prices = self.market.get_prices()
         cash_usdt = self._get_cash_balance()
-        positions = models.get_positions()
+        positions = self.portfolio.snapshot().positions
         portfolio_value = self._calc_portfolio_value(positions, prices)
         total_value_usdt = cash_usdt + portfolio_value
 
@@ -239,7 +352,11 @@ class Follower:
         executed = 0
         errors = []
         skips = []
+        cancelled = False
         for action in actions:
+            if self._is_cancelled(cancel_event):
+                cancelled = True
+                break
             try:
                 result = self._execute_action(
                     action, signal_id, prices, total_value_usdt, positions,
@@ -254,28 +371,20 @@ class Follower:
                 logger.error(f"Erreur exécution {action}: {e}")
                 errors.append(str(e))
 
-        self._save_snapshot(prices)
-
-        if errors:
-            models.update_signal_status(signal_id, "error", "; ".join(errors))
-        elif executed == 0 and skips:
-            models.update_signal_status(signal_id, "skipped", "; ".join(skips))
-        else:
-            models.update_signal_status(signal_id, "executed")
-
-        logger.info(f"=== Signal {signal_id}: {executed} trade(s), {len(skips)} skip(s) ===")
-        return {"status": "ok", "trades_executed": executed}
+        return self._finish_signal(signal_id, prices, executed, skips, errors, cancelled)
 
     def sync_to_leader(self, portfolio_state):
         """Sync initial via rebalancing v2.
 
         Construit un faux signal v2 à partir du portfolio_state
-        et délègue au rebalancing.
+        et délègue au rebalancing. L'id est unique par sync : les
+        clientOrderId en dérivent, un id fixe ferait passer les ordres
+        d'un second sync pour déjà envoyés.
         """
         logger.info("=== Sync initial sur le leader (via rebalancing v2) ===")
         fake_signal = {
             "version": 2,
-            "signal_id": "initial_sync",
+            "signal_id": f"initial_sync-{models.now_ms()}",
             "portfolio_state": portfolio_state,
             "confidence": 0,
             "reasoning": "Initial sync",
@@ -305,13 +414,21 @@ class Follower:
 
         return None
 
-    def _execute_buy(self, coin, amount_usdt, signal_id, prices, total_value_usdt, positions):
-        """Exécute un achat."""
+    def _execute_buy(self, coin, amount_usdt, signal_id, prices, total_value_usdt, positions,
+                     cash_reserved=False):
+        """Exécute un achat.
+
+        `cash_reserved` : le montant a déjà été réservé sur le cash partagé
+        (mode parallèle), pas de re-vérification du solde.
+        """
+        decided_ms = int(time.time() * 1000)
+        min_order = self.exchange.min_order_usdc(coin)
+
         # Vérifier le cash disponible en simulation (évite le cash négatif)
-        if self.is_simulated:
+        if self.is_simulated and not cash_reserved:
             available = self._get_cash_balance()
             if available < amount_usdt:
-                if available >= Decimal(str(Settings.MIN_ORDER_USDC)):
+                if available >= min_order:
                     logger.info(f"BUY {coin}: réduit ${float(amount_usdt):.2f} -> ${float(available):.2f} (cash dispo)")
                     amount_usdt = available
                 else:
@@ -320,34 +437,48 @@ class Follower:
                     return {"skipped": True, "reason": reason}
 
         # Minimum Binance
-        if amount_usdt < Decimal(str(Settings.MIN_ORDER_USDC)):
-            reason = f"BUY {coin}: ${float(amount_usdt):.2f} < min ${Settings.MIN_ORDER_USDC}"
+        if amount_usdt < min_order:
+            reason = f"BUY {coin}: ${float(amount_usdt):.2f} < min ${float(min_order):.2f}"
             logger.info(f"Skip {reason}")
             return {"skipped": True, "reason": reason}
 
-        result = self.exchange.execute_market_buy(coin, float(amount_usdt))
+        # Filtres Binance du symbole (rejet local, sans aller-retour)
+        price = prices.get(coin)
+        if price:
+            rejection = self.exchange.check_market_order(coin, price, quote_amount=amount_usdt)
+            if rejection:
+                reason = f"BUY {coin}: {rejection}"
+                logger.info(f"Skip {reason}")
+                return {"skipped": True, "reason": reason}
+
+        client_order_id, reason = self._open_intent(
+            signal_id, coin, "BUY", quote_amount=amount_usdt,
+        )
+        if reason:
+            return {"skipped": True, "reason": reason}
+
+        result = self.exchange.execute_market_buy(
+            coin, float(amount_usdt), client_order_id=client_order_id,
+        )
         if not result:
+            if client_order_id:
+                models.fail_order_intent(client_order_id, "rejected")
             return None
 
-        trade_id = models.insert_trade(
-            coin=coin, action="BUY",
-            amount_usdt=float(result["amount_usdt"]),
-            price=float(result["price"]),
-            quantity=float(result["quantity"]),
-            fee_usdt=float(result.get("fee", 0)),
-            signal_id=signal_id,
-            is_simulated=result["simulated"],
+        trade_id = self._record_trade(
+            coin, "BUY", result, signal_id, client_order_id,
+            ref_price=price, decided_ms=decided_ms,
         )
 
-        self._update_position(coin, "BUY", result)
-
         logger.info(f"Trade #{trade_id}: BUY {coin} ${float(result['amount_usdt']):.2f}")
-        return {"trade_id": trade_id, "coin": coin, "side": "BUY"}
+        return {"trade_id": trade_id, "coin": coin, "side": "BUY",
+                "amount_usdt": result["amount_usdt"]}
 
     def _execute_sell(self, coin, amount_usdt, signal_id, prices, positions):
         """Exécute une vente."""
+        decided_ms = int(time.time() * 1000)
         pos = next((p for p in positions if p["coin"] == coin), None)
-        if not pos or Decimal(str(pos["quantity"])) <= 0:
+        if not pos or pos["quantity"] <= 0:
             reason = f"SELL {coin}: pas de position"
             logger.info(f"Skip {reason}")
             return {"skipped": True, "reason": reason}
@@ -359,7 +490,7 @@ class Follower:
             return {"skipped": True, "reason": reason}
 
         qty_to_sell = amount_usdt / price
-        available = Decimal(str(pos["quantity"]))
+        available = pos["quantity"]
         if qty_to_sell > available:
             qty_to_sell = available
 
@@ -372,85 +503,233 @@ class Follower:
 
         # Minimum Binance
         sell_value = qty_to_sell * price
-        if sell_value < Decimal(str(Settings.MIN_ORDER_USDC)):
-            reason = f"SELL {coin}: ${float(sell_value):.2f} < min ${Settings.MIN_ORDER_USDC}"
+        min_order = self.exchange.min_order_usdc(coin)
+        if sell_value < min_order:
+            reason = f"SELL {coin}: ${float(sell_value):.2f} < min ${float(min_order):.2f}"
             logger.info(f"Skip {reason}")
             return {"skipped": True, "reason": reason}
 
-        result = self.exchange.execute_market_sell(coin, float(qty_to_sell))
+        # Filtres Binance du symbole (stepSize, minQty, notionnel)
+        rejection = self.exchange.check_market_order(coin, price, quantity=qty_to_sell)
+        if rejection:
+            reason = f"SELL {coin}: {rejection}"
+            logger.info(f"Skip {reason}")
+            return {"skipped": True, "reason": reason}
+
+        client_order_id, reason = self._open_intent(
+            signal_id, coin, "SELL", quantity=qty_to_sell,
+        )
+        if reason:
+            return {"skipped": True, "reason": reason}
+
+        result = self.exchange.execute_market_sell(
+            coin, float(qty_to_sell), client_order_id=client_order_id,
+        )
         if not result:
+            if client_order_id:
+                models.fail_order_intent(client_order_id, "rejected")
             return None
 
+        trade_id = self._record_trade(
+            coin, "SELL", result, signal_id, client_order_id,
+            ref_price=price, decided_ms=decided_ms,
+        )
+
+        logger.info(f"Trade #{trade_id}: SELL {coin} ${float(result['amount_usdt']):.2f}")
+        return {"trade_id": trade_id, "coin": coin, "side": "SELL",
+                "amount_usdt": result["amount_usdt"]}
+
+    # ================================================================
+    # Journal des ordres
+    # ================================================================
+
+    @staticmethod
+    def _client_order_id(signal_id, coin, side):
+        """newClientOrderId déterministe : même signal, même jambe → même ID.
+
+        36 caractères max, alphabet autorisé par Binance.
+        """
+        digest = hashlib.sha1(f"{signal_id}:{coin}:{side}".encode()).hexdigest()
+        return f"clv-{digest[:32]}"
+
+    def _open_intent(self, signal_id, coin, side, quote_amount=None, quantity=None):
+        """Journalise l'ordre avant envoi → (client_order_id, raison de skip).
+
+        En simulation rien n'est journalisé (aucun fill ne peut être perdu).
+        """
+        if self.is_simulated:
+            return None, None
+        client_order_id = self._client_order_id(signal_id, coin, side)
+        status = models.open_order_intent(
+            client_order_id, signal_id, coin, side, int(time.time() * 1000),
+            quote_amount=float(quote_amount) if quote_amount is not None else None,
+            quantity=float(quantity) if quantity is not None else None,
+        )
+        if status is None:
+            return client_order_id, None
+        reason = f"{side} {coin}: ordre déjà envoyé ({status})"
+        logger.warning(f"Skip {reason}")
+        return client_order_id, reason
+
+    def _record_trade(self, coin, side, result, signal_id, client_order_id=None,
+                      ref_price=None, decided_ms=None):
+        """Enregistre le trade (et clôt son intention) et la position en
+        une seule écriture : un commit par jambe (ou par lot, cf. db.write).
+
+        `ref_price` : prix qui a servi à dimensionner l'ordre (slippage).
+        """
+        execution = execution_quality.measure(side, result, ref_price, decided_ms)
+        return db.write(self._write_trade, coin, side, result, signal_id,
+                        client_order_id, execution)
+
+    def _write_trade(self, coin, side, result, signal_id, client_order_id, execution):
         trade_id = models.insert_trade(
-            coin=coin, action="SELL",
-            amount_usdt=float(result["amount_usdt"]),
-            price=float(result["price"]),
-            quantity=float(result["quantity"]),
-            fee_usdt=float(result.get("fee", 0)),
+            coin=coin, action=side,
+            amount_usdt=result["amount_usdt"],
+            price=result["price"],
+            quantity=result["quantity"],
+            fee_usdt=result.get("fee", 0),
             signal_id=signal_id,
             is_simulated=result["simulated"],
+            client_order_id=client_order_id,
+            order_id=result.get("order_id"),
+            execution=execution,
         )
+        self._update_position(coin, side, result)
+        return trade_id
 
-        self._update_position(coin, "SELL", result)
+    def reconcile_orders(self):
+        """Solde les intentions restées 'pending' (crash, timeout réseau).
 
-        logger.info(f"Trade #{trade_id}: SELL {coin} ${float(result['amount_usdt']):.2f}")
-        return {"trade_id": trade_id, "coin": coin, "side": "SELL"}
+        Une recherche groupée par symbole depuis la plus ancienne
+        intention : le coût dépend du nombre d'ordres en suspens, pas de
+        l'historique du compte. Un ordre exécuté est enregistré comme
+        s'il avait répondu ; un ordre absent (ou sans exécution) est
+        marqué 'failed'. Retourne le nombre de trades récupérés.
+        """
+        if self.is_simulated:
+            return 0
+        intents = models.get_pending_order_intents()
+        if not intents:
+            return 0
+
+        now_ms = int(time.time() * 1000)
+        by_coin = {}
+        for intent in intents:
+            by_coin.setdefault(intent["coin"], []).append(intent)
+
+        recovered = 0
+        for coin, pending in by_coin.items():
+            since_ms = min(i["created_ms"] for i in pending) - 60_000
+            found = self.exchange.find_orders(
+                coin, [i["client_order_id"] for i in pending], since_ms,
+            )
+            # Une écriture par coin ; chaque trade récupéré sous savepoint
+            recovered += db.write(self._settle_intents, coin, pending, found, now_ms)
+        return recovered
+
+    def _settle_intents(self, coin, pending, found, now_ms):
+        recovered = 0
+        for intent in pending:
+            try:
+                recovered += self._settle_intent(coin, intent, found, now_ms)
+            except Exception as e:
+                logger.error(f"Ordre {intent['client_order_id']} non soldé: {e}")
+        return recovered
+
+    def _settle_intent(self, coin, intent, found, now_ms):
+        """Solde une intention d'après la recherche Binance → 1 si trade récupéré."""
+        cid = intent["client_order_id"]
+        if cid not in found:
+            if now_ms - intent["created_ms"] < _ORDER_LOOKUP_GRACE_MS:
+                return 0
+            models.fail_order_intent(cid, "introuvable chez Binance")
+            logger.warning(f"Ordre {cid} ({intent['side']} {coin}) jamais exécuté")
+            return 0
+        result = found[cid]
+        if result is None:
+            models.fail_order_intent(cid, "aucune exécution")
+            return 0
+        trade_id = self._record_trade(
+            coin, intent["side"], result, intent["signal_id"], cid,
+            decided_ms=intent["created_ms"],
+        )
+        logger.warning(f"Trade #{trade_id} récupéré: {intent['side']} {coin} "
+                       f"${float(result['amount_usdt']):.2f} (ordre {cid})")
+        return 1
 
     # ================================================================
     # Helpers
     # ================================================================
 
+    @staticmethod
+    def _is_cancelled(cancel_event):
+        """Point de contrôle d'annulation (appelé entre deux ordres)."""
+        return cancel_event is not None and cancel_event.is_set()
+
+    def _finish_cancelled(self, signal_id, executed):
+        reason = f"Annulé (timeout) après {executed} trade(s)"
+        logger.warning(f"Signal {signal_id}: {reason}")
+        models.update_signal_status(signal_id, "cancelled", reason)
+        return {"status": "cancelled", "reason": reason, "trades_executed": executed}
+
     def _update_position(self, coin, side, result):
-        """Met à jour une position après un trade."""
-        pos = models.get_position(coin)
-        qty = Decimal(str(result["quantity"]))
-        price = Decimal(str(result["price"]))
-        amount = Decimal(str(result["amount_usdt"]))
+        """Met à jour une position après un trade (mémoire + SQLite)."""
+        self.portfolio.apply_trade(
+            coin, side, result["quantity"], result["price"], result["amount_usdt"],
+        )
 
-        if side == "BUY":
-            if pos and Decimal(str(pos["quantity"])) > 0:
-                old_qty = Decimal(str(pos["quantity"]))
-                old_invested = Decimal(str(pos["total_invested_usdt"]))
-                new_qty = old_qty + qty
-                new_invested = old_invested + amount
-                new_avg = new_invested / new_qty if new_qty > 0 else Decimal(0)
-            else:
-                new_qty = qty
-                new_invested = amount
-                new_avg = price
-            models.upsert_position(coin, float(new_qty), float(new_avg), float(new_invested))
+    def _finish_signal(self, signal_id, prices, executed, skips, errors, cancelled):
+        """Snapshot post-signal et statut final, en une seule écriture.
 
-        elif side == "SELL":
-            if pos:
-                old_qty = Decimal(str(pos["quantity"]))
-                old_invested = Decimal(str(pos["total_invested_usdt"]))
-                new_qty = old_qty - qty
-                if new_qty <= 0:
-                    new_qty = Decimal(0)
-                    new_invested = Decimal(0)
-                    new_avg = Decimal(0)
-                else:
-                    ratio = new_qty / old_qty if old_qty > 0 else Decimal(0)
-                    new_invested = old_invested * ratio
-                    new_avg = Decimal(str(pos["avg_entry_price"]))
-                models.upsert_position(coin, float(new_qty), float(new_avg), float(new_invested))
+        La valorisation (taux EUR, soldes) est faite avant : le thread
+        d'écriture ne fait que du SQLite. Avec DEFERRED_SNAPSHOTS, le
+        snapshot (et le contrôle de survie qui en découle) part sur le
+        thread d'écritures différées, hors du chemin de trading.
+        """
+        snapshot = None if Settings.DEFERRED_SNAPSHOTS else self._snapshot_values(prices)
+        result = db.write(self._write_finish, signal_id, snapshot,
+                          executed, skips, errors, cancelled)
+        if snapshot is None:
+            db.defer(self._write_snapshot, prices)
+        else:
+            self.budget_mgr.check_survival(float(snapshot[0]))
+        return result
 
-    def _save_snapshot(self, prices):
-        """Sauvegarde un snapshot du portfolio."""
+    def _write_finish(self, signal_id, snapshot, executed, skips, errors, cancelled):
+        if snapshot is not None:
+            models.insert_snapshot(*snapshot)
+
+        if cancelled:
+            return self._finish_cancelled(signal_id, executed)
+
+        if errors:
+            models.update_signal_status(signal_id, "error", "; ".join(errors))
+        elif executed == 0 and skips:
+            models.update_signal_status(signal_id, "skipped", "; ".join(skips))
+        else:
+            models.update_signal_status(signal_id, "executed")
+
+        logger.info(f"=== Signal {signal_id}: {executed} trade(s), {len(skips)} skip(s) ===")
+        return {"status": "ok", "trades_executed": executed}
+
+    def _snapshot_values(self, prices):
+        """(valeur totale EUR, valeur des positions, cash) aux prix donnés."""
         eur_rate = self.market.get_eurusdc_rate()
         cash = self._get_cash_balance()
-        positions = models.get_positions()
+        positions = self.portfolio.snapshot().positions
         portfolio_value = self._calc_portfolio_value(positions, prices)
         total_usdt = cash + portfolio_value
-        total_eur = float(total_usdt * eur_rate)
+        return total_usdt * eur_rate, portfolio_value, cash
 
+    def _write_snapshot(self, prices):
+        total_eur, portfolio_value, cash = self._snapshot_values(prices)
         models.insert_snapshot(
             total_value_eur=total_eur,
-            portfolio_value_usdt=float(portfolio_value),
-            cash_usdt=float(cash),
+            portfolio_value_usdt=portfolio_value,
+            cash_usdt=cash,
         )
-
-        self.budget_mgr.check_survival(total_eur)
+        self.budget_mgr.check_survival(float(total_eur))
 
     def _get_cash_balance(self):
         """Solde USDC disponible."""
@@ -459,31 +738,23 @@ class Follower:
             if not budget:
                 return Decimal(0)
             # En dry_run : budget initial en USDC - achats + ventes - retraits
+            # (totaux courants du grand livre, sans reparcourir l'historique)
             eur_rate = self.market.get_eurusdc_rate()
             total_usdc = Decimal(str(budget["initial_total_eur"])) / eur_rate
-            total_bought = self._get_total_trade_amount("BUY")
-            total_sold = self._get_total_trade_amount("SELL")
-            withdrawals = Decimal(str(models.get_total_withdrawals()))
-            return total_usdc - total_bought + total_sold - withdrawals
+            ledger = models.get_cash_ledger()
+            return (total_usdc
+                    - ledger["bought_usdt"]
+                    + ledger["sold_usdt"]
+                    - ledger["withdrawn_usdt"])
 
         # En live, solde réel Binance
         return self.exchange.get_account_balance("USDC")
 
-    def _get_total_trade_amount(self, action):
-        """Total USDC dépensé (BUY) ou reçu (SELL) depuis les trades."""
-        from app.db import get_cursor
-        with get_cursor() as cur:
-            cur.execute(
-                "SELECT COALESCE(SUM(amount_usdt), 0) FROM trades WHERE action = ?",
-                (action,),
-            )
-            return Decimal(str(cur.fetchone()[0]))
-
     def _calc_portfolio_value(self, positions, prices):
         """Valeur totale des positions en USDC."""
         total = Decimal(0)
         for pos in positions:
-            qty = Decimal(str(pos["quantity"]))
+            qty = pos["quantity"]
             if qty <= 0:
                 continue
             price = prices.get(pos["coin"])
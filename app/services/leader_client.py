@@ -0,0 +1,176 @@
+"""Client HTTP partagé pour les appels au leader Cash-a-lot.
+
+Une seule `requests.Session` (keep-alive, pool de connexions, retries)
+réutilisée par le poller, le flux SSE et le wizard de setup : la poignée
+de main TCP/TLS n'est payée qu'une fois au lieu d'une fois par poll.
+
+Les connexions sont instrumentées (durée TCP, durée TLS, temps de
+réponse) pour vérifier la réutilisation depuis le dashboard.
+"""
+
+import hashlib
+import hmac
+import logging
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+from config.settings import Settings
+
+logger = logging.getLogger("calvalot.leader_client")
+
+_CONNECT_TIMEOUT = 5    # secondes (TCP + TLS)
+_READ_TIMEOUT = 10      # secondes (attente de la réponse)
+_POOL_SIZE = 4          # poller + flux SSE + wizard + marge
+
+_stats_lock = threading.Lock()
+_stats = {
+    "requests": 0,
+    "connections_opened": 0,
+    "last_connect_ms": None,
+    "last_tls_ms": None,
+    "last_response_ms": None,
+    "avg_response_ms": None,
+}
+
+
+def _record(key, value_ms):
+    with _stats_lock:
+        _stats[key] = round(value_ms, 2)
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        started = time.perf_counter()
+        super().connect()
+        with _stats_lock:
+            _stats["connections_opened"] += 1
+        _record("last_connect_ms", (time.perf_counter() - started) * 1000)
+        _record("last_tls_ms", 0)
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    def _new_conn(self):
+        started = time.perf_counter()
+        sock = super()._new_conn()
+        self._tcp_ms = (time.perf_counter() - started) * 1000
+        return sock
+
+    def connect(self):
+        self._tcp_ms = 0
+        started = time.perf_counter()
+        super().connect()
+        total_ms = (time.perf_counter() - started) * 1000
+        with _stats_lock:
+            _stats["connections_opened"] += 1
+        _record("last_connect_ms", self._tcp_ms)
+        _record("last_tls_ms", total_ms - self._tcp_ms)
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TimedHTTPConnectionPool,
+            "https": _TimedHTTPSConnectionPool,
+        }
+
+
+def signed_headers(secret=None):
+    """En-têtes d'auth HMAC attendus par /api/signal/* du leader."""
+    secret = Settings.SIGNAL_SECRET if secret is None else secret
+    timestamp = str(int(time.time()))
+    signature = hmac.new(
+        secret.encode(),
+        timestamp.encode(),
+        hashlib.sha256,
+    ).hexdigest()
+    return {
+        "X-Signal-Timestamp": timestamp,
+        "X-Signal-Signature": signature,
+        "X-Follower-Version": Settings.VERSION,
+    }
+
+
+class LeaderClient:
+    """Session HTTP thread-safe vers le leader.
+
+    Le pool urllib3 est thread-safe : chaque thread emprunte sa propre
+    connexion. La session n'a pas d'état mutable partagé côté appelant
+    (pas de cookies, en-têtes passés par requête).
+    """
+
+    def __init__(self):
+        retry = Retry(
+            total=2,
+            connect=2,
+            read=0,                      # jamais de rejeu après envoi
+            status=2,
+            backoff_factor=0.5,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset({"GET"}),
+            raise_on_status=False,
+        )
+        adapter = _TimedAdapter(
+            pool_connections=2,
+            pool_maxsize=_POOL_SIZE,
+            max_retries=retry,
+        )
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def get(self, url, headers=None, params=None, stream=False,
+            connect_timeout=_CONNECT_TIMEOUT, read_timeout=_READ_TIMEOUT):
+        resp = self.session.get(
+            url, headers=headers, params=params, stream=stream,
+            timeout=(connect_timeout, read_timeout),
+        )
+        response_ms = resp.elapsed.total_seconds() * 1000
+        with _stats_lock:
+            _stats["requests"] += 1
+            _stats["last_response_ms"] = round(response_ms, 2)
+            avg = _stats["avg_response_ms"]
+            # Moyenne exponentielle : réagit vite sans garder d'historique
+            _stats["avg_response_ms"] = round(
+                response_ms if avg is None else avg * 0.8 + response_ms * 0.2, 2,
+            )
+        return resp
+
+    @staticmethod
+    def get_stats():
+        with _stats_lock:
+            stats = dict(_stats)
+        if stats["requests"]:
+            stats["connection_reuse_pct"] = round(
+                100 * (1 - min(stats["connections_opened"], stats["requests"])
+                       / stats["requests"]), 1,
+            )
+        return stats
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_leader_client():
+    """Instance partagée (créée au premier appel)."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = LeaderClient()
+    return _client
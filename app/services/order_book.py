@@ -0,0 +1,168 @@
+"""Carnets d'ordres pour la simulation dry_run.
+
+Un ordre market simulé parcourt le carnet niveau par niveau : prix
+moyen pondéré (VWAP) réaliste selon la taille de l'ordre, exécution
+partielle si la profondeur visible ne suffit pas.
+
+Sources, dans l'ordre :
+1. `GET /api/v3/depth` (100 niveaux, poids 5) ;
+2. un carnet enregistré (`DEPTH_FIXTURES_DIR/<SYMBOL>.json`, cf.
+   `python -m tools.record_depth`), recentré sur le prix courant ;
+3. rien : l'appelant retombe sur le slippage fixe.
+
+Mémoire bornée : au plus `max_symbols` carnets (LRU), 100 niveaux par
+côté. Un carnet n'est rafraîchi que pour le symbole simulé, quand il
+a vieilli (valeur un peu vieille servie pendant le rafraîchissement),
+et jamais plus d'une fois par `_MIN_REFETCH` secondes. Après un échec,
+le symbole attend un backoff exponentiel avant le prochain `/depth` ;
+entre-temps, l'appelant retombe sur le prix ticker.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from decimal import Decimal
+
+logger = logging.getLogger("calvalot.order_book")
+
+_LEVELS = 100
+_MAX_SYMBOLS = 8
+_FRESH_TTL = 10      # secondes
+_STALE_TTL = 120     # secondes
+_MIN_REFETCH = 5     # secondes entre deux /depth d'un même symbole
+_MAX_BACKOFF = 300   # secondes, après des échecs répétés
+
+
+class OrderBookCache:
+    def __init__(self, fetcher, fixtures_dir="", max_symbols=_MAX_SYMBOLS):
+        self._fetcher = fetcher            # fetcher(symbol, limit) -> réponse depth
+        self.fixtures_dir = fixtures_dir
+        self.max_symbols = max_symbols
+        self._books = OrderedDict()        # symbol -> (bids, asks, fetched_at, source)
+        self._lock = threading.Lock()
+        self._inflight = set()
+        self._next_fetch = {}              # symbol -> time.time() du prochain /depth permis
+        self._failures = {}                # symbol -> échecs consécutifs
+        self.stats = {"fetches": 0, "fetch_errors": 0, "fixture_loads": 0, "evictions": 0}
+
+    def get(self, symbol, mid_price=None):
+        """(bids, asks) du symbole, ou None si aucune source disponible.
+
+        `mid_price` sert à recentrer un carnet enregistré.
+        """
+        with self._lock:
+            entry = self._books.get(symbol)
+            if entry is not None:
+                self._books.move_to_end(symbol)
+        age = time.time() - entry[2] if entry else None
+
+        if entry is None or age > _STALE_TTL:
+            entry = self._refresh(symbol) or self._load_fixture(symbol, mid_price)
+        elif age > _FRESH_TTL and entry[3] == "live":
+            self._refresh_async(symbol)
+        if entry is None:
+            return None
+        return entry[0], entry[1]
+
+    # ── Sources ────────────────────────────────────────
+
+    def _store(self, symbol, bids, asks, source):
+        entry = (bids[:_LEVELS], asks[:_LEVELS], time.time(), source)
+        with self._lock:
+            self._books[symbol] = entry
+            self._books.move_to_end(symbol)
+            while len(self._books) > self.max_symbols:
+                self._books.popitem(last=False)
+                self.stats["evictions"] += 1
+        return entry
+
+    def _refresh(self, symbol):
+        """Snapshot `/depth` ; None si en cours, trop tôt (backoff) ou en échec."""
+        with self._lock:
+            if symbol in self._inflight or time.time() < self._next_fetch.get(symbol, 0):
+                return None
+            self._inflight.add(symbol)
+        try:
+            depth = self._fetcher(symbol, _LEVELS)
+            self.stats["fetches"] += 1
+            self._failures.pop(symbol, None)
+            self._next_fetch[symbol] = time.time() + _MIN_REFETCH
+            return self._store(symbol, _levels(depth["bids"]), _levels(depth["asks"]), "live")
+        except Exception as e:
+            self.stats["fetch_errors"] += 1
+            failures = self._failures[symbol] = self._failures.get(symbol, 0) + 1
+            backoff = min(_MIN_REFETCH * 2 ** failures, _MAX_BACKOFF)
+            self._next_fetch[symbol] = time.time() + backoff
+            logger.debug(f"Carnet {symbol} indisponible ({failures} échec(s), "
+                         f"nouvel essai dans {backoff}s): {e}")
+            return None
+        finally:
+            with self._lock:
+                self._inflight.discard(symbol)
+
+    def _refresh_async(self, symbol):
+        if time.time() < self._next_fetch.get(symbol, 0):
+            return
+        threading.Thread(
+            target=self._refresh, args=(symbol,), daemon=True, name="calvalot-depth",
+        ).start()
+
+    def _load_fixture(self, symbol, mid_price):
+        if not self.fixtures_dir:
+            return None
+        path = os.path.join(self.fixtures_dir, f"{symbol}.json")
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        bids, asks = _levels(data["bids"]), _levels(data["asks"])
+        if mid_price and data.get("mid"):
+            # Recentrer le carnet enregistré sur le prix courant
+            ratio = Decimal(str(mid_price)) / Decimal(str(data["mid"]))
+            bids = [(p * ratio, q) for p, q in bids]
+            asks = [(p * ratio, q) for p, q in asks]
+        self.stats["fixture_loads"] += 1
+        return self._store(symbol, bids, asks, "fixture")
+
+    def get_status(self):
+        now = time.time()
+        with self._lock:
+            books = {s: {"source": e[3], "age_seconds": round(now - e[2], 1)}
+                     for s, e in self._books.items()}
+        return {**self.stats, "books": books,
+                "backoff": {s: n for s, n in self._failures.items()}}
+
+
+def _levels(raw):
+    return [(Decimal(str(p)), Decimal(str(q))) for p, q in raw]
+
+
+def walk_book(levels, quantity=None, quote_amount=None):
+    """Exécute un ordre market sur un côté du carnet.
+
+    BUY : `levels` = asks, montant `quote_amount`. SELL : `levels` =
+    bids, `quantity`. Retourne (quantité, montant quote, niveaux
+    touchés) ; quantité < demandée si le carnet visible est épuisé.
+    """
+    filled_qty = Decimal(0)
+    filled_quote = Decimal(0)
+    used = 0
+    for price, size in levels:
+        if quote_amount is not None:
+            remaining = quote_amount - filled_quote
+            if remaining <= 0:
+                break
+            take = min(size, remaining / price)
+        else:
+            remaining = quantity - filled_qty
+            if remaining <= 0:
+                break
+            take = min(size, remaining)
+        filled_qty += take
+        filled_quote += take * price
+        used += 1
+    return filled_qty, filled_quote, used
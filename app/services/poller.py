@@ -1,20 +1,26 @@
 """Poller qui interroge Cash-a-lot pour récupérer les signaux.
 
 Thread en arrière-plan qui poll l'endpoint /api/signal/latest
-toutes les POLL_INTERVAL_SECONDS secondes.
+toutes les POLL_INTERVAL_SECONDS secondes. En mode SSE, les signaux
+poussés par le leader réveillent le poller immédiatement ; le polling
+reste actif comme filet de sécurité.
 """
 
+import collections
 import hashlib
-import hmac
+import json
 import logging
 import os
 import threading
 import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
 
 import requests
 
 from config.settings import Settings
-from app import models
+from app import db, models
+from app.services.execution_worker import ExecutionWorker
+from app.services.leader_client import get_leader_client, signed_headers
 
 logger = logging.getLogger("calvalot.poller")
 
@@ -24,19 +30,51 @@ _paused = False
 _last_poll_result = None
 _last_poll_time = None
 _follower = None  # Référence au Follower, injectée par __init__.py
-_poll_count = 0   # Compteur pour les tâches périodiques (cleanup, etc.)
+_next_cleanup = None  # time.monotonic() du prochain nettoyage périodique
+_CLEANUP_SECONDS = 86400  # indépendant du rythme des polls et des signaux SSE
 _last_new_signal_time = None  # Timestamp du dernier signal nouveau reçu
 _NO_SIGNAL_ALERT_SECONDS = 14400  # 4 heures sans signal = alerte (Cash-a-lot cycle = 1h + pre-filter skip)
+_wakeup = threading.Event()  # Réveil anticipé du poller (signal poussé par SSE)
+_pushed_signals = collections.deque(maxlen=16)
+_stream = None  # SignalStream si SIGNAL_TRANSPORT = sse | auto
+_worker = None  # ExecutionWorker : un seul thread d'exécution, file bornée
+
+# Requêtes conditionnelles : validateurs envoyés au leader
+_NOT_MODIFIED = object()  # Retour de _fetch_signal quand rien n'a changé
+_last_etag = None          # ETag renvoyé par le leader
+_last_body_digest = None   # Empreinte du dernier corps (leader sans ETag)
+_last_signal_id = None     # Dernier signal_id connu (cache de models.get_last_signal_id)
+_candidate_validators = None  # (etag, digest) du dernier corps, retenus une fois le signal enregistré
+# Un 304 masque aussi `update.required` : sans validateurs tous les N polls,
+# le corps complet est relu et la demande de mise à jour vérifiée.
+_FULL_FETCH_EVERY = 15     # ≈ 30 min à 120 s
+_conditional_polls = 0
+
+# Rattrapage des signaux manqués (démarrage, leader injoignable)
+_needs_catchup = True
+_backlog_supported = True
+_fetch_stats = {
+    "polls": 0,
+    "not_modified": 0,
+    "bytes_received": 0,   # octets reçus sur le réseau (compressés)
+    "bytes_decoded": 0,    # octets après décompression gzip
+    "parse_ms": 0.0,       # temps total de décodage JSON
+    "last_bytes_received": 0,
+    "last_parse_ms": 0.0,
+}
 
 
 def init_poller(follower_service):
-    """Démarre le thread de polling."""
-    global _poller_thread, _running
+    """Démarre le thread de polling (et le flux SSE si activé)."""
+    global _poller_thread, _running, _stream, _worker
 
     if _poller_thread and _poller_thread.is_alive():
         logger.warning("Poller déjà démarré")
         return
 
+    _worker = ExecutionWorker(follower_service)
+    _worker.start()
+
     _running = True
     _poller_thread = threading.Thread(
         target=_poll_loop,
@@ -48,21 +86,38 @@ def init_poller(follower_service):
     logger.info(f"Poller démarré: interval {Settings.POLL_INTERVAL_SECONDS}s "
                 f"→ {Settings.LEADER_URL}")
 
+    if Settings.SIGNAL_TRANSPORT in ("sse", "auto"):
+        from app.services.signal_stream import SignalStream
+        # "sse" force le flux : un leader sans flux est retenté au rythme du backoff
+        retry = 300 if Settings.SIGNAL_TRANSPORT == "sse" else 1800
+        _stream = SignalStream(on_signal=_on_pushed_signal, unsupported_retry=retry)
+        _stream.start()
+
+
+def _on_pushed_signal(signal):
+    """Callback du flux SSE : confie le signal au thread du poller."""
+    _pushed_signals.append(signal)
+    _wakeup.set()
+
 
 def _poll_loop(follower_service):
     """Boucle principale du poller."""
     global _last_poll_result, _last_poll_time
 
+    db.dedicated_reader()
+
     # Premier poll immédiat
     _do_poll(follower_service)
 
     while _running:
-        time.sleep(Settings.POLL_INTERVAL_SECONDS)
+        _wakeup.wait(timeout=Settings.POLL_INTERVAL_SECONDS)
+        _wakeup.clear()
 
         if not _running:
             break
 
         if _paused:
+            _pushed_signals.clear()  # le prochain poll récupèrera le dernier
             continue
 
         _do_poll(follower_service)
@@ -70,16 +125,20 @@ def _poll_loop(follower_service):
 
 def _do_poll(follower_service):
     """Un cycle de polling."""
-    global _last_poll_result, _last_poll_time, _poll_count, _last_new_signal_time
+    global _last_poll_result, _last_poll_time, _next_cleanup, _last_new_signal_time
 
     _last_poll_time = time.time()
-    _poll_count += 1
 
     # Tâches périodiques
-    # 1. Nettoyage des vieux snapshots (toutes les 720 itérations ≈ 1x/jour à 120s)
-    if _poll_count % 720 == 0:
+    # 1. Nettoyage des vieux snapshots (1x/jour)
+    now = time.monotonic()
+    if _next_cleanup is None:
+        _next_cleanup = now + _CLEANUP_SECONDS
+    elif now >= _next_cleanup:
+        _next_cleanup = now + _CLEANUP_SECONDS
         try:
             models.cleanup_old_snapshots()
+            db.optimize()
             logger.info("Nettoyage périodique des snapshots effectué")
         except Exception as e:
             logger.warning(f"Erreur nettoyage snapshots: {e}")
@@ -94,8 +153,36 @@ def _do_poll(follower_service):
             except Exception as e:
                 logger.warning(f"Erreur alerte no_signal: {e}")
 
+    # Signaux poussés par le flux SSE : pas besoin d'interroger le leader
+    if _pushed_signals:
+        while _pushed_signals:
+            _handle_signal(follower_service, _pushed_signals.popleft())
+        return
+
+    # Après un redémarrage ou une coupure : rattraper l'historique manqué
+    if _needs_catchup:
+        try:
+            if _catch_up(follower_service):
+                return
+        except Exception as e:
+            logger.exception(f"Erreur rattrapage: {e}")
+            _last_poll_result = {"status": "error", "error": "Erreur de rattrapage"}
+            return
+
+    _handle_signal(follower_service, None)
+
+
+def _handle_signal(follower_service, signal):
+    """Déduplique, enregistre et exécute un signal (poussé ou à récupérer)."""
+    global _last_poll_result, _last_signal_id
+
     try:
-        signal = _fetch_signal()
+        if signal is None:
+            signal = _fetch_signal()
+
+        if signal is _NOT_MODIFIED:
+            _last_poll_result = {"status": "not_modified", "signal_id": _last_signal_id}
+            return
 
         if signal is None:
             _last_poll_result = {"status": "no_signal"}
@@ -108,6 +195,7 @@ def _do_poll(follower_service):
 
         # Vérifier si ce signal a déjà été traité (déduplication)
         if models.signal_exists(signal_id):
+            _commit_validators()
             _last_poll_result = {"status": "already_processed", "signal_id": signal_id}
             # Même si le signal est déjà traité, vérifier l'update
             update_info = signal.get("update")
@@ -115,15 +203,8 @@ def _do_poll(follower_service):
                 _request_update(update_info)
             return
 
-        _last_new_signal_time = time.time()
         logger.info(f"Nouveau signal reçu: {signal_id}")
-
-        # Reset l'alerte no_signal si on en reçoit un
-        try:
-            from app.services.notifier import reset_alert
-            reset_alert("no_signal")
-        except ImportError:
-            pass
+        _mark_new_signal()
 
         # Enregistrer le signal
         models.insert_signal(
@@ -133,78 +214,171 @@ def _do_poll(follower_service):
             actions=signal.get("actions", []),
             portfolio_state=signal.get("portfolio_state"),
         )
+        _last_signal_id = signal_id
+        _commit_validators()
 
-        # Exécuter le signal (avec timeout pour éviter de bloquer le poller)
-        result = _execute_with_timeout(follower_service, signal, timeout=90)
-        _last_poll_result = {
-            "status": "executed",
-            "signal_id": signal_id,
-            "trades": result.get("trades_executed", 0),
-        }
-
-        # Auto-update : vérifier si le leader demande une mise à jour
-        # (toujours APRÈS l'exécution du signal — trading prioritaire)
-        update_info = signal.get("update")
-        if update_info and update_info.get("required"):
-            _request_update(update_info)
+        _run_signal(follower_service, signal)
 
     except Exception as e:
         logger.exception(f"Erreur polling: {e}")
         _last_poll_result = {"status": "error", "error": "Erreur de polling"}
 
 
+def _mark_new_signal():
+    """Un nouveau signal est arrivé : reset du timer et de l'alerte no_signal."""
+    global _last_new_signal_time
+
+    _last_new_signal_time = time.time()
+    try:
+        from app.services.notifier import reset_alert
+        reset_alert("no_signal")
+    except ImportError:
+        pass
+
+
+def _run_signal(follower_service, signal):
+    """Exécute un signal déjà enregistré en base."""
+    global _last_poll_result
+
+    # Exécuter le signal (avec timeout pour éviter de bloquer le poller)
+    result = _execute_with_timeout(follower_service, signal, timeout=90)
+    _last_poll_result = {
+        "status": "executed",
+        "signal_id": signal.get("signal_id"),
+        "trades": result.get("trades_executed", 0),
+    }
+
+    # Auto-update : vérifier si le leader demande une mise à jour
+    # (toujours APRÈS l'exécution du signal — trading prioritaire)
+    update_info = signal.get("update")
+    if update_info and update_info.get("required"):
+        _request_update(update_info)
+
+
+def _catch_up(follower_service):
+    """Rattrape les signaux émis pendant l'absence du follower.
+
+    Tous les signaux depuis le dernier signal_id stocké sont récupérés en
+    un appel et enregistrés en une transaction. Un signal v2 décrit une
+    allocation cible complète : seul le plus récent est exécuté, les
+    précédents sont marqués `coalesced` (un seul rebalancing au lieu de N).
+
+    Retourne True si un signal a été exécuté.
+    """
+    global _needs_catchup, _last_poll_result, _last_signal_id
+
+    since_id = _last_signal_id or models.get_last_signal_id()
+    if not since_id or not _backlog_supported:
+        _needs_catchup = False
+        return False
+
+    backlog = _fetch_backlog(since_id)
+    if backlog is None:
+        return False  # leader injoignable : on réessaiera au prochain cycle
+    _needs_catchup = False
+
+    backlog = [s for s in backlog
+               if isinstance(s, dict) and s.get("signal_id") and s["signal_id"] != since_id]
+    if not backlog:
+        return False
+
+    newest = backlog[-1]
+    if newest.get("version", 1) >= 2:
+        to_execute = [newest]
+        for s in backlog[:-1]:
+            s["status"] = "coalesced"
+    else:
+        # Signaux v1 = trades individuels : pas de fusion possible
+        to_execute = backlog
+
+    inserted = models.insert_signals_batch(backlog)
+    if not inserted:
+        return False
+
+    coalesced = len(backlog) - len(to_execute)
+    logger.info(f"Rattrapage: {len(inserted)} signal(s) manqué(s) depuis {since_id}, "
+                f"{coalesced} fusionné(s)")
+    _mark_new_signal()
+    _last_signal_id = newest["signal_id"]
+
+    executed = False
+    for signal in to_execute:
+        if signal["signal_id"] in inserted:
+            _run_signal(follower_service, signal)
+            executed = True
+    if executed:
+        _last_poll_result["coalesced"] = coalesced
+    return executed
+
+
 def _execute_with_timeout(follower_service, signal, timeout=90):
-    """Exécute execute_signal dans un thread avec timeout.
+    """Confie le signal au worker d'exécution et attend au plus `timeout`.
 
-    Si l'exécution dépasse le timeout, on log un warning et on retourne
-    un résultat vide. Le thread d'exécution continue en arrière-plan
-    (Python ne permet pas de tuer un thread), mais le poller peut reprendre.
+    Au-delà, l'annulation est demandée : le Follower s'arrête au prochain
+    point de contrôle (entre deux ordres) et le poller reprend. Aucun
+    thread n'est abandonné ; un seul signal s'exécute à la fois.
     """
-    result_holder = [None]
-    error_holder = [None]
+    global _worker
 
-    def _run():
-        try:
-            result_holder[0] = follower_service.execute_signal(signal)
-        except Exception as e:
-            error_holder[0] = e
+    if _worker is None:
+        _worker = ExecutionWorker(follower_service)
 
-    t = threading.Thread(target=_run, daemon=True)
-    t.start()
-    t.join(timeout=timeout)
+    signal_id = signal.get("signal_id", "unknown")
+    job = _worker.submit(signal)
+    if job is None:
+        logger.error(f"File d'exécution pleine, signal {signal_id} non exécuté")
+        models.update_signal_status(signal_id, "skipped", "execution queue full")
+        return {"status": "busy", "trades_executed": 0}
 
-    if t.is_alive():
-        signal_id = signal.get("signal_id", "unknown")
-        logger.error(f"execute_signal TIMEOUT ({timeout}s) pour signal {signal_id}")
+    try:
+        return job.future.result(timeout=timeout)
+    except FutureTimeoutError:
+        job.cancel()
+        _worker.record_timeout()
+        logger.error(f"execute_signal TIMEOUT ({timeout}s) pour signal {signal_id}, "
+                     f"annulation demandée")
         return {"status": "timeout", "trades_executed": 0}
 
-    if error_holder[0]:
-        raise error_holder[0]
 
-    return result_holder[0] or {"status": "error", "trades_executed": 0}
+def _fetch_signal():
+    """Récupère le dernier signal depuis Cash-a-lot avec auth HMAC.
 
+    Requête conditionnelle : le leader reçoit le dernier ETag et le dernier
+    signal_id connu, et peut répondre 304 (ou 204) sans corps. Retourne
+    _NOT_MODIFIED dans ce cas, sans aucun décodage JSON. Tous les
+    _FULL_FETCH_EVERY polls, la requête part sans validateurs : le corps
+    est relu même inchangé, pour voir un `update.required` du leader.
+    """
+    global _candidate_validators, _last_signal_id, _needs_catchup, _conditional_polls
 
-def _fetch_signal():
-    """Récupère le dernier signal depuis Cash-a-lot avec auth HMAC."""
     url = f"{Settings.LEADER_URL.rstrip('/')}/api/signal/latest"
 
-    # Signature HMAC
-    timestamp = str(int(time.time()))
-    signature = hmac.new(
-        Settings.SIGNAL_SECRET.encode(),
-        timestamp.encode(),
-        hashlib.sha256,
-    ).hexdigest()
-
-    headers = {
-        "X-Signal-Timestamp": timestamp,
-        "X-Signal-Signature": signature,
-        "X-Follower-Version": Settings.VERSION,
-    }
+    full = _conditional_polls >= _FULL_FETCH_EVERY
+    _conditional_polls = 0 if full else _conditional_polls + 1
 
-    try:
-        resp = requests.get(url, headers=headers, timeout=10)
+    headers = signed_headers()
+    headers["Accept-Encoding"] = "gzip"
+    if _last_etag and not full:
+        headers["If-None-Match"] = _last_etag
+
+    if _last_signal_id is None:
+        _last_signal_id = models.get_last_signal_id()
+    params = {"since_id": _last_signal_id} if _last_signal_id and not full else None
 
+    try:
+        resp = get_leader_client().get(url, headers=headers, params=params)
+        body = resp.content
+        wire_bytes = resp.raw.tell() if resp.raw is not None else len(body)
+        _fetch_stats["polls"] += 1
+        _fetch_stats["bytes_received"] += wire_bytes
+        _fetch_stats["bytes_decoded"] += len(body)
+        _fetch_stats["last_bytes_received"] = wire_bytes
+        _fetch_stats["last_parse_ms"] = 0.0
+
+        if resp.status_code == 304 or (resp.status_code == 204 and _last_signal_id):
+            # Rien de nouveau depuis since_id / If-None-Match
+            _fetch_stats["not_modified"] += 1
+            return _NOT_MODIFIED
         if resp.status_code == 204:
             # Pas de signal disponible (Cash-a-lot vient de démarrer)
             return None
@@ -216,19 +390,89 @@ def _fetch_signal():
             return None
 
         resp.raise_for_status()
-        return resp.json()
+
+        # Leader sans ETag : on compare l'empreinte du corps brut avant de
+        # payer le décodage JSON.
+        etag = resp.headers.get("ETag")
+        digest = None if etag else hashlib.sha1(body).digest()
+        unchanged = (etag and etag == _last_etag) or (digest and digest == _last_body_digest)
+        if unchanged and not full:
+            _fetch_stats["not_modified"] += 1
+            return _NOT_MODIFIED
+
+        started = time.perf_counter()
+        signal = json.loads(body)
+        parse_ms = (time.perf_counter() - started) * 1000
+        _fetch_stats["parse_ms"] += parse_ms
+        _fetch_stats["last_parse_ms"] = parse_ms
+
+        _candidate_validators = (etag, digest)
+        return signal
 
     except requests.exceptions.ConnectionError:
         logger.warning(f"Leader injoignable: {Settings.LEADER_URL}")
+        _needs_catchup = True
         return None
     except requests.exceptions.Timeout:
         logger.warning("Timeout lors du polling du leader")
+        _needs_catchup = True
         return None
     except Exception as e:
         logger.error(f"Erreur fetch signal: {e}")
         return None
 
 
+def _fetch_backlog(since_id):
+    """Signaux émis après `since_id`, du plus ancien au plus récent.
+
+    Retourne None si le leader est injoignable, [] s'il ne propose pas
+    l'historique (ancien leader) ou s'il n'y a rien de nouveau.
+    """
+    global _backlog_supported
+
+    url = f"{Settings.LEADER_URL.rstrip('/')}/api/signal/history"
+    headers = signed_headers()
+    headers["Accept-Encoding"] = "gzip"
+
+    try:
+        resp = get_leader_client().get(url, headers=headers, params={"since_id": since_id})
+
+        if resp.status_code == 204:
+            return []
+        if resp.status_code in (404, 405):
+            logger.info("Historique des signaux non disponible sur le leader")
+            _backlog_supported = False
+            return []
+        if resp.status_code == 403:
+            logger.warning("Auth HMAC rejetée par le leader")
+            return []
+
+        resp.raise_for_status()
+        data = resp.json()
+        if isinstance(data, dict):
+            data = data.get("signals", [])
+        return data if isinstance(data, list) else []
+
+    except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+        logger.warning("Rattrapage impossible: leader injoignable")
+        return None
+    except Exception as e:
+        logger.error(f"Erreur fetch historique: {e}")
+        return []
+
+
+def _commit_validators():
+    """Retient l'ETag / l'empreinte du corps une fois le signal enregistré.
+
+    Tant que le signal n'est pas en base, on continue de le re-télécharger
+    (une erreur d'enregistrement ne doit pas le masquer définitivement).
+    """
+    global _last_etag, _last_body_digest, _candidate_validators
+    if _candidate_validators:
+        _last_etag, _last_body_digest = _candidate_validators
+        _candidate_validators = None
+
+
 def _request_update(update_info):
     """Écrit un flag file pour déclencher la mise à jour côté hôte.
 
@@ -253,9 +497,15 @@ def get_status():
         "paused": _paused,
         "version": Settings.VERSION,
         "poll_interval_seconds": Settings.POLL_INTERVAL_SECONDS,
+        "signal_transport": Settings.SIGNAL_TRANSPORT,
+        "stream": _stream.get_status() if _stream else None,
         "leader_url": "***" if Settings.LEADER_URL else None,
         "last_poll": _last_poll_result,
         "last_poll_time": _last_poll_time,
+        "fetch_stats": dict(_fetch_stats),
+        "leader_http": get_leader_client().get_stats(),
+        "execution": _worker.get_stats() if _worker else None,
+        "db": db.get_stats(),
     }
 
 
@@ -281,4 +531,9 @@ def stop():
     """Arrête le poller (pour shutdown propre)."""
     global _running
     _running = False
+    _wakeup.set()
+    if _stream:
+        _stream.stop()
+    if _worker:
+        _worker.stop()
     logger.info("Poller arrêté")
@@ -0,0 +1,156 @@
+"""État du portefeuille en mémoire, partagé par le Follower et les routes.
+
+Les positions sont chargées une fois depuis SQLite, puis chaque trade
+est appliqué en mémoire sous verrou et écrit en base dans la foulée
+(write-through : la base reste la référence au redémarrage). Les
+lecteurs reçoivent un `PortfolioSnapshot` immuable, numéroté par
+`version` : pas d'aller-retour SQLite sur le chemin de trading comme
+sur celui du dashboard.
+
+Les calculs de position se font en entiers d'unités (cf. app/money.py),
+comme en base ; les lecteurs voient des Decimal exacts.
+"""
+
+import logging
+import threading
+from types import MappingProxyType
+
+from app import db, models, money
+
+logger = logging.getLogger("calvalot.portfolio")
+
+_MONEY_FIELDS = ("quantity", "avg_entry_price", "total_invested_usdt")
+
+
+def _div_round(numerator, denominator):
+    """Division entière arrondie au plus proche (entiers positifs)."""
+    return (2 * numerator + denominator) // (2 * denominator)
+
+
+def _position(coin, units, updated_at):
+    """Position en lecture seule (mêmes clés qu'une ligne de l'API)."""
+    base, quote = money.assets(coin)
+    qty_units, avg_units, invested_units = units
+    return MappingProxyType({
+        "coin": coin,
+        "quantity": money.from_units(qty_units, base),
+        "avg_entry_price": money.from_units(avg_units, quote),
+        "total_invested_usdt": money.from_units(invested_units, quote),
+        "updated_at": updated_at,
+    })
+
+
+class PortfolioSnapshot:
+    """Vue immuable des positions à une version donnée."""
+
+    __slots__ = ("version", "positions", "_by_coin")
+
+    def __init__(self, version, positions):
+        self.version = version
+        self.positions = tuple(sorted(positions, key=lambda p: p["coin"]))
+        self._by_coin = {p["coin"]: p for p in self.positions}
+
+    def get(self, coin):
+        return self._by_coin.get(coin)
+
+    def to_list(self):
+        """Positions sérialisables en JSON (montants en float)."""
+        return [{k: float(v) if k in _MONEY_FIELDS else v for k, v in p.items()}
+                for p in self.positions]
+
+
+class PortfolioState:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._units = {}   # coin -> (quantité, prix moyen, investi) en unités
+        self._pending = {}  # coin -> unités écrites, pas encore commitées
+        self._snapshot = PortfolioSnapshot(0, ())
+        self.load()
+
+    def load(self):
+        """(Re)charge les positions depuis SQLite."""
+        rows = models.get_positions_units()
+        with self._lock:
+            self._units = {
+                r["coin"]: (r["quantity_units"], r["avg_entry_price_units"], r["invested_units"])
+                for r in rows
+            }
+            positions = [_position(r["coin"], self._units[r["coin"]], models.to_iso(r["updated_ms"]))
+                         for r in rows]
+            self._snapshot = PortfolioSnapshot(self._snapshot.version + 1, positions)
+        logger.info(f"Portefeuille chargé: {len(positions)} position(s)")
+
+    @property
+    def version(self):
+        return self._snapshot.version
+
+    def snapshot(self):
+        """Vue courante (lecture sans verrou : l'objet n'est jamais modifié)."""
+        return self._snapshot
+
+    def get(self, coin):
+        return self._snapshot.get(coin)
+
+    def apply_trade(self, coin, side, quantity, price, amount_usdt):
+        """Applique un trade exécuté : prix moyen et investi recalculés en
+        entiers, écriture en base avant publication de la nouvelle version.
+
+        Dans une écriture (`db.write`), la version n'est publiée qu'au
+        commit (annulée avec elle) : la mémoire ne devance jamais la base.
+        """
+        base, quote = money.assets(coin)
+        qty = money.to_units(quantity, base)
+        amount = money.to_units(amount_usdt, quote)
+        qty_factor = 10 ** money.scale(base)
+
+        with self._lock:
+            old = self._pending.get(coin) or self._units.get(coin)
+            if side == "BUY":
+                if old and old[0] > 0:
+                    new_qty = old[0] + qty
+                    new_invested = old[2] + amount
+                    new_avg = _div_round(new_invested * qty_factor, new_qty) if new_qty > 0 else 0
+                else:
+                    new_qty = qty
+                    new_invested = amount
+                    new_avg = money.to_units(price, quote)
+            elif side == "SELL":
+                if not old:
+                    return self._snapshot
+                old_qty = old[0]
+                new_qty = old_qty - qty
+                if new_qty <= 0:
+                    new_qty = new_invested = new_avg = 0
+                else:
+                    # L'investi restant suit la quantité, le prix moyen ne bouge pas
+                    new_invested = _div_round(old[2] * new_qty, old_qty) if old_qty > 0 else 0
+                    new_avg = old[1]
+            else:
+                return self._snapshot
+            units = (new_qty, new_avg, new_invested)
+            self._pending[coin] = units
+
+        # Hors verrou : le thread d'écriture le prend pour publier (_publish)
+        try:
+            models.upsert_position(coin, *units)
+        except Exception:
+            self._discard(coin, units)
+            raise
+        db.after_commit(lambda: self._publish(coin, units),
+                        lambda: self._discard(coin, units))
+        return self._snapshot
+
+    def _publish(self, coin, units):
+        with self._lock:
+            self._units[coin] = units
+            if self._pending.get(coin) == units:
+                del self._pending[coin]
+            current = self._snapshot
+            updated = _position(coin, units, models.to_iso(models.now_ms()))
+            others = [p for p in current.positions if p["coin"] != coin]
+            self._snapshot = PortfolioSnapshot(current.version + 1, others + [updated])
+
+    def _discard(self, coin, units):
+        with self._lock:
+            if self._pending.get(coin) == units:
+                del self._pending[coin]
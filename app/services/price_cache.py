@@ -0,0 +1,142 @@
+"""Cache de prix par symbole, partagé par le poller et les threads web.
+
+- Un seul appel REST `ticker/price?symbols=[...]` pour tous les symboles
+  suivis (au lieu de la liste complète des tickers Binance).
+- Stale-while-revalidate : une valeur un peu vieille est servie tout de
+  suite pendant qu'un seul rafraîchissement tourne en arrière-plan.
+- Les défauts de cache concurrents sont fusionnés : un seul thread
+  interroge Binance, les autres attendent son résultat.
+- Le flux websocket (PriceStream) écrit directement dans ce cache.
+- Seuls les symboles que Binance liste sont suivis : un symbole inconnu
+  ferait rejeter tout le lot (-1121) et figerait tous les prix.
+"""
+
+import logging
+import threading
+import time
+
+logger = logging.getLogger("calvalot.price_cache")
+
+_FRESH_TTL = 10       # secondes : valeur servie sans rafraîchissement
+_STALE_TTL = 120      # secondes : valeur servie pendant le rafraîchissement
+_PUSH_MAX_AGE = 300   # flux actif : un symbole calme reste valide 5 min
+_FETCH_WAIT = 15      # secondes max d'attente d'un fetch en cours
+
+
+class PriceCache:
+    def __init__(self, fetcher, symbols, fresh_ttl=_FRESH_TTL, stale_ttl=_STALE_TTL):
+        self._fetcher = fetcher          # fetcher(symbols) -> {symbol: Decimal}
+        self.fresh_ttl = fresh_ttl
+        self.stale_ttl = stale_ttl
+        self.tracked = set(symbols)
+        self.push_alive = None           # callable : flux websocket actif ?
+        self.listed = None               # callable(symbol) : listé par Binance ?
+        self._ignored = set()            # symboles rejetés par Binance (-1121)
+        self._entries = {}               # symbol -> (Decimal, time.time())
+        self._lock = threading.Lock()
+        self._inflight = None            # threading.Event du fetch en cours
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0,
+                      "fetches": 0, "fetch_errors": 0, "pushes": 0}
+
+    def put(self, symbol, price, ts=None):
+        """Mise à jour poussée (flux websocket)."""
+        self._entries[symbol] = (price, ts or time.time())
+        self.stats["pushes"] += 1
+
+    def ignore(self, symbol):
+        """Ne plus suivre un symbole que Binance ne connaît pas."""
+        self._ignored.add(symbol)
+        self.tracked.discard(symbol)
+
+    def get(self, symbol):
+        return self.get_many([symbol]).get(symbol)
+
+    def get_many(self, symbols):
+        """Prix des symboles demandés (None si indisponible)."""
+        fresh_ttl, max_age = self._ttls()
+        missing, stale = self._classify(symbols, fresh_ttl, max_age)
+        if missing:
+            self.stats["misses"] += 1
+            self._refresh(wait=True)
+        elif stale:
+            self.stats["stale_hits"] += 1
+            self._refresh(wait=False)
+        else:
+            self.stats["hits"] += 1
+
+        now = time.time()
+        prices = {}
+        for s in symbols:
+            entry = self._entries.get(s)
+            prices[s] = entry[0] if entry and now - entry[1] <= max_age else None
+        return prices
+
+    def _ttls(self):
+        """(fraîcheur, âge max). Flux actif : pas de REST pour un symbole calme."""
+        if self.push_alive is not None and self.push_alive():
+            return _PUSH_MAX_AGE, _PUSH_MAX_AGE
+        return self.fresh_ttl, self.stale_ttl
+
+    def _classify(self, symbols, fresh_ttl, max_age):
+        now = time.time()
+        missing, stale = [], []
+        for s in symbols:
+            if not self._trackable(s):
+                continue  # jamais de prix : ni suivi ni défaut de cache
+            self.tracked.add(s)
+            entry = self._entries.get(s)
+            if entry is None or now - entry[1] > max_age:
+                missing.append(s)
+            elif now - entry[1] > fresh_ttl:
+                stale.append(s)
+        return missing, stale
+
+    def _trackable(self, symbol):
+        if symbol in self._ignored:
+            return False
+        return self.listed is None or self.listed(symbol)
+
+    def _refresh(self, wait):
+        """Un seul fetch à la fois ; les autres appelants s'y greffent."""
+        with self._lock:
+            inflight = self._inflight
+            leader = inflight is None
+            if leader:
+                inflight = self._inflight = threading.Event()
+
+        if leader:
+            if wait:
+                self._fetch(inflight)
+            else:
+                threading.Thread(
+                    target=self._fetch, args=(inflight,), daemon=True,
+                    name="calvalot-price-refresh",
+                ).start()
+        elif wait:
+            inflight.wait(_FETCH_WAIT)
+
+    def _fetch(self, done):
+        try:
+            symbols = sorted(s for s in set(self.tracked) if self._trackable(s))
+            prices = self._fetcher(symbols) if symbols else {}
+            now = time.time()
+            for symbol, price in prices.items():
+                self._entries[symbol] = (price, now)
+            self.stats["fetches"] += 1
+        except Exception as e:
+            self.stats["fetch_errors"] += 1
+            logger.error(f"Failed to refresh prices: {e}")
+        finally:
+            with self._lock:
+                self._inflight = None
+            done.set()
+
+    def get_status(self):
+        now = time.time()
+        return {
+            **self.stats,
+            "ignored": sorted(self._ignored),
+            "symbol_age_seconds": {
+                s: round(now - ts, 1) for s, (_, ts) in list(self._entries.items())
+            },
+        }
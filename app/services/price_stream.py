@@ -0,0 +1,160 @@
+"""Flux de prix Binance (websocket miniTicker) pour Calv-a-lot.
+
+Un abonnement multiplexé aux symboles suivis + EURUSDC alimente le
+PriceCache de l'ExchangeClient (callback `on_price`). Les lecteurs ne
+passent que par ce cache.
+
+Si le flux est muet depuis trop longtemps (coupure, démarrage hors
+ligne), is_live() devient faux et le cache retombe sur l'API REST. Un
+thread superviseur relance la connexion avec backoff.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from decimal import Decimal
+
+logger = logging.getLogger("calvalot.price_stream")
+
+_MAX_SILENCE = 15        # secondes sans message → flux considéré mort
+_START_TIMEOUT = 30      # secondes pour établir la connexion
+_BACKOFF_MAX = 300       # secondes
+
+
+_manager_cls = None
+
+
+def _get_manager_class():
+    """ThreadedWebsocketManager dont le thread ne lève pas hors ligne.
+
+    Sans réseau, le client async échoue au démarrage et le thread meurt
+    avec une traceback ; on capture l'erreur pour que le superviseur la
+    gère (repli REST + nouvel essai).
+    """
+    global _manager_cls
+    if _manager_cls is None:
+        from binance import ThreadedWebsocketManager
+
+        class _Manager(ThreadedWebsocketManager):
+            error = None
+
+            def run(self):
+                try:
+                    super().run()
+                except Exception as e:
+                    self.error = e
+
+        _manager_cls = _Manager
+    return _manager_cls
+
+
+class PriceStream:
+    def __init__(self, symbols, on_price, testnet=False):
+        self.symbols = list(symbols)
+        self.testnet = testnet
+        self._on_price = on_price  # on_price(symbol, Decimal, ts)
+        self._last_message = 0.0
+        self._twm = None
+        self._stop = threading.Event()
+        self._thread = None
+        self.messages = 0
+        self.restarts = 0
+        self.last_error = None
+
+    # ── Cycle de vie ───────────────────────────────────
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._supervise, daemon=True, name="calvalot-price-stream",
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._stop_manager()
+
+    def _supervise(self):
+        """Démarre le flux et le relance s'il se tait."""
+        backoff = 5
+        while not self._stop.is_set():
+            if self._connect():
+                backoff = 5
+                # Surveillance : relance si plus aucun message
+                while not self._stop.wait(_MAX_SILENCE):
+                    if time.time() - self._last_message > _MAX_SILENCE * 2:
+                        self.last_error = "stream silent"
+                        logger.warning("Flux de prix muet, reconnexion")
+                        break
+            self._stop_manager()
+            if self._stop.is_set():
+                return
+            self.restarts += 1
+            self._stop.wait(backoff)
+            backoff = min(backoff * 2, _BACKOFF_MAX)
+
+    def _connect(self):
+        try:
+            twm = _get_manager_class()(
+                testnet=self.testnet, loop=asyncio.new_event_loop(),
+            )
+            twm.daemon = True
+            twm.start()
+            self._twm = twm
+
+            # start_multiplex_socket attend indéfiniment le client async :
+            # on borne l'attente pour ne pas bloquer le superviseur.
+            deadline = time.time() + _START_TIMEOUT
+            while getattr(twm, "_bsm", None) is None:
+                if not twm.is_alive() or time.time() > deadline or self._stop.is_set():
+                    self.last_error = str(twm.error or "websocket manager failed to start")
+                    logger.warning("Flux de prix indisponible, repli REST")
+                    return False
+                time.sleep(0.2)
+
+            streams = [f"{s.lower()}@miniTicker" for s in self.symbols]
+            twm.start_multiplex_socket(callback=self._on_message, streams=streams)
+            self._last_message = time.time()  # délai de grâce avant le 1er message
+            logger.info(f"Flux de prix connecté ({len(streams)} symboles)")
+            return True
+        except Exception as e:
+            self.last_error = str(e)
+            logger.warning(f"Erreur démarrage flux de prix: {e}")
+            return False
+
+    def _stop_manager(self):
+        twm, self._twm = self._twm, None
+        if twm is not None and twm.is_alive():
+            try:
+                twm.stop()
+            except Exception:
+                pass
+
+    def _on_message(self, msg):
+        data = msg.get("data", msg) if isinstance(msg, dict) else None
+        if not data:
+            return
+        if data.get("e") == "error":
+            self.last_error = data.get("m", "stream error")
+            return
+        if data.get("e") == "24hrMiniTicker":
+            now = time.time()
+            self._on_price(data["s"], Decimal(data["c"]), now)
+            self._last_message = now
+            self.messages += 1
+
+    # ── Lecture ────────────────────────────────────────
+
+    def is_live(self):
+        return time.time() - self._last_message < _MAX_SILENCE
+
+    def get_status(self):
+        return {
+            "live": self.is_live(),
+            "messages": self.messages,
+            "restarts": self.restarts,
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,225 @@
+"""Gouverneur de poids des requêtes Binance.
+
+Toutes les requêtes du client Binance (poller, threads web, simulations)
+passent par un seul gouverneur :
+
+- Une fenêtre par limite d'exchangeInfo `rateLimits` (REQUEST_WEIGHT 1m,
+  ORDERS 10s / 1j), calée comme chez Binance sur l'horloge : le quota de
+  la fenêtre est un seau de jetons rempli à chaque nouvelle fenêtre.
+- Chaque réponse corrige le compteur avec X-MBX-USED-WEIGHT-* /
+  X-MBX-ORDER-COUNT-* (d'autres followers sur la même IP consomment
+  aussi le quota).
+- Priorités : un ordre peut utiliser tout le quota, les lectures
+  nécessaires au trading 85 %, les lectures dashboard / marché 60 %.
+- 429 / 418 : plus aucune requête jusqu'à Retry-After.
+"""
+
+import logging
+import threading
+import time
+from urllib.parse import urlparse
+
+logger = logging.getLogger("calvalot.rate_governor")
+
+PRIORITY_ORDER = 0       # placement d'ordres
+PRIORITY_TRADING = 1     # compte, soldes, exchangeInfo
+PRIORITY_BACKGROUND = 2  # prix, carnet, dashboard
+
+_HEADROOM = {PRIORITY_ORDER: 1.0, PRIORITY_TRADING: 0.85, PRIORITY_BACKGROUND: 0.6}
+_MAX_WAIT = {PRIORITY_ORDER: 15, PRIORITY_TRADING: 30, PRIORITY_BACKGROUND: 5}
+
+# Poids des endpoints utilisés (doc Binance spot, /api/v3)
+_WEIGHTS = {
+    "order": 1,
+    "ticker/price": 4,
+    "account": 20,
+    "exchangeInfo": 20,
+    "depth": 5,
+    "allOrders": 20,
+    "myTrades": 20,
+    "openOrders": 6,
+    "userDataStream": 2,
+    "ping": 1,
+    "time": 1,
+}
+_DEFAULT_WEIGHT = 2
+_TRADING_ENDPOINTS = {"account", "exchangeInfo", "allOrders", "myTrades",
+                      "openOrders", "userDataStream"}
+
+# Limites publiques par défaut, remplacées par exchangeInfo
+_DEFAULT_LIMITS = [
+    {"rateLimitType": "REQUEST_WEIGHT", "interval": "MINUTE", "intervalNum": 1, "limit": 6000},
+    {"rateLimitType": "ORDERS", "interval": "SECOND", "intervalNum": 10, "limit": 100},
+    {"rateLimitType": "ORDERS", "interval": "DAY", "intervalNum": 1, "limit": 200000},
+]
+_INTERVAL_SECONDS = {"SECOND": 1, "MINUTE": 60, "HOUR": 3600, "DAY": 86400}
+
+
+class RateLimited(Exception):
+    """Requête refusée localement (quota épuisé ou IP bannie)."""
+
+
+def _endpoint(url):
+    """`https://api.binance.com/api/v3/ticker/price?...` → `ticker/price`."""
+    path = urlparse(url).path
+    for prefix in ("/api/v3/", "/api/v1/", "/sapi/v1/"):
+        if prefix in path:
+            return path.split(prefix, 1)[1]
+    return path.strip("/")
+
+
+def classify(method, url):
+    """(poids, priorité) d'une requête."""
+    endpoint = _endpoint(url)
+    weight = _WEIGHTS.get(endpoint, _DEFAULT_WEIGHT)
+    if endpoint == "order":
+        if method.lower() == "get":
+            return 4, PRIORITY_TRADING  # consultation d'un ordre
+        return weight, PRIORITY_ORDER
+    if endpoint in _TRADING_ENDPOINTS:
+        return weight, PRIORITY_TRADING
+    return weight, PRIORITY_BACKGROUND
+
+
+class _Window:
+    """Quota d'une fenêtre fixe (ex. poids par minute)."""
+
+    def __init__(self, kind, seconds, limit, header):
+        self.kind = kind          # REQUEST_WEIGHT | ORDERS
+        self.seconds = seconds
+        self.limit = limit
+        self.header = header      # ex. x-mbx-used-weight-1m
+        self.used = 0
+        self._window_id = None
+
+    def roll(self, now):
+        window_id = int(now // self.seconds)
+        if window_id != self._window_id:
+            self._window_id = window_id
+            self.used = 0
+
+    def reset_in(self, now):
+        return self.seconds - (now % self.seconds)
+
+
+class RateGovernor:
+    def __init__(self, rate_limits=None):
+        self._cond = threading.Condition()
+        self._windows = []
+        self._banned_until = 0.0
+        self.stats = {"requests": 0, "waits": 0, "wait_ms_total": 0,
+                      "rejected": 0, "http_429": 0, "http_418": 0}
+        self.configure(rate_limits or _DEFAULT_LIMITS)
+
+    def configure(self, rate_limits):
+        """Dimensionne les fenêtres depuis exchangeInfo `rateLimits`."""
+        windows = []
+        for rl in rate_limits or []:
+            kind = rl.get("rateLimitType")
+            if kind not in ("REQUEST_WEIGHT", "ORDERS"):
+                continue
+            num = rl.get("intervalNum", 1)
+            seconds = _INTERVAL_SECONDS.get(rl.get("interval"), 60) * num
+            suffix = f"{num}{rl.get('interval', 'M')[0]}".lower()
+            prefix = "x-mbx-used-weight-" if kind == "REQUEST_WEIGHT" else "x-mbx-order-count-"
+            windows.append(_Window(kind, seconds, rl["limit"], prefix + suffix))
+        if not windows:
+            return
+        with self._cond:
+            # Conserver les compteurs des fenêtres déjà connues
+            previous = {w.header: w for w in self._windows}
+            for w in windows:
+                old = previous.get(w.header)
+                if old is not None:
+                    w.used, w._window_id = old.used, old._window_id
+            self._windows = windows
+
+    def acquire(self, method, url, blocking=True):
+        """Réserve le poids d'une requête, en attendant si nécessaire.
+
+        Lève RateLimited si l'IP est bannie ou si le quota ne se libère
+        pas dans le délai accordé à la priorité de la requête. Avec
+        `blocking=False`, retourne False au lieu d'attendre ou de lever
+        (requêtes facultatives : sondes, requêtes doublées).
+        """
+        weight, priority = classify(method, url)
+        is_order = priority == PRIORITY_ORDER and method.lower() == "post"
+        deadline = time.time() + _MAX_WAIT[priority]
+        waited = False
+        started = time.time()
+
+        with self._cond:
+            while True:
+                now = time.time()
+                if now < self._banned_until:
+                    if not blocking:
+                        return False
+                    self.stats["rejected"] += 1
+                    raise RateLimited(
+                        f"Binance rate limit: retry in {self._banned_until - now:.0f}s"
+                    )
+                wait = self._wait_needed(now, weight, is_order, _HEADROOM[priority])
+                if wait <= 0:
+                    break
+                if not blocking:
+                    return False
+                if now + wait > deadline:
+                    self.stats["rejected"] += 1
+                    raise RateLimited(f"Binance weight budget exhausted ({_endpoint(url)})")
+                waited = True
+                self._cond.wait(wait)
+
+            for w in self._windows:
+                w.used += weight if w.kind == "REQUEST_WEIGHT" else int(is_order)
+            self.stats["requests"] += 1
+            if waited:
+                self.stats["waits"] += 1
+                self.stats["wait_ms_total"] += int((time.time() - started) * 1000)
+        return True
+
+    def _wait_needed(self, now, weight, is_order, headroom):
+        wait = 0.0
+        for w in self._windows:
+            w.roll(now)
+            cost = weight if w.kind == "REQUEST_WEIGHT" else int(is_order)
+            if cost and w.used + cost > w.limit * headroom:
+                wait = max(wait, w.reset_in(now))
+        return wait
+
+    def on_response(self, response, *args, **kwargs):
+        """Hook `requests` : recale les compteurs et gère 429 / 418."""
+        now = time.time()
+        with self._cond:
+            for w in self._windows:
+                value = response.headers.get(w.header)
+                if value is not None:
+                    w.roll(now)
+                    w.used = max(w.used, int(value))
+            if response.status_code in (418, 429):
+                self.stats[f"http_{response.status_code}"] += 1
+                retry_after = int(response.headers.get("Retry-After", 60))
+                self._banned_until = max(self._banned_until, now + retry_after)
+                logger.error(
+                    f"Binance HTTP {response.status_code}: requêtes suspendues {retry_after}s"
+                )
+            self._cond.notify_all()
+        return response
+
+    def get_status(self):
+        now = time.time()
+        with self._cond:
+            windows = []
+            for w in self._windows:
+                w.roll(now)
+                windows.append({
+                    "type": w.kind,
+                    "window_seconds": w.seconds,
+                    "used": w.used,
+                    "limit": w.limit,
+                    "used_pct": round(w.used / w.limit * 100, 1) if w.limit else None,
+                })
+            return {
+                **self.stats,
+                "windows": windows,
+                "banned_for_seconds": max(0, round(self._banned_until - now)),
+            }
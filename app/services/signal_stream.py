@@ -0,0 +1,177 @@
+"""Abonnement push aux signaux de Cash-a-lot (Server-Sent Events).
+
+Une seule connexion longue, authentifiée HMAC comme le polling, sur
+/api/signal/stream. Chaque événement `signal` est transmis au poller
+qui l'exécute immédiatement au lieu d'attendre le prochain cycle.
+
+En cas de coupure : reconnexion avec backoff exponentiel. Si le leader
+ne propose pas le flux (404/405), on se replie sur le polling seul et
+on retente le flux plus tard.
+"""
+
+import json
+import logging
+import random
+import threading
+import time
+
+import requests
+
+from config.settings import Settings
+from app.services.leader_client import get_leader_client, signed_headers
+
+logger = logging.getLogger("calvalot.signal_stream")
+
+_CONNECT_TIMEOUT = 10        # secondes
+_READ_TIMEOUT = 90           # > 2x le heartbeat du leader (30s)
+_BACKOFF_MIN = 1             # secondes
+_BACKOFF_MAX = 300           # 5 min
+_UNSUPPORTED_RETRY = 1800    # 30 min avant de retenter un leader sans flux
+
+
+class StreamUnsupported(Exception):
+    """Le leader ne propose pas /api/signal/stream."""
+
+
+class SignalStream:
+    def __init__(self, on_signal, unsupported_retry=_UNSUPPORTED_RETRY):
+        self.on_signal = on_signal
+        self.unsupported_retry = unsupported_retry
+        self._thread = None
+        self._stop = threading.Event()
+        self._resp = None
+        self.connected = False
+        self.supported = True
+        self.events_received = 0
+        self.reconnects = 0
+        self.last_event_time = None
+        self.last_error = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, daemon=True, name="calvalot-signal-stream",
+        )
+        self._thread.start()
+        logger.info("Flux SSE démarré → /api/signal/stream")
+
+    def stop(self):
+        self._stop.set()
+        resp = self._resp
+        if resp is not None:
+            try:
+                resp.close()
+            except Exception:
+                pass
+
+    def _run(self):
+        backoff = _BACKOFF_MIN
+        while not self._stop.is_set():
+            started = time.time()
+            try:
+                self._listen()
+                self.last_error = "stream closed by leader"
+            except StreamUnsupported as e:
+                self.supported = False
+                self.last_error = str(e)
+                logger.warning(f"{e} — repli sur le polling, nouvel essai dans "
+                               f"{self.unsupported_retry}s")
+                self._stop.wait(self.unsupported_retry)
+                backoff = _BACKOFF_MIN
+                continue
+            except Exception as e:
+                if self._stop.is_set():
+                    break  # fermeture volontaire de la connexion par stop()
+                self.last_error = type(e).__name__
+                if isinstance(e, requests.exceptions.RequestException):
+                    logger.warning(f"Flux SSE interrompu: {type(e).__name__}")
+                else:
+                    logger.error(f"Erreur flux SSE: {e}")
+            finally:
+                self.connected = False
+                self._resp = None
+
+            if self._stop.is_set():
+                break
+
+            # Une connexion restée ouverte longtemps n'est pas un échec : on
+            # repart du backoff minimal.
+            if time.time() - started > _READ_TIMEOUT:
+                backoff = _BACKOFF_MIN
+            delay = backoff * (0.5 + random.random() / 2)
+            self.reconnects += 1
+            self._stop.wait(delay)
+            backoff = min(backoff * 2, _BACKOFF_MAX)
+
+    def _listen(self):
+        """Ouvre le flux et consomme les événements jusqu'à la coupure."""
+        url = f"{Settings.LEADER_URL.rstrip('/')}/api/signal/stream"
+        headers = signed_headers()
+        headers["Accept"] = "text/event-stream"
+        headers["Cache-Control"] = "no-cache"
+
+        resp = get_leader_client().get(
+            url, headers=headers, stream=True,
+            connect_timeout=_CONNECT_TIMEOUT, read_timeout=_READ_TIMEOUT,
+        )
+        self._resp = resp
+        with resp:
+            if resp.status_code in (404, 405, 501):
+                raise StreamUnsupported(
+                    f"Flux SSE non disponible sur le leader ({resp.status_code})"
+                )
+            if resp.status_code == 403:
+                raise requests.exceptions.HTTPError("Auth HMAC rejetée par le leader")
+            resp.raise_for_status()
+
+            self.supported = True
+            self.connected = True
+            self.last_error = None
+            logger.info("Flux SSE connecté au leader")
+
+            event, data = "message", []
+            for line in resp.iter_lines(decode_unicode=True):
+                if self._stop.is_set():
+                    return
+                if line is None:
+                    continue
+                if line == "":
+                    if data:
+                        self._dispatch(event, "\n".join(data))
+                    event, data = "message", []
+                elif line.startswith(":"):
+                    continue  # heartbeat
+                else:
+                    field, _, value = line.partition(":")
+                    if value.startswith(" "):
+                        value = value[1:]
+                    if field == "event":
+                        event = value
+                    elif field == "data":
+                        data.append(value)
+
+    def _dispatch(self, event, data):
+        if event not in ("signal", "message"):
+            return
+        try:
+            signal = json.loads(data)
+        except ValueError:
+            logger.warning("Événement SSE illisible ignoré")
+            return
+        if not isinstance(signal, dict):
+            return
+        self.events_received += 1
+        self.last_event_time = time.time()
+        self.on_signal(signal)
+
+    def get_status(self):
+        return {
+            "connected": self.connected,
+            "supported": self.supported,
+            "events_received": self.events_received,
+            "reconnects": self.reconnects,
+            "last_event_time": self.last_event_time,
+            "last_error": self.last_error,
+        }
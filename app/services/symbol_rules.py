@@ -0,0 +1,262 @@
+"""Règles de trading par symbole (filtres Binance exchangeInfo).
+
+Remplace les stepSize codés en dur : LOT_SIZE, MARKET_LOT_SIZE et
+NOTIONAL / MIN_NOTIONAL sont lus depuis exchangeInfo, persistés sur le
+volume de données (démarrage à froid sans appel réseau) et rafraîchis
+périodiquement en arrière-plan. Seuls les symboles suivis (coins du
+portfolio, EURUSDC) sont gardés, en mémoire comme sur disque :
+exchangeInfo en liste plus de 2000.
+
+Les ordres que Binance rejetterait sont refusés localement, sans aller-
+retour réseau. Un nouveau coin n'a besoin d'aucune modification de code.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from decimal import Decimal, ROUND_DOWN
+
+logger = logging.getLogger("calvalot.symbol_rules")
+
+_REFRESH_SECONDS = 6 * 3600   # exchangeInfo change rarement
+_RETRY_SECONDS = 300          # après un échec, ou pour un symbole inconnu
+
+
+def _dec(value):
+    return Decimal(str(value)) if value not in (None, "") else Decimal(0)
+
+
+class SymbolRule:
+    """Filtres d'un symbole, en Decimal, prêts pour la validation."""
+
+    __slots__ = ("symbol", "status", "base_asset", "quote_asset",
+                 "base_precision", "quote_precision",
+                 "step_size", "min_qty", "max_qty",
+                 "market_step_size", "market_min_qty", "market_max_qty",
+                 "min_notional", "max_notional")
+
+    def __init__(self, data):
+        for name in self.__slots__:
+            value = data.get(name)
+            if name in ("symbol", "status", "base_asset", "quote_asset"):
+                setattr(self, name, value)
+            elif name in ("base_precision", "quote_precision"):
+                setattr(self, name, int(value) if value is not None else None)
+            else:
+                setattr(self, name, _dec(value))
+
+    @classmethod
+    def from_exchange_info(cls, info):
+        """Construit la règle depuis une entrée `symbols` d'exchangeInfo."""
+        filters = {f["filterType"]: f for f in info.get("filters", [])}
+        lot = filters.get("LOT_SIZE", {})
+        market_lot = filters.get("MARKET_LOT_SIZE", {})
+        # NOTIONAL a remplacé MIN_NOTIONAL ; on ne garde que ce qui
+        # s'applique aux ordres market.
+        notional = filters.get("NOTIONAL") or {}
+        min_notional = notional.get("minNotional") if notional.get("applyMinToMarket", True) else None
+        max_notional = notional.get("maxNotional") if notional.get("applyMaxToMarket", False) else None
+        legacy = filters.get("MIN_NOTIONAL") or {}
+        if min_notional is None and legacy.get("applyToMarket", True):
+            min_notional = legacy.get("minNotional")
+
+        return cls({
+            "symbol": info["symbol"],
+            "status": info.get("status"),
+            "base_asset": info.get("baseAsset"),
+            "quote_asset": info.get("quoteAsset"),
+            "base_precision": info.get("baseAssetPrecision"),
+            "quote_precision": info.get("quoteAssetPrecision"),
+            "step_size": lot.get("stepSize"),
+            "min_qty": lot.get("minQty"),
+            "max_qty": lot.get("maxQty"),
+            "market_step_size": market_lot.get("stepSize"),
+            "market_min_qty": market_lot.get("minQty"),
+            "market_max_qty": market_lot.get("maxQty"),
+            "min_notional": min_notional,
+            "max_notional": max_notional,
+        })
+
+    def to_dict(self):
+        return {name: (str(getattr(self, name)) if isinstance(getattr(self, name), Decimal)
+                       else getattr(self, name))
+                for name in self.__slots__}
+
+    @property
+    def tradable(self):
+        return self.status == "TRADING"
+
+    def quantize_qty(self, qty):
+        """Tronque une quantité au stepSize (arrondi vers le bas)."""
+        qty = _dec(qty)
+        step = max(self.step_size, self.market_step_size)
+        if step <= 0:
+            return qty
+        return (qty / step).to_integral_value(rounding=ROUND_DOWN) * step
+
+    def format_qty(self, qty):
+        """Quantité tronquée, formatée pour l'API (sans exposant)."""
+        return f"{self.quantize_qty(qty).normalize():f}"
+
+    def check_market_order(self, price, quantity=None, quote_amount=None):
+        """Raison du rejet que ferait Binance, ou None si l'ordre passe.
+
+        BUY : `quote_amount` (quoteOrderQty). SELL : `quantity`.
+        `price` est le prix estimé (cache) pour le calcul du notionnel.
+        """
+        if not self.tradable:
+            return f"{self.symbol} non tradable ({self.status})"
+        price = _dec(price)
+        if quantity is not None:
+            qty = self.quantize_qty(quantity)
+            notional = qty * price
+        else:
+            notional = _dec(quote_amount)
+            qty = notional / price if price > 0 else Decimal(0)
+
+        min_qty = max(self.min_qty, self.market_min_qty)
+        if qty <= 0 or qty < min_qty:
+            return f"quantité {qty:f} < minQty {min_qty.normalize():f}"
+        for max_qty in (self.max_qty, self.market_max_qty):
+            if max_qty > 0 and qty > max_qty:
+                return f"quantité {qty:f} > maxQty {max_qty.normalize():f}"
+        if self.min_notional > 0 and notional < self.min_notional:
+            return f"notionnel ${float(notional):.2f} < min ${float(self.min_notional):.2f}"
+        if self.max_notional > 0 and notional > self.max_notional:
+            return f"notionnel ${float(notional):.2f} > max ${float(self.max_notional):.2f}"
+        return None
+
+
+class SymbolRules:
+    """Registre des règles par symbole (lookup O(1), persistance JSON)."""
+
+    def __init__(self, fetcher, cache_path, symbols=None, refresh_seconds=_REFRESH_SECONDS,
+                 on_rate_limits=None, on_rules=None):
+        self._fetcher = fetcher          # fetcher() -> réponse exchangeInfo
+        self.symbols = set(symbols) if symbols else None  # None : tout garder
+        self._on_rate_limits = on_rate_limits  # callback(rateLimits)
+        self._on_rules = on_rules        # callback({symbol: SymbolRule})
+        self.cache_path = cache_path
+        self.refresh_seconds = refresh_seconds
+        self._rules = {}                 # symbol -> SymbolRule
+        self.rate_limits = []            # rateLimits d'exchangeInfo
+        self.fetched_at = 0.0
+        self._next_attempt = 0.0
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self.last_error = None
+
+    def load(self):
+        """Charge le cache disque, sinon interroge Binance (bloquant)."""
+        if self._load_file():
+            logger.info(f"Règles symboles chargées depuis le cache ({len(self._rules)} symboles)")
+        else:
+            self._refresh()
+
+    def get(self, symbol):
+        """Règle du symbole, ou None si inconnue (refresh planifié)."""
+        self._maybe_refresh()
+        rule = self._rules.get(symbol)
+        if rule is None and self._tracks(symbol) and time.time() >= self._next_attempt:
+            self._refresh_async()
+        return rule
+
+    def lists(self, symbol):
+        """Binance liste-t-il le symbole ? Vrai quand on ne peut pas trancher
+        (aucune règle chargée, symbole hors du périmètre suivi)."""
+        return not self._rules or not self._tracks(symbol) or symbol in self._rules
+
+    def _tracks(self, symbol):
+        return self.symbols is None or symbol in self.symbols
+
+    # ── Chargement ─────────────────────────────────────
+
+    def _load_file(self):
+        try:
+            with open(self.cache_path) as f:
+                data = json.load(f)
+            symbols = data["symbols"]
+            self._rules = {s: SymbolRule(r) for s, r in symbols.items() if self._tracks(s)}
+            self.rate_limits = data.get("rate_limits", [])
+            self.fetched_at = data.get("fetched_at", 0.0)
+            self._notify_rate_limits()
+            self._notify_rules()
+            if len(self._rules) < len(symbols):
+                self._save_file()  # ancien cache complet : réécrit allégé
+            return True
+        except (OSError, ValueError, KeyError) as e:
+            if not isinstance(e, FileNotFoundError):
+                logger.warning(f"Cache exchangeInfo illisible: {e}")
+            return False
+
+    def _save_file(self):
+        tmp = f"{self.cache_path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+            with open(tmp, "w") as f:
+                json.dump({
+                    "fetched_at": self.fetched_at,
+                    "rate_limits": self.rate_limits,
+                    "symbols": {s: r.to_dict() for s, r in self._rules.items()},
+                }, f, separators=(",", ":"))
+            os.replace(tmp, self.cache_path)
+        except OSError as e:
+            logger.warning(f"Impossible d'écrire le cache exchangeInfo: {e}")
+
+    def _notify_rate_limits(self):
+        if self._on_rate_limits is not None and self.rate_limits:
+            self._on_rate_limits(self.rate_limits)
+
+    def _notify_rules(self):
+        if self._on_rules is not None:
+            self._on_rules(self._rules)
+
+    def _maybe_refresh(self):
+        if time.time() - self.fetched_at > self.refresh_seconds and time.time() >= self._next_attempt:
+            self._refresh_async()
+
+    def _refresh_async(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(
+            target=self._refresh, daemon=True, name="calvalot-symbol-rules",
+        ).start()
+
+    def _refresh(self):
+        self._next_attempt = time.time() + _RETRY_SECONDS
+        try:
+            info = self._fetcher()
+            rules = {}
+            for entry in info.get("symbols", []):
+                if not self._tracks(entry.get("symbol")):
+                    continue
+                try:
+                    rules[entry["symbol"]] = SymbolRule.from_exchange_info(entry)
+                except (KeyError, ArithmeticError) as e:
+                    logger.debug(f"Symbole ignoré {entry.get('symbol')}: {e}")
+            if rules:
+                self._rules = rules
+                self.rate_limits = info.get("rateLimits", [])
+                self.fetched_at = time.time()
+                self.last_error = None
+                self._notify_rate_limits()
+                self._notify_rules()
+                self._save_file()
+                logger.info(f"Règles symboles rafraîchies ({len(rules)} symboles)")
+        except Exception as e:
+            self.last_error = str(e)
+            logger.warning(f"Échec du chargement exchangeInfo: {e}")
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def get_status(self):
+        return {
+            "symbols": len(self._rules),
+            "age_seconds": round(time.time() - self.fetched_at) if self.fetched_at else None,
+            "last_error": self.last_error,
+        }
@@ -39,6 +39,12 @@ class Settings:
     BINANCE_API_KEY = _get("BINANCE_API_KEY", "")
     BINANCE_API_SECRET = _get("BINANCE_API_SECRET", "")
     BINANCE_TESTNET = (_get("BINANCE_TESTNET", "false") or "false").lower() == "true"
+    # URL d'une API compatible Binance (ex. tools.mock_binance), vide = Binance
+    BINANCE_BASE_URL = _get("BINANCE_BASE_URL", "")
+    # Hôte API : auto (le plus rapide parmi api, api1..api4, api-gcp) | default
+    BINANCE_ENDPOINTS = _get("BINANCE_ENDPOINTS", "auto")
+    # Lectures doublées vers un 2e hôte si la réponse tarde (GET uniquement)
+    HEDGED_READS = (_get("HEDGED_READS", "false") or "false").lower() == "true"
 
     # Budget
     INITIAL_BUDGET_EUR = float(_get("INITIAL_BUDGET_EUR", "100"))
@@ -46,12 +52,28 @@ class Settings:
     # Trading
     TRADING_MODE = _get("TRADING_MODE", "dry_run")  # dry_run | live
     POLL_INTERVAL_SECONDS = int(_get("POLL_INTERVAL_SECONDS", "120"))
+    # Réception des signaux : poll | sse | auto (sse avec repli sur le polling)
+    SIGNAL_TRANSPORT = _get("SIGNAL_TRANSPORT", "auto")
+    # Prix : rest (appel groupé, cache court) | websocket (flux miniTicker, repli REST)
+    PRICE_FEED = _get("PRICE_FEED", "rest")
+
+    # Simulation dry_run : fills calculés sur le carnet d'ordres (sinon slippage fixe)
+    DRY_RUN_DEPTH = (_get("DRY_RUN_DEPTH", "false") or "false").lower() == "true"
+    # Carnets enregistrés (python -m tools.record_depth), utilisés hors ligne
+    DEPTH_FIXTURES_DIR = _get("DEPTH_FIXTURES_DIR", "")
 
     # Sécurité trading
     MIN_ORDER_USDC = 5.0       # Minimum Binance (5 USDC)
     MIN_BUDGET_EUR = 5.0       # Agent meurt en-dessous
     REBALANCE_THRESHOLD_PCT = float(_get("REBALANCE_THRESHOLD_PCT", "0.005"))  # 0.5%
 
+    # Exécution parallèle des jambes d'un rebalancing (SELL puis BUY)
+    PARALLEL_ORDERS = (_get("PARALLEL_ORDERS", "false") or "false").lower() == "true"
+    ORDER_WORKERS = int(_get("ORDER_WORKERS", "3"))
+
+    # Snapshots écrits par un thread de fond, hors du chemin de trading
+    DEFERRED_SNAPSHOTS = (_get("DEFERRED_SNAPSHOTS", "false") or "false").lower() == "true"
+
     # Email alerts (optionnel)
     SMTP_HOST = _get("SMTP_HOST", "ssl0.ovh.net")
     SMTP_PORT = int(_get("SMTP_PORT", "465"))
@@ -61,6 +83,13 @@ class Settings:
 
     # Database SQLite
     DB_PATH = _get("DB_PATH", "/app/data/calvalot.db")
+    # Connexions en lecture seule (Flask, poller) ; cache et mmap par connexion
+    DB_READERS = int(_get("DB_READERS", "4"))
+    DB_CACHE_KB = int(_get("DB_CACHE_KB", "8192"))
+    DB_MMAP_MB = int(_get("DB_MMAP_MB", "64"))
+    # Écritures max par commit groupé, intervalle des checkpoints du WAL
+    DB_WRITE_BATCH = int(_get("DB_WRITE_BATCH", "64"))
+    DB_CHECKPOINT_SECONDS = int(_get("DB_CHECKPOINT_SECONDS", "30"))
 
     # Version (git commit hash, baké dans l'image Docker au build)
     VERSION = os.environ.get("GIT_COMMIT", "unknown")
@@ -86,9 +115,19 @@ class Settings:
         cls.BINANCE_API_KEY = _get("BINANCE_API_KEY", "")
         cls.BINANCE_API_SECRET = _get("BINANCE_API_SECRET", "")
         cls.BINANCE_TESTNET = (_get("BINANCE_TESTNET", "false") or "false").lower() == "true"
+        cls.BINANCE_BASE_URL = _get("BINANCE_BASE_URL", "")
+        cls.BINANCE_ENDPOINTS = _get("BINANCE_ENDPOINTS", "auto")
+        cls.HEDGED_READS = (_get("HEDGED_READS", "false") or "false").lower() == "true"
         cls.INITIAL_BUDGET_EUR = float(_get("INITIAL_BUDGET_EUR", "100"))
         cls.TRADING_MODE = _get("TRADING_MODE", "dry_run")
         cls.POLL_INTERVAL_SECONDS = int(_get("POLL_INTERVAL_SECONDS", "120"))
+        cls.SIGNAL_TRANSPORT = _get("SIGNAL_TRANSPORT", "auto")
+        cls.PRICE_FEED = _get("PRICE_FEED", "rest")
+        cls.DRY_RUN_DEPTH = (_get("DRY_RUN_DEPTH", "false") or "false").lower() == "true"
+        cls.DEPTH_FIXTURES_DIR = _get("DEPTH_FIXTURES_DIR", "")
+        cls.PARALLEL_ORDERS = (_get("PARALLEL_ORDERS", "false") or "false").lower() == "true"
+        cls.ORDER_WORKERS = int(_get("ORDER_WORKERS", "3"))
+        cls.DEFERRED_SNAPSHOTS = (_get("DEFERRED_SNAPSHOTS", "false") or "false").lower() == "true"
         cls.SMTP_HOST = _get("SMTP_HOST", "ssl0.ovh.net")
         cls.SMTP_PORT = int(_get("SMTP_PORT", "465"))
         cls.SMTP_USER = _get("SMTP_USER")
@@ -0,0 +1,90 @@
+"""Benchmark : historique complet vs sous-échantillonnage serveur (LTTB, min/max).
+
+Remplit une base SQLite temporaire avec une table budget_snapshots
+synthétique (marche aléatoire, un snapshot toutes les 30 s, 1 million
+de lignes par défaut), puis compare pour la série entière :
+
+- lecture complète (`get_snapshots` sans limite effective) ;
+- `points=N` en LTTB et en min/max : temps, taille du JSON, et présence
+  du plus haut / plus bas de la série dans le résultat.
+
+    python -m tools.bench_downsample --rows 1000000 --points 1000
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+
+def _fill(rows, seed):
+    """Snapshots synthétiques, du plus ancien au plus récent (30 s d'écart).
+
+    Exécuté par l'écrivain (`db.write`) : une seule transaction.
+    """
+    from app.db import get_cursor
+    rng = random.Random(seed)
+    start_ms = int(time.time() * 1000) - rows * 30_000
+    value = 100.0
+    batch = []
+    with get_cursor() as cur:
+        for i in range(rows):
+            value = max(1.0, value + rng.gauss(0, 0.05))
+            units = int(value * 1e8)
+            batch.append((units, units // 2, units - units // 2, start_ms + i * 30_000))
+            if len(batch) == 50_000 or i == rows - 1:
+                cur.executemany(
+                    """INSERT INTO budget_snapshots
+                           (total_value_eur_units, portfolio_units, cash_units, created_ms)
+                       VALUES (?, ?, ?, ?)""",
+                    batch,
+                )
+                batch.clear()
+
+
+def _run(label, fn, extremes):
+    start = time.perf_counter()
+    series = fn()
+    elapsed = time.perf_counter() - start
+    payload = len(json.dumps(series))
+    values = {s["total_value_eur"] for s in series}
+    kept = "oui" if all(v in values for v in extremes) else "non"
+    print(f"{label:<18} {elapsed * 1000:9.0f} ms  {len(series):>9} points  "
+          f"{payload / 1024:10.0f} Ko  extrêmes gardés: {kept}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--points", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="calvalot-downsample-")
+    os.environ["DB_PATH"] = os.path.join(tmp, "bench.db")
+
+    from app import models
+    from app.db import get_cursor, init_db, write
+    init_db()
+
+    start = time.perf_counter()
+    write(_fill, args.rows, args.seed)
+    print(f"{args.rows} snapshots insérés en {time.perf_counter() - start:.1f} s")
+
+    with get_cursor() as cur:
+        cur.execute(
+            "SELECT MIN(total_value_eur_units), MAX(total_value_eur_units) FROM budget_snapshots"
+        )
+        low, high = cur.fetchone()
+    extremes = (low / 1e8, high / 1e8)
+
+    _run("complet", lambda: models.get_snapshots(limit=args.rows), extremes)
+    _run(f"lttb {args.points}", lambda: models.get_snapshots(points=args.points), extremes)
+    _run(f"minmax {args.points}",
+         lambda: models.get_snapshots(points=args.points, method="minmax"), extremes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""Benchmark de bout en bout : leader → poller → follower → exchange.
+
+Démarre un leader de substitution et un exchange Binance de substitution
+en local, lance la vraie application (`create_app()`, mode live, base
+SQLite temporaire), publie N signaux de rebalancing et mesure :
+
+- signal → premier fill : publication → premier ordre rempli ;
+- signal → terminé : publication → statut final du signal ;
+- débit : signaux terminés par seconde.
+
+Aucun accès réseau externe.
+
+    python -m tools.bench_e2e --signals 20 --latency-ms 40 --error-rate 0.02
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+_SECRET = "bench-secret"
+_FINAL = ("executed", "skipped", "error", "cancelled", "rejected", "coalesced")
+
+# Deux allocations cibles en alternance : chaque signal fait tourner le portefeuille
+_ALLOCATIONS = [
+    {"BTCUSDC": 0.35, "ETHUSDC": 0.25, "SOLUSDC": 0.15},
+    {"BNBUSDC": 0.30, "XRPUSDC": 0.25, "SOLUSDC": 0.25},
+]
+
+
+def _signal(i, transport):
+    alloc = _ALLOCATIONS[i % len(_ALLOCATIONS)]
+    return {
+        "version": 2,
+        "signal_id": f"e2e-{transport}-{i}-{int(time.time() * 1000)}",
+        "confidence": 0.7,
+        "reasoning": "bench e2e",
+        "actions": [],
+        "portfolio_state": {"positions": [
+            {"coin": coin, "pct_of_portfolio": pct} for coin, pct in alloc.items()
+        ]},
+    }
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def _wait_final(signal_id, timeout):
+    from app.db import get_cursor
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        with get_cursor() as cur:
+            cur.execute("SELECT status FROM signals WHERE signal_id = ?", (signal_id,))
+            row = cur.fetchone()
+        if row and row["status"] in _FINAL:
+            return row["status"], time.time()
+        time.sleep(0.01)
+    return None, None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--signals", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=20,
+                        help="latence simulée de l'exchange")
+    parser.add_argument("--jitter-ms", type=float, default=10)
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="part des requêtes exchange en erreur 503")
+    parser.add_argument("--transport", choices=["poll", "sse", "auto"], default="sse")
+    parser.add_argument("--interval", type=int, default=2,
+                        help="POLL_INTERVAL_SECONDS utilisé pendant le bench")
+    parser.add_argument("--parallel", action="store_true", help="PARALLEL_ORDERS=true")
+    args = parser.parse_args()
+
+    from tools.fake_leader import FakeLeader
+    from tools.mock_binance import MockBinance
+
+    leader = FakeLeader(_SECRET, stream=(args.transport != "poll")).start()
+    exchange = MockBinance(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate, balances={"USDC": 1000}, seed=42,
+    ).start()
+
+    # La configuration doit être en place avant l'import de config.settings
+    tmp = tempfile.mkdtemp(prefix="calvalot-e2e-")
+    os.environ.update({
+        "DB_PATH": os.path.join(tmp, "bench.db"),
+        "CONFIG_PATH": os.path.join(tmp, "config.json"),
+        "LEADER_URL": leader.url,
+        "SIGNAL_SECRET": _SECRET,
+        "BINANCE_API_KEY": exchange.api_key,
+        "BINANCE_API_SECRET": exchange.api_secret,
+        "BINANCE_BASE_URL": exchange.url,
+        "TRADING_MODE": "live",
+        "PRICE_FEED": "rest",
+        "SIGNAL_TRANSPORT": args.transport,
+        "POLL_INTERVAL_SECONDS": str(args.interval),
+        "INITIAL_BUDGET_EUR": "900",
+        "PARALLEL_ORDERS": "true" if args.parallel else "false",
+    })
+
+    from app import create_app
+    from app.services import poller
+
+    app = create_app()
+    time.sleep(1)  # connexion du flux SSE
+
+    to_fill, to_done, statuses = [], [], {}
+    started = time.time()
+    for i in range(args.signals):
+        signal = _signal(i, args.transport)
+        n_orders = len(exchange.orders)
+        leader.publish(signal)
+        published = leader.publish_times[signal["signal_id"]]
+
+        status, done_at = _wait_final(signal["signal_id"], timeout=args.interval * 2 + 60)
+        statuses[status] = statuses.get(status, 0) + 1
+        if done_at is None:
+            continue
+        to_done.append((done_at - published) * 1000)
+        new_orders = exchange.orders[n_orders:]
+        if new_orders:
+            to_fill.append(new_orders[0]["transactTime"] - published * 1000)
+    elapsed = time.time() - started
+
+    with app.test_client() as client:
+        status = client.get("/api/agent/status").get_json()
+
+    poller.stop()
+    leader.stop()
+    exchange.stop()
+
+    print(f"transport {args.transport} | latence exchange {args.latency_ms:.0f}±{args.jitter_ms:.0f} ms"
+          f" | erreurs {args.error_rate:.0%} | ordres parallèles {args.parallel}")
+    print(f"signaux : {statuses}")
+    print(f"débit   : {len(to_done) / elapsed:.2f} signaux/s ({elapsed:.1f} s)")
+    for label, values in (("signal → 1er fill", to_fill), ("signal → terminé", to_done)):
+        if values:
+            print(f"{label:>18} : p50 {statistics.median(values):8.1f} ms | "
+                  f"p99 {_percentile(values, 0.99):8.1f} ms | max {max(values):8.1f} ms")
+    print(f"ordres {len(exchange.orders)} | requêtes exchange {exchange.requests_count} "
+          f"(erreurs injectées {exchange.errors_injected}) | requêtes leader {leader.requests_count}")
+    weight = status.get("exchange", {}).get("rate_limits", {}).get("windows", [{}])[0]
+    print(f"poids Binance utilisé : {weight.get('used')}/{weight.get('limit')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""Micro-benchmark : positions REAL + Decimal(str(float)) vs virgule fixe.
+
+Compare, sur une base SQLite temporaire, l'ancienne implémentation
+(colonnes REAL, relecture de la position à chaque trade, conversions
+float → str → Decimal) et l'actuelle (PortfolioState en entiers
+d'unités, write-through) pour :
+
+- `_calc_portfolio_value` : valeur des positions aux prix courants ;
+- `_update_position` : application d'un trade (BUY/SELL alternés).
+
+Affiche aussi la dérive du prix moyen après N trades (float vs entiers).
+
+    python -m tools.bench_fixed_point --trades 2000 --valuations 20000
+"""
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from decimal import Decimal
+
+_COINS = ["BTCUSDC", "ETHUSDC", "BNBUSDC", "SOLUSDC", "XRPUSDC"]
+_PRICES = {"BTCUSDC": Decimal("60000.12"), "ETHUSDC": Decimal("3000.5"),
+           "BNBUSDC": Decimal("550.3"), "SOLUSDC": Decimal("150.07"),
+           "XRPUSDC": Decimal("0.5512")}
+
+
+# ── Ancienne implémentation (REAL) ─────────────────────
+
+class _LegacyPositions:
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""CREATE TABLE positions (
+            coin TEXT PRIMARY KEY, quantity REAL NOT NULL DEFAULT 0,
+            avg_entry_price REAL NOT NULL DEFAULT 0,
+            total_invested_usdt REAL NOT NULL DEFAULT 0,
+            updated_at TEXT DEFAULT (datetime('now')))""")
+
+    def get_positions(self):
+        return [dict(r) for r in self.conn.execute("SELECT * FROM positions ORDER BY coin")]
+
+    def get_position(self, coin):
+        row = self.conn.execute("SELECT * FROM positions WHERE coin = ?", (coin,)).fetchone()
+        return dict(row) if row else None
+
+    def upsert(self, coin, qty, avg, invested):
+        self.conn.execute(
+            """INSERT INTO positions (coin, quantity, avg_entry_price, total_invested_usdt)
+               VALUES (?, ?, ?, ?) ON CONFLICT (coin) DO UPDATE SET
+               quantity = excluded.quantity, avg_entry_price = excluded.avg_entry_price,
+               total_invested_usdt = excluded.total_invested_usdt,
+               updated_at = datetime('now')""",
+            (coin, qty, avg, invested),
+        )
+        self.conn.commit()
+
+    def update_position(self, coin, side, result):
+        pos = self.get_position(coin)
+        qty = Decimal(str(result["quantity"]))
+        price = Decimal(str(result["price"]))
+        amount = Decimal(str(result["amount_usdt"]))
+        if side == "BUY":
+            if pos and Decimal(str(pos["quantity"])) > 0:
+                new_qty = Decimal(str(pos["quantity"])) + qty
+                new_invested = Decimal(str(pos["total_invested_usdt"])) + amount
+                new_avg = new_invested / new_qty
+            else:
+                new_qty, new_invested, new_avg = qty, amount, price
+            self.upsert(coin, float(new_qty), float(new_avg), float(new_invested))
+        elif pos:
+            old_qty = Decimal(str(pos["quantity"]))
+            new_qty = old_qty - qty
+            if new_qty <= 0:
+                new_qty = new_invested = new_avg = Decimal(0)
+            else:
+                new_invested = Decimal(str(pos["total_invested_usdt"])) * (new_qty / old_qty)
+                new_avg = Decimal(str(pos["avg_entry_price"]))
+            self.upsert(coin, float(new_qty), float(new_avg), float(new_invested))
+
+
+def _legacy_value(positions, prices):
+    total = Decimal(0)
+    for pos in positions:
+        qty = Decimal(str(pos["quantity"]))
+        if qty <= 0:
+            continue
+        price = prices.get(pos["coin"])
+        if price:
+            total += qty * price
+    return total
+
+
+# ── Implémentation actuelle ────────────────────────────
+
+def _current_value(positions, prices):
+    total = Decimal(0)
+    for pos in positions:
+        qty = pos["quantity"]
+        if qty <= 0:
+            continue
+        price = prices.get(pos["coin"])
+        if price:
+            total += qty * price
+    return total
+
+
+def _trades(n):
+    """BUY/SELL alternés, quantités à 8 décimales (comme Binance)."""
+    for i in range(n):
+        coin = _COINS[i % len(_COINS)]
+        price = _PRICES[coin] * (1 + Decimal((i % 7) - 3) / 1000)
+        side = "BUY" if (i // len(_COINS)) % 3 != 2 else "SELL"
+        qty = (Decimal(25) / price).quantize(Decimal("0.00000001"))
+        yield coin, side, {"quantity": qty, "price": price, "amount_usdt": qty * price}
+
+
+def _timed(fn, n):
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) / n * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--trades", type=int, default=2000)
+    parser.add_argument("--valuations", type=int, default=20000)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="calvalot-fixed-")
+    os.environ["DB_PATH"] = os.path.join(tmp, "bench.db")
+
+    from app.db import init_db
+    from app.services.portfolio_state import PortfolioState
+    init_db()
+
+    legacy = _LegacyPositions(os.path.join(tmp, "legacy.db"))
+    portfolio = PortfolioState()
+    trades = list(_trades(args.trades))
+
+    update_before = _timed(lambda: [legacy.update_position(c, s, r) for c, s, r in trades],
+                           len(trades))
+    update_after = _timed(lambda: [portfolio.apply_trade(c, s, r["quantity"], r["price"],
+                                                          r["amount_usdt"])
+                                   for c, s, r in trades], len(trades))
+
+    legacy_rows = legacy.get_positions()
+    value_before = _timed(lambda: [_legacy_value(legacy.get_positions(), _PRICES)
+                                   for _ in range(args.valuations)], args.valuations)
+    value_before_cached = _timed(lambda: [_legacy_value(legacy_rows, _PRICES)
+                                          for _ in range(args.valuations)], args.valuations)
+    value_after = _timed(lambda: [_current_value(portfolio.snapshot().positions, _PRICES)
+                                  for _ in range(args.valuations)], args.valuations)
+
+    print(f"{args.trades} trades, {args.valuations} valorisations ({len(_COINS)} positions)")
+    print(f"_update_position      : avant {update_before:8.1f} µs | après {update_after:8.1f} µs"
+          f" | x{update_before / update_after:.1f}")
+    print(f"_calc_portfolio_value : avant {value_before:8.1f} µs (lecture SQLite incluse)"
+          f" | {value_before_cached:6.1f} µs (lignes en mémoire)"
+          f" | après {value_after:6.1f} µs | x{value_before / value_after:.1f}")
+
+    # Dérive : prix moyen REAL vs entiers, comparé à un recalcul exact
+    print("dérive du prix moyen (REAL vs entiers) :")
+    for row in legacy_rows:
+        pos = portfolio.get(row["coin"])
+        if pos is None or not pos["quantity"]:
+            continue
+        drift = Decimal(str(row["avg_entry_price"])) - pos["avg_entry_price"]
+        print(f"  {row['coin']:>8} : REAL {row['avg_entry_price']!r:>22} | "
+              f"entiers {pos['avg_entry_price']} | écart {drift:.2E}")
+
+
+if __name__ == "__main__":
+    main()
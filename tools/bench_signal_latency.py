@@ -0,0 +1,109 @@
+"""Benchmark de latence signal → exécution (polling vs flux SSE).
+
+Lance un leader de substitution en local, démarre le vrai poller sur une
+base SQLite temporaire, publie N signaux et mesure le délai entre la
+publication et l'appel à execute_signal.
+
+    python -m tools.bench_signal_latency --signals 10 --interval 5
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+_SECRET = "bench-secret"
+
+
+class RecordingFollower:
+    """Follower minimal : enregistre l'heure de réception de chaque signal."""
+
+    def __init__(self):
+        self.executed = {}
+        self._event = threading.Event()
+
+    def execute_signal(self, signal, cancel_event=None):
+        self.executed[signal["signal_id"]] = time.time()
+        self._event.set()
+        return {"status": "ok", "trades_executed": 0}
+
+    def wait(self, signal_id, timeout):
+        deadline = time.time() + timeout
+        while signal_id not in self.executed and time.time() < deadline:
+            self._event.wait(0.05)
+            self._event.clear()
+        return self.executed.get(signal_id)
+
+
+def _run(transport, n_signals, spacing, interval):
+    from config.settings import Settings
+    from app.services import poller
+    from tools.fake_leader import FakeLeader
+
+    leader = FakeLeader(_SECRET, stream=(transport != "poll")).start()
+    Settings.LEADER_URL = leader.url
+    Settings.SIGNAL_SECRET = _SECRET
+    Settings.POLL_INTERVAL_SECONDS = interval
+    Settings.SIGNAL_TRANSPORT = transport
+
+    follower = RecordingFollower()
+    poller.init_poller(follower)
+    time.sleep(1)  # connexion du flux
+
+    latencies = []
+    for i in range(n_signals):
+        signal_id = f"bench-{transport}-{i}-{int(time.time() * 1000)}"
+        leader.publish({
+            "version": 2, "signal_id": signal_id, "confidence": 0.5,
+            "reasoning": "bench", "actions": [],
+            "portfolio_state": {"positions": []},
+        })
+        done = follower.wait(signal_id, timeout=interval * 2 + 5)
+        if done:
+            latencies.append((done - leader.publish_times[signal_id]) * 1000)
+        time.sleep(spacing)
+
+    poller.stop()
+    poller._poller_thread.join(timeout=interval + 5)
+    leader.stop()
+    return latencies, leader.requests_count
+
+
+def _report(transport, latencies, n_signals, requests_count):
+    if not latencies:
+        print(f"{transport:>5}: aucun signal exécuté")
+        return
+    lat = sorted(latencies)
+    p95 = lat[min(len(lat) - 1, int(len(lat) * 0.95))]
+    print(f"{transport:>5}: {len(lat)}/{n_signals} signaux | "
+          f"p50 {statistics.median(lat):8.1f} ms | p95 {p95:8.1f} ms | "
+          f"max {lat[-1]:8.1f} ms | requêtes leader {requests_count}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--signals", type=int, default=10)
+    parser.add_argument("--interval", type=int, default=5,
+                        help="POLL_INTERVAL_SECONDS utilisé pendant le bench")
+    parser.add_argument("--spacing", type=float, default=0.7,
+                        help="secondes entre deux publications")
+    parser.add_argument("--transport", choices=["poll", "sse", "both"], default="both")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="calvalot-bench-")
+    os.environ["DB_PATH"] = os.path.join(tmp, "bench.db")
+    os.environ["CONFIG_PATH"] = os.path.join(tmp, "config.json")
+
+    from app.db import init_db
+    init_db()
+
+    transports = ["poll", "sse"] if args.transport == "both" else [args.transport]
+    for transport in transports:
+        latencies, count = _run(transport, args.signals, args.spacing, args.interval)
+        _report(transport, latencies, args.signals, count)
+
+
+if __name__ == "__main__":
+    main()
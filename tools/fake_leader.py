@@ -0,0 +1,172 @@
+"""Leader Cash-a-lot de substitution, pour les tests locaux et les benchmarks.
+
+Sert /api/signal/latest, /api/signal/history et /api/signal/stream (SSE)
+avec la même vérification HMAC que le vrai leader. Aucun accès réseau externe.
+
+Usage autonome :
+    python -m tools.fake_leader --port 8090 --secret dev
+"""
+
+import argparse
+import gzip
+import hashlib
+import hmac
+import json
+import threading
+import time
+
+from flask import Flask, Response, jsonify, request
+from werkzeug.serving import make_server
+
+_HMAC_MAX_SKEW = 300    # secondes
+_HEARTBEAT = 15         # secondes entre deux commentaires SSE
+
+
+class FakeLeader:
+    def __init__(self, secret, host="127.0.0.1", port=0, stream=True):
+        self.secret = secret
+        self.stream_enabled = stream
+        self._signals = []
+        self._cond = threading.Condition()
+        self.publish_times = {}  # signal_id -> time.time() de publication
+        self.requests_count = 0
+
+        self.app = self._build_app()
+        self._server = make_server(host, port, self.app, threaded=True)
+        self.url = f"http://{host}:{self._server.server_port}"
+        self._thread = None
+
+    # ── Contrôle ───────────────────────────────────────
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, daemon=True, name="fake-leader",
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        with self._cond:
+            self._signals.append(None)  # débloque les flux SSE
+            self._cond.notify_all()
+        self._server.shutdown()
+
+    def publish(self, signal):
+        """Publie un nouveau signal (visible par le polling et le flux)."""
+        with self._cond:
+            self.publish_times[signal["signal_id"]] = time.time()
+            self._signals.append(signal)
+            self._cond.notify_all()
+
+    # ── Serveur ────────────────────────────────────────
+
+    def _check_hmac(self):
+        ts = request.headers.get("X-Signal-Timestamp", "")
+        sig = request.headers.get("X-Signal-Signature", "")
+        if not ts.isdigit() or abs(time.time() - int(ts)) > _HMAC_MAX_SKEW:
+            return False
+        expected = hmac.new(self.secret.encode(), ts.encode(), hashlib.sha256).hexdigest()
+        return hmac.compare_digest(expected, sig)
+
+    def _latest(self):
+        with self._cond:
+            for s in reversed(self._signals):
+                if s is not None:
+                    return s
+        return None
+
+    def _build_app(self):
+        app = Flask("fake_leader")
+
+        @app.route("/api/signal/latest")
+        def latest():
+            self.requests_count += 1
+            if not self._check_hmac():
+                return jsonify({"error": "forbidden"}), 403
+            signal = self._latest()
+            if signal is None:
+                return "", 204
+
+            # Requête conditionnelle (même contrat que le vrai leader)
+            etag = f'"{signal["signal_id"]}"'
+            if request.headers.get("If-None-Match") == etag:
+                return "", 304, {"ETag": etag}
+            if request.args.get("since_id") == signal["signal_id"]:
+                return "", 204
+
+            body = json.dumps(signal).encode()
+            headers = {"ETag": etag, "Content-Type": "application/json"}
+            if "gzip" in request.headers.get("Accept-Encoding", ""):
+                body = gzip.compress(body)
+                headers["Content-Encoding"] = "gzip"
+            return body, 200, headers
+
+        @app.route("/api/signal/history")
+        def history():
+            self.requests_count += 1
+            if not self._check_hmac():
+                return jsonify({"error": "forbidden"}), 403
+            with self._cond:
+                signals = [s for s in self._signals if s is not None]
+            ids = [s["signal_id"] for s in signals]
+            since_id = request.args.get("since_id")
+            start = ids.index(since_id) + 1 if since_id in ids else 0
+            return jsonify({"signals": signals[start:]})
+
+        @app.route("/api/signal/stream")
+        def stream():
+            self.requests_count += 1
+            if not self.stream_enabled:
+                return jsonify({"error": "not found"}), 404
+            if not self._check_hmac():
+                return jsonify({"error": "forbidden"}), 403
+
+            def generate():
+                with self._cond:
+                    cursor = len(self._signals)
+                yield ": connected\n\n"
+                while True:
+                    with self._cond:
+                        self._cond.wait_for(
+                            lambda: len(self._signals) > cursor, timeout=_HEARTBEAT,
+                        )
+                        pending = self._signals[cursor:]
+                        cursor = len(self._signals)
+                    if not pending:
+                        yield ": keepalive\n\n"
+                        continue
+                    for s in pending:
+                        if s is None:
+                            return
+                        yield f"event: signal\ndata: {json.dumps(s)}\n\n"
+
+            return Response(generate(), mimetype="text/event-stream",
+                            headers={"Cache-Control": "no-cache"})
+
+        @app.route("/api/signal/publish", methods=["POST"])
+        def publish():
+            # Usage manuel uniquement (pas d'auth : le serveur écoute en local)
+            signal = request.get_json() or {}
+            signal.setdefault("signal_id", f"fake-{int(time.time() * 1000)}")
+            self.publish(signal)
+            return jsonify({"ok": True, "signal_id": signal["signal_id"]})
+
+        return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Leader Cash-a-lot de substitution")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--secret", default="dev")
+    parser.add_argument("--no-stream", action="store_true")
+    args = parser.parse_args()
+
+    leader = FakeLeader(args.secret, host=args.host, port=args.port,
+                        stream=not args.no_stream)
+    print(f"Fake leader sur {leader.url} (Ctrl+C pour arrêter)")
+    leader._server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""Vérifie ou reconstruit le grand livre du cash depuis l'historique.
+
+Le grand livre (table cash_ledger) tient les totaux achats / ventes /
+retraits à jour à chaque écriture ; `verify` les compare aux sommes
+recalculées sur trades et withdrawals, `rebuild` les remplace par ces
+sommes. Utilise la base de DB_PATH (arrêter le bot avant un rebuild).
+
+    DB_PATH=data/calvalot.db python -m tools.ledger verify
+    DB_PATH=data/calvalot.db python -m tools.ledger rebuild
+"""
+
+import argparse
+import sys
+
+from app import models
+from app.db import init_db
+
+
+def _print(label, totals):
+    print(f"{label:>10} : achats {totals['bought_usdt']:.6f} | ventes {totals['sold_usdt']:.6f}"
+          f" | retraits {totals['withdrawn_usdt']:.6f}"
+          f" | {totals['trades']} trades, {totals['withdrawals']} retraits")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=["verify", "rebuild"])
+    args = parser.parse_args()
+
+    init_db()
+    if args.command == "rebuild":
+        models.rebuild_cash_ledger()
+
+    ok, ledger, history = models.verify_cash_ledger()
+    _print("ledger", ledger)
+    _print("historique", history)
+    print("OK" if ok else "ÉCART : python -m tools.ledger rebuild")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
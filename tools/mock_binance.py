@@ -0,0 +1,392 @@
+"""Exchange Binance de substitution, pour les benchmarks hors ligne.
+
+Implémente le sous-ensemble REST utilisé par ExchangeClient :
+ping/time, ticker/price, depth, exchangeInfo, account (signé), order
+MARKET (signé, fills + commissions), consultation des ordres (order,
+allOrders, myTrades) et userDataStream. Latence, taux d'erreur
+et trajectoire des prix sont configurables. Aucun accès réseau externe.
+
+Pointer le follower dessus :
+    BINANCE_BASE_URL=http://127.0.0.1:8091 PRICE_FEED=rest
+
+Usage autonome :
+    python -m tools.mock_binance --port 8091 --latency-ms 40 --error-rate 0.01
+"""
+
+import argparse
+import hashlib
+import hmac
+import itertools
+import json
+import random
+import threading
+import time
+from decimal import Decimal, ROUND_DOWN
+
+from flask import Flask, jsonify, request
+from werkzeug.serving import make_server
+
+_START_PRICES = {
+    "BTCUSDC": "60000",
+    "ETHUSDC": "3000",
+    "BNBUSDC": "550",
+    "SOLUSDC": "150",
+    "XRPUSDC": "0.55",
+    "EURUSDC": "1.08",
+}
+_STEP = {"BTCUSDC": "0.00001", "ETHUSDC": "0.0001", "BNBUSDC": "0.001",
+         "SOLUSDC": "0.001", "XRPUSDC": "0.1", "EURUSDC": "0.1"}
+_TICK = "0.01"
+_MIN_NOTIONAL = "5"
+_COMMISSION = Decimal("0.001")
+
+
+def _error(status, code, msg):
+    return jsonify({"code": code, "msg": msg}), status
+
+
+class MockBinance:
+    def __init__(self, api_key="mock-key", api_secret="mock-secret",
+                 host="127.0.0.1", port=0, latency_ms=0, jitter_ms=0,
+                 error_rate=0.0, price_path="walk", volatility=0.0005,
+                 balances=None, seed=None):
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.price_path = price_path      # walk | flat | callable(symbol, price)
+        self.volatility = volatility
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._prices = {s: Decimal(p) for s, p in _START_PRICES.items()}
+        self._balances = {a: Decimal(str(v)) for a, v in (balances or {"USDC": 1000}).items()}
+        self._order_ids = itertools.count(1)
+        self._trade_ids = itertools.count(1)
+        self._weight = [0, 0]             # [minute, poids utilisé]
+        self.orders = []                  # réponses d'ordres, dans l'ordre
+        self.drop_responses = 0           # n prochains ordres exécutés sans réponse
+        self.requests_count = 0
+        self.errors_injected = 0
+
+        self.app = self._build_app()
+        self._server = make_server(host, port, self.app, threaded=True)
+        self.url = f"http://{host}:{self._server.server_port}"
+        self._thread = None
+
+    # ── Contrôle ───────────────────────────────────────
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, daemon=True, name="mock-binance",
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+
+    def set_price(self, symbol, price):
+        with self._lock:
+            self._prices[symbol] = Decimal(str(price))
+
+    def balance(self, asset):
+        with self._lock:
+            return self._balances.get(asset, Decimal(0))
+
+    # ── Marché simulé ──────────────────────────────────
+
+    def _price(self, symbol):
+        """Prix courant ; avance la trajectoire à chaque lecture."""
+        with self._lock:
+            price = self._prices[symbol]
+            if callable(self.price_path):
+                price = Decimal(str(self.price_path(symbol, price)))
+            elif self.price_path == "walk":
+                step = Decimal(str(self._rng.gauss(0, self.volatility)))
+                price = (price * (1 + step)).quantize(Decimal("0.00000001"))
+            self._prices[symbol] = price
+            return price
+
+    def _fill(self, symbol, side, quantity=None, quote=None):
+        """Remplit un ordre market en 1 à 3 fills, prix qui glisse."""
+        base_asset, quote_asset = symbol[:-4], symbol[-4:]
+        price = self._price(symbol)
+        step = Decimal(_STEP.get(symbol, "0.00000001"))
+        if quantity is None:
+            quantity = (quote / price / step).to_integral_value(ROUND_DOWN) * step
+        n_fills = 1 + min(2, int(quantity * price // 500))
+        direction = 1 if side == "BUY" else -1
+        fills = []
+        remaining = quantity
+        for i in range(n_fills):
+            qty = remaining if i == n_fills - 1 else (
+                (quantity / n_fills / step).to_integral_value(ROUND_DOWN) * step
+            )
+            remaining -= qty
+            fill_price = price * (1 + direction * Decimal("0.0001") * i)
+            notional = qty * fill_price
+            # Commission : en base sur un BUY, en quote sur un SELL
+            commission = (qty if side == "BUY" else notional) * _COMMISSION
+            fills.append({
+                "price": f"{fill_price:.8f}",
+                "qty": f"{qty:.8f}",
+                "commission": f"{commission:.8f}",
+                "commissionAsset": base_asset if side == "BUY" else quote_asset,
+                "tradeId": next(self._trade_ids),
+            })
+        quote_qty = sum(Decimal(f["qty"]) * Decimal(f["price"]) for f in fills)
+        return base_asset, quote_asset, quantity, quote_qty, fills
+
+    # ── Serveur ────────────────────────────────────────
+
+    def _check_signature(self):
+        if request.headers.get("X-MBX-APIKEY") != self.api_key:
+            return False
+        payload = (request.get_data(as_text=True) if request.method in ("POST", "PUT", "DELETE")
+                   and request.get_data() else request.query_string.decode())
+        payload, _, signature = payload.rpartition("&signature=")
+        expected = hmac.new(self.api_secret.encode(), payload.encode(), hashlib.sha256).hexdigest()
+        return hmac.compare_digest(expected, signature)
+
+    def _params(self):
+        return request.form if request.method == "POST" else request.args
+
+    def _orders_of(self, symbol):
+        with self._lock:
+            return [o for o in self.orders if o["symbol"] == symbol]
+
+    @staticmethod
+    def _order_view(order):
+        """Ordre tel que renvoyé par GET order / allOrders (sans fills)."""
+        view = {k: v for k, v in order.items() if k not in ("fills", "transactTime")}
+        view.update({"time": order["transactTime"], "updateTime": order["transactTime"],
+                     "isWorking": True, "origQuoteOrderQty": "0.00000000"})
+        return view
+
+    def _build_app(self):
+        app = Flask("mock_binance")
+        weights = {"ping": 1, "time": 1, "ticker/price": 4, "depth": 5,
+                   "exchangeInfo": 20, "account": 20, "order": 1, "userDataStream": 2,
+                   "allOrders": 20, "myTrades": 20}
+
+        @app.before_request
+        def simulate_network():
+            self.requests_count += 1
+            delay = self.latency_ms + self._rng.uniform(0, self.jitter_ms)
+            if delay:
+                time.sleep(delay / 1000)
+            if self.error_rate and self._rng.random() < self.error_rate:
+                self.errors_injected += 1
+                return _error(503, -1001, "Internal error; unable to process your request.")
+
+        @app.after_request
+        def weight_headers(resp):
+            endpoint = request.path.split("/api/v3/", 1)[-1]
+            minute = int(time.time() // 60)
+            with self._lock:
+                if self._weight[0] != minute:
+                    self._weight[:] = [minute, 0]
+                self._weight[1] += weights.get(endpoint, 2)
+                resp.headers["X-MBX-USED-WEIGHT-1M"] = str(self._weight[1])
+            return resp
+
+        @app.route("/api/v3/ping")
+        def ping():
+            return jsonify({})
+
+        @app.route("/api/v3/time")
+        def server_time():
+            return jsonify({"serverTime": int(time.time() * 1000)})
+
+        @app.route("/api/v3/ticker/price")
+        def ticker_price():
+            if "symbol" in request.args:
+                symbol = request.args["symbol"]
+                if symbol not in self._prices:
+                    return _error(400, -1121, "Invalid symbol.")
+                return jsonify({"symbol": symbol, "price": f"{self._price(symbol):f}"})
+            symbols = json.loads(request.args["symbols"]) if "symbols" in request.args \
+                else list(self._prices)
+            if any(s not in self._prices for s in symbols):
+                return _error(400, -1121, "Invalid symbol.")
+            return jsonify([{"symbol": s, "price": f"{self._price(s):f}"} for s in symbols])
+
+        @app.route("/api/v3/depth")
+        def depth():
+            symbol = request.args.get("symbol")
+            if symbol not in self._prices:
+                return _error(400, -1121, "Invalid symbol.")
+            limit = min(int(request.args.get("limit", 100)), 5000)
+            price = self._price(symbol)
+            # Carnet synthétique : 1 bp entre niveaux, ~2 000 $ au premier
+            # niveau, profondeur croissante en s'éloignant du milieu.
+            bids, asks = [], []
+            for i in range(limit):
+                size = Decimal(2000 + 400 * i) / price
+                bids.append([f"{price * (1 - Decimal('0.0001') * (i + 1)):.8f}", f"{size:.8f}"])
+                asks.append([f"{price * (1 + Decimal('0.0001') * (i + 1)):.8f}", f"{size:.8f}"])
+            return jsonify({"lastUpdateId": int(time.time() * 1000), "bids": bids, "asks": asks})
+
+        @app.route("/api/v3/exchangeInfo")
+        def exchange_info():
+            return jsonify({
+                "timezone": "UTC",
+                "serverTime": int(time.time() * 1000),
+                "rateLimits": [
+                    {"rateLimitType": "REQUEST_WEIGHT", "interval": "MINUTE", "intervalNum": 1, "limit": 6000},
+                    {"rateLimitType": "ORDERS", "interval": "SECOND", "intervalNum": 10, "limit": 100},
+                    {"rateLimitType": "ORDERS", "interval": "DAY", "intervalNum": 1, "limit": 200000},
+                ],
+                "symbols": [{
+                    "symbol": s, "status": "TRADING",
+                    "baseAsset": s[:-4], "quoteAsset": s[-4:],
+                    "filters": [
+                        {"filterType": "PRICE_FILTER", "minPrice": _TICK, "maxPrice": "1000000", "tickSize": _TICK},
+                        {"filterType": "LOT_SIZE", "minQty": _STEP[s], "maxQty": "9000000", "stepSize": _STEP[s]},
+                        {"filterType": "MARKET_LOT_SIZE", "minQty": "0", "maxQty": "1000000", "stepSize": "0"},
+                        {"filterType": "NOTIONAL", "minNotional": _MIN_NOTIONAL, "applyMinToMarket": True,
+                         "maxNotional": "9000000", "applyMaxToMarket": False, "avgPriceMins": 5},
+                    ],
+                } for s in self._prices],
+            })
+
+        @app.route("/api/v3/account")
+        def account():
+            if not self._check_signature():
+                return _error(401, -1022, "Signature for this request is not valid.")
+            with self._lock:
+                balances = [{"asset": a, "free": f"{v:f}", "locked": "0"}
+                            for a, v in self._balances.items()]
+            return jsonify({"canTrade": True, "updateTime": int(time.time() * 1000),
+                            "accountType": "SPOT", "balances": balances})
+
+        @app.route("/api/v3/order", methods=["POST"])
+        def order():
+            if not self._check_signature():
+                return _error(401, -1022, "Signature for this request is not valid.")
+            params = self._params()
+            symbol, side = params.get("symbol"), params.get("side")
+            if symbol not in self._prices:
+                return _error(400, -1121, "Invalid symbol.")
+            if params.get("type") != "MARKET":
+                return _error(400, -1116, "Invalid orderType.")
+
+            quantity = Decimal(params["quantity"]) if "quantity" in params else None
+            quote = Decimal(params["quoteOrderQty"]) if "quoteOrderQty" in params else None
+            base_asset, quote_asset, qty, quote_qty, fills = self._fill(
+                symbol, side, quantity=quantity, quote=quote,
+            )
+            if qty <= 0 or quote_qty < Decimal(_MIN_NOTIONAL):
+                return _error(400, -1013, "Filter failure: NOTIONAL")
+
+            with self._lock:
+                spend_asset, spend = (quote_asset, quote_qty) if side == "BUY" else (base_asset, qty)
+                if self._balances.get(spend_asset, Decimal(0)) < spend:
+                    return _error(400, -2010, "Account has insufficient balance for requested action.")
+                sign = 1 if side == "BUY" else -1
+                self._balances[base_asset] = self._balances.get(base_asset, Decimal(0)) + sign * qty
+                self._balances[quote_asset] = self._balances.get(quote_asset, Decimal(0)) - sign * quote_qty
+                for f in fills:
+                    asset = f["commissionAsset"]
+                    self._balances[asset] -= Decimal(f["commission"])
+
+                result = {
+                    "symbol": symbol,
+                    "orderId": next(self._order_ids),
+                    "orderListId": -1,
+                    "clientOrderId": params.get("newClientOrderId") or f"mock{time.time_ns()}",
+                    "transactTime": int(time.time() * 1000),
+                    "price": "0.00000000",
+                    "origQty": f"{qty:.8f}",
+                    "executedQty": f"{qty:.8f}",
+                    "cummulativeQuoteQty": f"{quote_qty:.8f}",
+                    "status": "FILLED",
+                    "timeInForce": "GTC",
+                    "type": "MARKET",
+                    "side": side,
+                    "fills": fills,
+                }
+                self.orders.append(result)
+                if self.drop_responses > 0:
+                    # Ordre exécuté mais réponse perdue (crash, coupure réseau)
+                    self.drop_responses -= 1
+                    return _error(503, -1007, "Timeout waiting for response from backend server.")
+            return jsonify(result)
+
+        @app.route("/api/v3/order", methods=["GET"])
+        def get_order():
+            if not self._check_signature():
+                return _error(401, -1022, "Signature for this request is not valid.")
+            params = self._params()
+            for o in self._orders_of(params.get("symbol")):
+                if (str(o["orderId"]) == params.get("orderId")
+                        or o["clientOrderId"] == params.get("origClientOrderId")):
+                    return jsonify(self._order_view(o))
+            return _error(400, -2013, "Order does not exist.")
+
+        @app.route("/api/v3/allOrders")
+        def all_orders():
+            if not self._check_signature():
+                return _error(401, -1022, "Signature for this request is not valid.")
+            params = self._params()
+            since = int(params.get("startTime", 0))
+            orders = [self._order_view(o) for o in self._orders_of(params.get("symbol"))
+                      if o["transactTime"] >= since]
+            return jsonify(orders[:int(params.get("limit", 500))])
+
+        @app.route("/api/v3/myTrades")
+        def my_trades():
+            if not self._check_signature():
+                return _error(401, -1022, "Signature for this request is not valid.")
+            params = self._params()
+            since = int(params.get("startTime", 0))
+            trades = []
+            for o in self._orders_of(params.get("symbol")):
+                if o["transactTime"] < since or params.get("orderId") not in (None, str(o["orderId"])):
+                    continue
+                trades += [{
+                    "symbol": o["symbol"], "id": f["tradeId"], "orderId": o["orderId"],
+                    "price": f["price"], "qty": f["qty"],
+                    "quoteQty": f"{Decimal(f['price']) * Decimal(f['qty']):.8f}",
+                    "commission": f["commission"], "commissionAsset": f["commissionAsset"],
+                    "time": o["transactTime"], "isBuyer": o["side"] == "BUY",
+                    "isMaker": False, "isBestMatch": True,
+                } for f in o["fills"]]
+            return jsonify(trades[:int(params.get("limit", 500))])
+
+        @app.route("/api/v3/userDataStream", methods=["POST", "PUT", "DELETE"])
+        def user_data_stream():
+            if request.method == "POST":
+                return jsonify({"listenKey": "mock-listen-key"})
+            return jsonify({})
+
+        return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exchange Binance de substitution")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8091)
+    parser.add_argument("--api-key", default="mock-key")
+    parser.add_argument("--api-secret", default="mock-secret")
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--price-path", choices=["walk", "flat"], default="walk")
+    parser.add_argument("--usdc", type=float, default=1000, help="solde USDC initial")
+    args = parser.parse_args()
+
+    mock = MockBinance(
+        api_key=args.api_key, api_secret=args.api_secret,
+        host=args.host, port=args.port,
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate, price_path=args.price_path,
+        balances={"USDC": args.usdc},
+    )
+    print(f"Mock Binance sur {mock.url} (Ctrl+C pour arrêter)")
+    mock._server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Enregistre des carnets d'ordres Binance pour la simulation hors ligne.
+
+Écrit `<dossier>/<SYMBOL>.json` (100 niveaux par côté + prix milieu).
+Pointer ensuite DEPTH_FIXTURES_DIR sur ce dossier : sans réseau, le
+dry_run recentre ces carnets sur le prix courant.
+
+    python -m tools.record_depth --out data/depth
+"""
+
+import argparse
+import json
+import os
+import time
+from decimal import Decimal
+
+from binance.client import Client
+
+from config.coins import COIN_SYMBOLS
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--out", default="data/depth")
+    parser.add_argument("--symbols", nargs="*", default=COIN_SYMBOLS)
+    parser.add_argument("--limit", type=int, default=100)
+    args = parser.parse_args()
+
+    client = Client()  # endpoints publics, pas de clés
+    os.makedirs(args.out, exist_ok=True)
+    for symbol in args.symbols:
+        depth = client.get_order_book(symbol=symbol, limit=args.limit)
+        mid = (Decimal(depth["bids"][0][0]) + Decimal(depth["asks"][0][0])) / 2
+        path = os.path.join(args.out, f"{symbol}.json")
+        with open(path, "w") as f:
+            json.dump({
+                "symbol": symbol,
+                "recorded_at": int(time.time()),
+                "mid": str(mid),
+                "bids": depth["bids"],
+                "asks": depth["asks"],
+            }, f)
+        print(f"{symbol}: {len(depth['bids'])}/{len(depth['asks'])} niveaux, mid {mid} → {path}")
+
+
+if __name__ == "__main__":
+    main()